@@ -5,6 +5,19 @@ import os
 
 # Import database and models
 from db import init_db
+from identity_cache import identity_cache
+from password_pool import password_pool
+from revocation import revocation_index
+from shared_cache import shared_cache
+from rate_limit import login_limiter
+from table_versions import table_versions
+from reference_cache import reference_cache
+from query_cache import query_cache
+from single_flight import single_flight
+from stat_counters import stat_counters
+from parallel_queries import parallel_queries
+from event_feed import event_feed
+from usernames import username_allocator
 
 # Import routes
 from routes.auth import auth_bp
@@ -17,6 +30,8 @@ from routes.pucs import pucs_bp
 from routes.visitors_sqlalchemy import visitors_bp
 from routes.blacklist import blacklist_bp
 from routes.reports import reports_bp
+from routes.batch import batch_bp
+from routes.events import events_bp
 
 def create_app():
     # Initialize Flask app
@@ -24,11 +39,58 @@ def create_app():
     app.config['SECRET_KEY'] = 'your_secret_key_here'  # Change this in production
     app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://root:@localhost/themis_db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['ACCESS_TOKEN_MINUTES'] = 15  # Lifetime of the claims-bearing access token
+    app.config['REFRESH_TOKEN_HOURS'] = 24  # Lifetime of the refresh token
+    app.config['LOGIN_RATE_LIMIT_PER_USER'] = 10  # Login attempts per username per window
+    app.config['LOGIN_RATE_LIMIT_PER_IP'] = 30  # Login attempts per remote address per window
+    app.config['LOGIN_RATE_LIMIT_WINDOW'] = 60  # Seconds
+    app.config['RATE_LIMIT_STORAGE_URL'] = os.environ.get('RATE_LIMIT_STORAGE_URL', 'shared://')  # shared:// keeps counters in the shared cache store
+    app.config['AUDIT_ARCHIVE_DIR'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'auditlogs')
+    app.config['AUDIT_RETENTION_DAYS'] = 180  # Audit rows older than this move to the archive
+    app.config['IDENTITY_CACHE_SIZE'] = 1024  # Max cached users per worker
+    app.config['IDENTITY_CACHE_TTL'] = 300  # Seconds before a cached user is reloaded
+    app.config['PASSWORD_POOL_WORKERS'] = 2  # Threads dedicated to bcrypt
+    app.config['PASSWORD_POOL_QUEUE'] = 32  # Hash jobs allowed to wait for a worker
+    app.config['PASSWORD_POOL_TIMEOUT'] = 10  # Seconds a request waits for its hash
+    app.config['REFERENCE_CACHE_TTL'] = 300  # Seconds before crime taxonomy / roles are reloaded regardless
+    app.config['QUERY_CACHE_SIZE'] = 256  # Cached aggregate query results per worker
+    app.config['QUERY_CACHE_TTL'] = 60  # Seconds a cached result may be served without a write
+    app.config['CACHE_VERSION_POLL'] = 1.0  # Seconds between cache_versions polls (writes made by other workers)
+    app.config['SHARED_CACHE_URL'] = os.environ.get('SHARED_CACHE_URL', 'memory://')  # redis://... to share across nodes
+    app.config['SHARED_CACHE_TTL'] = 60  # Default seconds a shared cache entry lives
+    app.config['SINGLE_FLIGHT_STALE'] = 5  # Seconds a finished response may be served while it is recomputed
+    app.config['SINGLE_FLIGHT_WAIT'] = 30  # Seconds a coalesced request waits for the in-flight one
+    app.config['STAT_COUNTER_MAX_AGE'] = 300  # Seconds before a dashboard counter is recounted on read, however often it was written
+    app.config['PARALLEL_QUERY_WORKERS'] = 4  # Threads running the sections of composite endpoints (capped at the DB pool size)
+    app.config['PARALLEL_QUERY_QUEUE'] = 16  # Sections allowed to wait for a worker; beyond that requests get 503
+    app.config['PARALLEL_QUERY_TIMEOUT'] = 15  # Seconds a section may run, counted from when it starts
+    app.config['PARALLEL_QUERY_QUEUE_TIMEOUT'] = 5  # Seconds a section may wait for a worker before the request gets 503
+    app.config['BATCH_MAX_REQUESTS'] = 20  # Sub-requests accepted by one /api/batch call
+    app.config['EVENT_FEED_POLL'] = 1.0  # Seconds between feed_events polls (events written by other workers)
+    app.config['EVENT_STREAM_HEARTBEAT'] = 15  # Seconds between keep-alive comments on an idle event stream
+    app.config['EVENT_STREAM_MAX_SECONDS'] = 300  # Streams end after this and the browser reconnects
+    app.config['USERNAME_RESERVATION_SECONDS'] = 60  # How long an allocated username is held for a caller outside the session
+    app.config['PUC_IMPORT_MAX_ROWS'] = 5000  # Rows read from one bulk PUC upload
+    app.config['PUC_IMPORT_CHUNK_SIZE'] = 200  # Rows per INSERT/transaction in a bulk PUC import
+    app.config['VISIT_DECISION_MAX_ITEMS'] = 500  # Visit requests one batch approve/reject may decide
     
     # Initialize extensions
     db = init_db(app)
     bcrypt = Bcrypt(app)
-    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], allow_headers=["Content-Type", "Authorization"])
+    identity_cache.init_app(app)
+    password_pool.init_app(app)
+    revocation_index.init_app(app)
+    shared_cache.init_app(app)
+    login_limiter.init_app(app)
+    table_versions.init_app(app)
+    stat_counters.init_app(app)
+    event_feed.init_app(app)
+    reference_cache.init_app(app)
+    query_cache.init_app(app)
+    single_flight.init_app(app)
+    parallel_queries.init_app(app)
+    username_allocator.init_app(app)
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], allow_headers=["Content-Type", "Authorization", "Last-Event-ID"], expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"])
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api')
@@ -41,6 +103,8 @@ def create_app():
     app.register_blueprint(visitors_bp, url_prefix='/api')
     app.register_blueprint(blacklist_bp, url_prefix='/api')
     app.register_blueprint(reports_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(events_bp, url_prefix='/api')
     
     # Test connection route
     @app.route('/api/test-connection', methods=['GET'])
@@ -0,0 +1,19 @@
+import datetime
+import sys
+
+from app import create_app
+from audit_archive import archive_audit_logs
+
+# Move aged audit rows out of the hot auditlogs table into the compressed archive.
+# Usage: python archive_audit_logs.py [retention_days]
+app = create_app()
+
+with app.app_context():
+    retention_days = int(sys.argv[1]) if len(sys.argv) > 1 else app.config['AUDIT_RETENTION_DAYS']
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+    
+    print(f"Archiving audit logs older than {cutoff:%Y-%m-%d %H:%M:%S} to {app.config['AUDIT_ARCHIVE_DIR']}")
+    moved = archive_audit_logs(app.config['AUDIT_ARCHIVE_DIR'], cutoff)
+    print(f"Archived {moved} audit log rows")
+
+print("Done")
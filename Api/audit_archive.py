@@ -0,0 +1,148 @@
+import datetime
+import gzip
+import heapq
+import json
+import os
+import re
+from sqlalchemy import text, bindparam
+
+from db import db
+from pagination import parse_datetime
+
+# One append-only, gzip-compressed JSON-lines file per calendar month of event_time
+ARCHIVE_FILE_PATTERN = re.compile(r'^auditlogs-(\d{4})-(\d{2})\.jsonl\.gz$')
+
+AUDIT_LOG_QUERY = """
+    SELECT a.audit_id, a.user_id, u.username, a.event_type,
+           a.event_time, a.ip_address, a.notes
+    FROM auditlogs a
+    LEFT JOIN users u ON a.user_id = u.user_id
+"""
+
+def archive_file_name(year, month):
+    return f"auditlogs-{year:04d}-{month:02d}.jsonl.gz"
+
+def serialize_audit_log(row):
+    return {
+        'audit_id': row[0],
+        'user_id': row[1],
+        'username': row[2] or "System",
+        'event_type': row[3],
+        'event_time': row[4].isoformat() if row[4] else None,
+        'ip_address': row[5],
+        'notes': row[6]
+    }
+
+def archive_audit_logs(archive_dir, cutoff, batch_size=1000):
+    """Move audit rows older than cutoff into the monthly archive files; returns rows moved
+
+    Each batch is appended as a new gzip member (so files stay valid and append-only)
+    and fsynced before the rows are deleted from the hot table. A crash between the two
+    can only duplicate rows in the archive, which readers drop by audit_id.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    moved = 0
+
+    while True:
+        rows = db.session.execute(text(AUDIT_LOG_QUERY + """
+            WHERE a.event_time < :cutoff
+            ORDER BY a.event_time, a.audit_id
+            LIMIT :batch_size
+        """), {"cutoff": cutoff, "batch_size": batch_size}).fetchall()
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault((row[4].year, row[4].month), []).append(serialize_audit_log(row))
+
+        for (year, month), records in by_month.items():
+            path = os.path.join(archive_dir, archive_file_name(year, month))
+            payload = "".join(json.dumps(record) + "\n" for record in records)
+            with open(path, 'ab') as archive_file:
+                archive_file.write(gzip.compress(payload.encode('utf-8')))
+                archive_file.flush()
+                os.fsync(archive_file.fileno())
+
+        delete_query = text("DELETE FROM auditlogs WHERE audit_id IN :audit_ids").bindparams(
+            bindparam('audit_ids', expanding=True)
+        )
+        db.session.execute(delete_query, {"audit_ids": [row[0] for row in rows]})
+        db.session.commit()
+        moved += len(rows)
+
+        if len(rows) < batch_size:
+            break
+
+    return moved
+
+def _archive_months(archive_dir):
+    """(year, month, path) for every archive file, newest first"""
+    if not os.path.isdir(archive_dir):
+        return []
+
+    months = []
+    for name in os.listdir(archive_dir):
+        match = ARCHIVE_FILE_PATTERN.match(name)
+        if match:
+            months.append((int(match.group(1)), int(match.group(2)), os.path.join(archive_dir, name)))
+    return sorted(months, reverse=True)
+
+def query_archive(archive_dir, filters, before=None, limit=100):
+    """Newest-first audit records from the archive matching the filters and older than before
+
+    before is the (event_time, audit_id) key of the last row already returned.
+    """
+    newest = filters.get('end')
+    if before is not None and (newest is None or before[0] < newest):
+        newest = before[0]
+    oldest = filters.get('start')
+
+    found = {}
+    for year, month, path in _archive_months(archive_dir):
+        if newest is not None and (year, month) > (newest.year, newest.month):
+            continue
+        if oldest is not None and (year, month) < (oldest.year, oldest.month):
+            break
+
+        with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+            for line in archive_file:
+                record = json.loads(line)
+                event_time = parse_datetime(record['event_time'])
+                key = (event_time, record['audit_id'])
+
+                if before is not None and key >= before:
+                    continue
+                if 'end' in filters and event_time >= filters['end']:
+                    continue
+                if 'start' in filters and event_time < filters['start']:
+                    continue
+                if 'event_type' in filters and record['event_type'] != filters['event_type']:
+                    continue
+                found[record['audit_id']] = (key, record)
+
+        # Older months only hold older rows, so a full page from this month is final
+        if len(found) >= limit:
+            break
+
+    newest_first = heapq.nlargest(limit, found.values(), key=lambda item: item[0])
+    return [record for _, record in newest_first]
+
+def audit_log_filters(args):
+    """Time window and event type filters; bare dates cover the whole day"""
+    filters = {}
+    if args.get('event_type'):
+        filters['event_type'] = args['event_type']
+    for key, name in (('start', 'date_from'), ('end', 'date_to')):
+        value = args.get(name)
+        if not value:
+            continue
+        try:
+            bound = parse_datetime(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an ISO date or datetime")
+        if key == 'end' and len(value) == 10:
+            # date_to=YYYY-MM-DD includes that whole day
+            bound += datetime.timedelta(days=1)
+        filters[key] = bound
+    return filters
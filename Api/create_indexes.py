@@ -0,0 +1,32 @@
+from flask import Flask
+from db import init_db, db
+
+# Create a Flask app
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'your_secret_key_here'
+app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://root:@localhost/themis_db'
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Initialize the database
+db = init_db(app)
+
+# Create any index declared on the models that the existing tables are missing
+# (db.create_all only adds indexes when it creates a table)
+with app.app_context():
+    inspector = db.inspect(db.engine)
+    existing_tables = inspector.get_table_names()
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                print(f"{table.name}.{index.name} already exists")
+                continue
+            
+            index.create(bind=db.engine)
+            print(f"Created {table.name}.{index.name}")
+
+print("Done")
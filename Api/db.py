@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, undefer_group
 import datetime
 
 # Initialize SQLAlchemy instance
@@ -10,12 +11,14 @@ class User(db.Model):
     __tablename__ = 'users'
     user_id = db.Column(db.Integer, primary_key=True)
     role_id = db.Column(db.Integer, nullable=False)
+    visitor_id = db.Column(db.Integer, nullable=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password_hash = db.Column(db.String(60), nullable=False)
     email = db.Column(db.String(100), nullable=True)
     full_name = db.Column(db.String(100), nullable=True)
     pin_hash = db.Column(db.String(60), nullable=True)
-    face_template = db.Column(db.LargeBinary, nullable=True)
+    # Biometric blob is deferred so ordinary User queries never fetch it
+    face_template = db.deferred(db.Column(db.LargeBinary, nullable=True), group='biometrics')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
     last_login = db.Column(db.DateTime, nullable=True)
 
@@ -40,6 +43,15 @@ class PUPC(db.Model):
     mugshot_path = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
     crime_id = db.Column(db.Integer, nullable=True)
+    
+    # Support the PUC list's name search, status filter and sort orders
+    __table_args__ = (
+        db.Index('idx_pupcs_name', 'last_name', 'first_name'),
+        db.Index('idx_pupcs_first_name', 'first_name'),
+        db.Index('idx_pupcs_status_name', 'status', 'last_name', 'first_name'),
+        db.Index('idx_pupcs_arrest_date', 'arrest_date'),
+        db.Index('idx_pupcs_created', 'created_at'),
+    )
 
 # Visitor model
 class Visitor(db.Model):
@@ -64,6 +76,25 @@ class VisitorLog(db.Model):
     approval_status = db.Column(db.String(20), nullable=False, default='Pending')
     approved_by = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    
+    # Keyset pagination walks (created_at, visitor_log_id); the filtered variants lead with the filter column
+    __table_args__ = (
+        db.Index('idx_visitorlogs_created', 'created_at', 'visitor_log_id'),
+        db.Index('idx_visitorlogs_status_created', 'approval_status', 'created_at', 'visitor_log_id'),
+        db.Index('idx_visitorlogs_visitor_created', 'visitor_id', 'created_at', 'visitor_log_id'),
+        db.Index('idx_visitorlogs_pupc_created', 'pupc_id', 'created_at', 'visitor_log_id'),
+        db.Index('idx_visitorlogs_visit_date', 'visit_date'),
+    )
+
+# VisitorApproval model: one row per officer decision on a visit request
+class VisitorApproval(db.Model):
+    __tablename__ = 'visitorapprovals'
+    approval_id = db.Column(db.Integer, primary_key=True)
+    visitor_log_id = db.Column(db.Integer, nullable=False, index=True)
+    approved_by = db.Column(db.Integer, nullable=False, index=True)
+    decision = db.Column(db.Enum('Approved', 'Rejected'), nullable=False)
+    decision_time = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    remarks = db.Column(db.String(255), nullable=True)
 
 # Blacklist model
 class Blacklist(db.Model):
@@ -83,6 +114,11 @@ class AuditLog(db.Model):
     event_time = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
     ip_address = db.Column(db.String(45), nullable=True)
     notes = db.Column(db.Text, nullable=True)
+    
+    # event_time already has its own index; this one serves event-type filtered windows
+    __table_args__ = (
+        db.Index('idx_auditlogs_type_time', 'event_type', 'event_time'),
+    )
 
 # CrimeCategory model
 class CrimeCategory(db.Model):
@@ -99,6 +135,51 @@ class CrimeType(db.Model):
     law_reference = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text, nullable=True)
 
+# CacheVersion model: per-table write counters shared by every worker
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Revocation model: per-user token cutoffs shared by every worker (see revocation.py)
+class Revocation(db.Model):
+    __tablename__ = 'revocations'
+    user_id = db.Column(db.Integer, primary_key=True)
+    cutoff_ms = db.Column(db.BigInteger, nullable=False, index=True)  # Tokens issued up to this epoch ms are rejected
+
+# StatCounter model: materialized dashboard counts (see stat_counters.py)
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    as_of = db.Column(db.Date, nullable=True)  # Day counted, for per-day counters
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+# FeedEvent model: ordered log behind the /api/events stream (see event_feed.py)
+class FeedEvent(db.Model):
+    __tablename__ = 'feed_events'
+    event_id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(32), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+# Columns loaded by the hot User lookups (auth, login, admin user management)
+USER_IDENTITY_COLUMNS = (
+    User.user_id, User.role_id, User.visitor_id, User.username,
+    User.email, User.full_name
+)
+USER_LOGIN_COLUMNS = (
+    User.user_id, User.role_id, User.visitor_id, User.username, User.password_hash
+)
+
+def user_query(*columns):
+    """User query restricted to the given columns (identity columns by default)"""
+    return User.query.options(load_only(*(columns or USER_IDENTITY_COLUMNS)))
+
+def load_user_with_templates(user_id):
+    """Explicit opt-in loader for code that needs the biometric templates"""
+    return User.query.options(undefer_group('biometrics')).filter_by(user_id=user_id).first()
+
 def init_db(app):
     """Initialize the database with the Flask app"""
     db.init_app(app)
@@ -4,6 +4,10 @@ import random
 import string
 import bcrypt
 
+from usernames import username_allocator, username_base
+from table_versions import table_versions
+from stat_counters import stat_counters
+
 # Check if arguments are provided
 if len(sys.argv) < 4:
     print("Usage: python direct_insert.py <pupc_id> <first_name> <last_name> [email] [relationship]")
@@ -26,20 +30,8 @@ conn = mysql.connector.connect(
 cursor = conn.cursor()
 
 try:
-    # Generate username and password
-    first_name_lower = first_name.lower()
-    last_name_lower = last_name.lower()
-    base_username = f"{first_name_lower[0]}{last_name_lower}"[:15]
-    
-    # Check if username exists and append number if needed
-    username = base_username
-    counter = 1
-    
-    cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
-    while cursor.fetchone():
-        username = f"{base_username}{counter}"
-        counter += 1
-        cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
+    # Generate username (one prefix lookup covers the base and its numbered forms)
+    username = username_allocator.allocate([username_base(first_name, last_name)], cursor=cursor)[0]
     
     # Generate random password
     password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
@@ -52,6 +44,8 @@ try:
         INSERT INTO visitors (first_name, last_name, relationship_to_puc, registered_at)
         VALUES (%s, %s, %s, NOW())
     """, (first_name, last_name, relationship))
+    table_versions.publish_raw(conn, 'visitors')
+    stat_counters.mark_stale_raw(conn, 'visitors')
     conn.commit()
     
     # Get the visitor_id
@@ -66,6 +60,8 @@ try:
         INSERT INTO users (username, password_hash, role_id, email, full_name, visitor_id, created_at)
         VALUES (%s, %s, %s, %s, %s, %s, NOW())
     """, (username, hashed_password, 3, email, full_name, visitor_id))
+    table_versions.publish_raw(conn, 'users')
+    stat_counters.mark_stale_raw(conn, 'users')
     conn.commit()
     
     # Get the user_id
@@ -78,6 +74,7 @@ try:
         (pupc_id, first_name, last_name, relationship, email, visitor_id, user_id, username, password, account_created)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
     """, (pupc_id, first_name, last_name, relationship, email, visitor_id, user_id, username, password))
+    table_versions.publish_raw(conn, 'approvedvisitors')
     conn.commit()
     
     # Get the approval_id
@@ -0,0 +1,212 @@
+import datetime
+import json
+import threading
+import time
+from collections import deque
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db import db, VisitorLog
+from fieldsets import iso
+
+# approval_status -> event type published when a visit log moves to it
+STATUS_EVENTS = {'Approved': 'visit_log.approved', 'Rejected': 'visit_log.rejected'}
+
+INSERT_EVENT = text(
+    "INSERT INTO feed_events (event_type, payload, created_at) VALUES (:event_type, :payload, :created_at)"
+)
+# cache_versions row every evented commit locks before inserting its events
+FEED_LOCK = 'feed_events'
+LOCK_FEED = text("UPDATE cache_versions SET version = version + 1 WHERE table_name = :table_name")
+
+def visit_log_payload(log):
+    return {
+        'visitor_log_id': log.visitor_log_id,
+        'pupc_id': log.pupc_id,
+        'visitor_id': log.visitor_id,
+        'visit_date': iso(log.visit_date),
+        'visit_time': iso(log.visit_time),
+        'purpose': log.purpose,
+        'approval_status': log.approval_status,
+        'approved_by': log.approved_by
+    }
+
+class EventFeed:
+    """Ordered visit-log and counter events for the /api/events stream
+
+    Events come from the write paths themselves: visit logs created or moved to
+    Approved/Rejected in an ORM flush, counters stat_counters refreshed, and anything
+    passed to record() by raw-SQL writers. They are inserted into feed_events in the
+    committing transaction, so their ids are a durable, cross-worker order that
+    reconnecting clients resume from with Last-Event-ID.
+
+    Streams on a worker share one reader: local commits wake them at once, and
+    writes made by other workers are picked up by a single indexed
+    "event_id > last" query per poll interval, however many clients are connected.
+    """
+
+    def __init__(self, poll_interval=1.0, buffer_size=1000):
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        # (event_id, event_type, payload json) newest last
+        self._buffer = deque(maxlen=buffer_size)
+        self._last_id = None
+        self._next_poll = 0.0
+        self.published = 0
+        self.polls = 0
+
+    def init_app(self, app):
+        self.poll_interval = app.config.get('EVENT_FEED_POLL', self.poll_interval)
+        # Registered after table_versions and stat_counters so counter changes are known here
+        for name, listener in (('after_flush', self._track_flush),
+                               ('before_commit', self._store),
+                               ('after_commit', self._notify),
+                               ('after_rollback', self._discard)):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+
+    def record(self, session, event_type, payload):
+        """Publish an event with the session's next commit (for writes that bypass the ORM)"""
+        session.info.setdefault('feed_events', []).append((event_type, payload))
+
+    def _track_flush(self, session, flush_context):
+        for instance in session.new:
+            if isinstance(instance, VisitorLog):
+                self.record(session, 'visit_log.created', visit_log_payload(instance))
+        for instance in session.dirty:
+            if isinstance(instance, VisitorLog):
+                added = inspect(instance).attrs.approval_status.history.added
+                if added and added[0] in STATUS_EVENTS:
+                    self.record(session, STATUS_EVENTS[added[0]], visit_log_payload(instance))
+
+    def _store(self, session):
+        session.flush()
+        events = session.info.pop('feed_events', [])
+        changes = session.info.pop('counter_changes', {})
+        if changes:
+            events.append(('counters', {
+                'values': {name: after for name, (before, after) in changes.items()},
+                'deltas': {name: after - before for name, (before, after) in changes.items()}
+            }))
+        if not events:
+            return
+
+        # All evented commits queue on one lock row, held until they commit or roll back,
+        # so feed_events ids are handed out in commit order and a poll can never move
+        # past an id that is still to commit. It is taken after every other lock of the
+        # commit (table_versions, stat_counters), so the lock order is the same everywhere.
+        self._lock_feed(session)
+        
+        # One multi-row insert; ids follow the order the events were recorded in
+        now = datetime.datetime.utcnow()
+        session.execute(INSERT_EVENT, [{
+            "event_type": event_type,
+            "payload": json.dumps(payload, default=str),
+            "created_at": now
+        } for event_type, payload in events])
+        session.info['feed_published'] = True
+        self.published += len(events)
+
+    def _lock_feed(self, session):
+        params = {"table_name": FEED_LOCK}
+        if session.execute(LOCK_FEED, params).rowcount:
+            return
+        # First evented commit against this database: create the lock row
+        try:
+            with session.begin_nested():
+                session.execute(
+                    text("INSERT INTO cache_versions (table_name, version) VALUES (:table_name, 0)"), params
+                )
+        except IntegrityError:
+            # Another worker created it meanwhile
+            pass
+        session.execute(LOCK_FEED, params)
+
+    def _notify(self, session):
+        if session.info.pop('feed_published', False):
+            # Read our own events back right away instead of waiting for the poll interval
+            self._next_poll = 0.0
+            with self._condition:
+                self._condition.notify_all()
+
+    def _discard(self, session):
+        session.info.pop('feed_events', None)
+        session.info.pop('counter_changes', None)
+        session.info.pop('feed_published', None)
+
+    def _fetch(self, after_id, limit=500):
+        with db.engine.connect() as connection:
+            return [tuple(row) for row in connection.execute(
+                text("SELECT event_id, event_type, payload FROM feed_events "
+                     "WHERE event_id > :after_id ORDER BY event_id LIMIT :limit"),
+                {"after_id": after_id, "limit": limit}
+            )]
+
+    def latest_id(self):
+        """Id of the newest event, where a client without Last-Event-ID starts"""
+        self.poll()
+        with self._condition:
+            return self._last_id or 0
+
+    def poll(self):
+        """Append events written since the last poll to the buffer (at most once per interval)"""
+        now = time.monotonic()
+        with self._condition:
+            if now < self._next_poll:
+                return
+            self._next_poll = now + self.poll_interval
+            last_id = self._last_id
+
+        rows = []
+        if last_id is None:
+            # First poll: start from the newest event rather than replaying the log
+            with db.engine.connect() as connection:
+                last_id = connection.execute(text("SELECT MAX(event_id) FROM feed_events")).scalar() or 0
+        else:
+            rows = self._fetch(last_id)
+
+        with self._condition:
+            self.polls += 1
+            for row in rows:
+                if self._last_id is None or row[0] > self._last_id:
+                    self._buffer.append(row)
+                    self._last_id = row[0]
+            if self._last_id is None:
+                self._last_id = last_id
+            if rows:
+                self._condition.notify_all()
+
+    def events_after(self, last_id, timeout):
+        """Events newer than last_id, waiting up to timeout seconds for one to arrive"""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.poll()
+            with self._condition:
+                if self._buffer:
+                    behind = self._buffer[0][0] > last_id + 1
+                else:
+                    behind = last_id < (self._last_id or 0)
+                if not behind:
+                    events = [row for row in self._buffer if row[0] > last_id]
+                    if events:
+                        return events
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return []
+                    self._condition.wait(min(remaining, self.poll_interval))
+                    continue
+            # The client resumed from further back than the buffer reaches
+            return self._fetch(last_id)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'poll_interval_seconds': self.poll_interval,
+                'buffered': len(self._buffer),
+                'last_event_id': self._last_id,
+                'published': self.published,
+                'polls': self.polls
+            }
+
+event_feed = EventFeed()
@@ -0,0 +1,50 @@
+def iso(value):
+    return value.isoformat() if value else None
+
+class Projection:
+    """Output fields of a read endpoint mapped to the SQL that produces them
+
+    fields maps each field name to (sql_expression, join_name, convert); join_name
+    picks an entry of joins the expression needs (or None) and convert post-processes
+    the raw value (or None). ?fields= narrows both the SELECT list and the payload,
+    and joins nobody asked for are left out of the statement.
+    """
+
+    def __init__(self, base, fields, joins=None, keys=(), extras=()):
+        self.base = base
+        self.fields = fields
+        self.joins = joins or {}
+        # Columns always selected (cursor keys, ids) even when not returned
+        self.keys = tuple(keys)
+        # Field names served outside the main statement, e.g. nested lists
+        self.extras = tuple(extras)
+
+    def requested(self, value):
+        """Field names selected by a ?fields= value; all fields when it is empty"""
+        if not value:
+            return list(self.fields) + list(self.extras)
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields and name not in self.extras]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        return names
+
+    def select(self, names):
+        """SELECT ... FROM ... with only the columns and joins the names need"""
+        columns = [name for name in dict.fromkeys(list(names) + list(self.keys)) if name in self.fields]
+        if not columns:
+            columns = list(self.fields)[:1]
+        needed = {self.fields[name][1] for name in columns}
+        joins = [sql for join_name, sql in self.joins.items() if join_name in needed]
+        select_list = ", ".join(f"{self.fields[name][0]} AS {name}" for name in columns)
+        return "SELECT " + select_list + "\n" + self.base + "\n" + "\n".join(joins) + "\n"
+
+    def serializer(self, names):
+        """Row -> dict for the requested names that come from the statement"""
+        converters = [(name, self.fields[name][2]) for name in names if name in self.fields]
+
+        def serialize(row):
+            mapping = row._mapping
+            return {name: convert(mapping[name]) if convert else mapping[name]
+                    for name, convert in converters}
+        return serialize
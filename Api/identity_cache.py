@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from table_versions import table_versions
+
+# Detached, read-only snapshot of the user columns routes read from current_user
+CachedUser = namedtuple('CachedUser', [
+    'user_id', 'role_id', 'username', 'email', 'full_name', 'visitor_id'
+])
+
+class IdentityCache:
+    """Bounded LRU cache of authenticated users keyed by user_id, with TTL eviction"""
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        """Read cache bounds from the Flask app config"""
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+        # Users changed or deleted by another worker reach us as a users version bump
+        table_versions.subscribe(self.invalidate_tables)
+
+    def invalidate_tables(self, tables):
+        if 'users' in tables:
+            self.clear()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user, expires_at = entry
+            if expires_at <= now:
+                # Expired entries count as a miss and are dropped eagerly
+                del self._entries[user_id]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def put(self, user):
+        """Snapshot a User row and store it; returns the snapshot"""
+        snapshot = CachedUser(
+            user_id=user.user_id,
+            role_id=user.role_id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            visitor_id=getattr(user, 'visitor_id', None)
+        )
+
+        with self._lock:
+            self._entries[snapshot.user_id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(snapshot.user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return snapshot
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                if user_id is not None and self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+# Shared instance used by token_required and the user write paths
+identity_cache = IdentityCache()
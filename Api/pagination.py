@@ -0,0 +1,63 @@
+import base64
+import datetime
+import json
+from flask import request, jsonify
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def page_size(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read ?limit= from the query string, clamped to [1, maximum]"""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+def optional_page_size(maximum=MAX_PAGE_SIZE):
+    """Like page_size(), but None when the request has no ?limit=, ?page= or ?cursor=
+
+    Clients written before paging expect the whole result from a bare request.
+    """
+    if not any(name in request.args for name in ('limit', 'page', 'cursor')):
+        return None
+    return page_size(maximum=maximum)
+
+def page_offset(limit):
+    """Row offset for the 1-based ?page= parameter"""
+    try:
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        raise ValueError("page must be an integer")
+    return (max(page, 1) - 1) * limit
+
+def encode_cursor(*values):
+    """Opaque cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value
+               for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; dates come back as ISO strings"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def parse_datetime(value):
+    return datetime.datetime.fromisoformat(value)
+
+def parse_date(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+
+def paged_response(items, next_cursor=None, total=None):
+    """JSON array body; the next-page cursor and total count travel in X-Next-Cursor / X-Total-Count"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    return response
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+
+from db import db
+
+class ParallelQueriesBusy(Exception):
+    """Raised when the pool is saturated: no room to queue the tasks or they waited too long to start"""
+
+class ParallelQueries:
+    """Worker pool that runs independent read sections of one request concurrently
+
+    Each task runs in its own application context, so it gets its own scoped
+    session and therefore its own pooled connection, released when the task ends.
+    Tasks must not touch request or g; pass anything they need from the request in.
+
+    The pool never has more workers than the engine has pooled connections, and
+    running plus queued tasks are bounded; a request whose tasks do not fit, or do
+    not start within queue_timeout, gets ParallelQueriesBusy instead of a bundle of
+    errors. Each task's timeout counts from when it starts running. A task that
+    overruns cannot be stopped, but keeps its slot until it finishes.
+    """
+
+    def __init__(self, max_workers=4, max_queue=16, timeout=15.0, queue_timeout=5.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.tasks = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('PARALLEL_QUERY_WORKERS', self.max_workers)
+        self.max_queue = app.config.get('PARALLEL_QUERY_QUEUE', self.max_queue)
+        self.timeout = app.config.get('PARALLEL_QUERY_TIMEOUT', self.timeout)
+        self.queue_timeout = app.config.get('PARALLEL_QUERY_QUEUE_TIMEOUT', self.queue_timeout)
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # More workers than pooled connections would only wait for a connection
+                pool_size = getattr(db.engine.pool, 'size', None)
+                if callable(pool_size):
+                    self.max_workers = max(1, min(self.max_workers, pool_size()))
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='parallel-queries'
+                )
+                # Running plus queued tasks may never exceed workers + queue depth
+                self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+            return self._executor
+
+    def _run(self, app, task, started, name):
+        started[name] = time.monotonic()
+        try:
+            with app.app_context():
+                try:
+                    return task()
+                finally:
+                    db.session.remove()
+        finally:
+            self._slots.release()
+
+    def _reserve(self, count):
+        acquired = 0
+        while acquired < count and self._slots.acquire(blocking=False):
+            acquired += 1
+        if acquired < count:
+            for _ in range(acquired):
+                self._slots.release()
+            with self._lock:
+                self.rejected += 1
+            raise ParallelQueriesBusy('Parallel query queue is full')
+
+    def _give_up(self, futures, started):
+        """Withdraw the tasks that never started and report the pool as saturated"""
+        for name, future in futures.items():
+            if name not in started and future.cancel():
+                self._slots.release()
+        with self._lock:
+            self.rejected += 1
+        raise ParallelQueriesBusy('Parallel query pool is saturated')
+
+    def run(self, tasks):
+        """Run {name: callable} concurrently; returns ({name: result}, {name: error message})"""
+        app = current_app._get_current_object()
+        pool = self._pool()
+        self._reserve(len(tasks))
+
+        started = {}
+        submitted_at = time.monotonic()
+        futures = {name: pool.submit(self._run, app, task, started, name) for name, task in tasks.items()}
+
+        results, errors = {}, {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            deadlines = []
+            for name in list(pending):
+                if futures[name].done():
+                    pending.discard(name)
+                elif name in started:
+                    if now >= started[name] + self.timeout:
+                        errors[name] = "Timed out"
+                        pending.discard(name)
+                    else:
+                        deadlines.append(started[name] + self.timeout)
+                elif now >= submitted_at + self.queue_timeout:
+                    self._give_up(futures, started)
+                else:
+                    deadlines.append(submitted_at + self.queue_timeout)
+            if pending:
+                wait([futures[name] for name in pending], timeout=max(0, min(deadlines) - now),
+                     return_when=FIRST_COMPLETED)
+
+        for name, future in futures.items():
+            if name in errors:
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                current_app.logger.error(f"Error loading {name}: {str(e)}")
+                errors[name] = str(e)
+
+        with self._lock:
+            self.batches += 1
+            self.tasks += len(tasks)
+            self.failures += sum(1 for message in errors.values() if message != "Timed out")
+            self.timeouts += sum(1 for message in errors.values() if message == "Timed out")
+        return results, errors
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'timeout_seconds': self.timeout,
+                'queue_timeout_seconds': self.queue_timeout,
+                'batches': self.batches,
+                'tasks': self.tasks,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected
+            }
+
+# Shared pool for composite endpoints such as /api/dashboard/bundle
+parallel_queries = ParallelQueries()
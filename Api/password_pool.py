@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask_bcrypt import Bcrypt
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing pool is saturated or a hash job timed out"""
+
+class PasswordPool:
+    """Bounded worker pool that runs bcrypt hashing and verification off the request thread"""
+
+    def __init__(self, max_workers=2, max_queue=32, timeout=10.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.bcrypt = Bcrypt()
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._reset_metrics()
+
+    def init_app(self, app):
+        """Read pool bounds from the Flask app config and honour BCRYPT_* settings"""
+        self.max_workers = app.config.get('PASSWORD_POOL_WORKERS', self.max_workers)
+        self.max_queue = app.config.get('PASSWORD_POOL_QUEUE', self.max_queue)
+        self.timeout = app.config.get('PASSWORD_POOL_TIMEOUT', self.timeout)
+        self.bcrypt.init_app(app)
+        self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='password-pool'
+            )
+            # Running plus queued jobs may never exceed workers + queue depth
+            self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+    def _reset_metrics(self):
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    def _run(self, fn, args, enqueued_at):
+        started_at = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            finished_at = time.monotonic()
+            waited = started_at - enqueued_at
+            with self._lock:
+                self.completed += 1
+                self.in_flight -= 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                self.run_total += finished_at - started_at
+            self._slots.release()
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            self._start()
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy('Password hashing queue is full')
+
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+
+        future = self._executor.submit(self._run, fn, args, time.monotonic())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # A job that never started gives its slot back straight away
+            if future.cancel():
+                with self._lock:
+                    self.in_flight -= 1
+                self._slots.release()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordPoolBusy('Password hashing timed out')
+
+    def hash(self, password):
+        """Return a bcrypt hash of password as text"""
+        return self._submit(self.bcrypt.generate_password_hash, password).decode('utf-8')
+
+    def verify(self, password_hash, password):
+        return self._submit(self.bcrypt.check_password_hash, password_hash, password)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'timeout_seconds': self.timeout,
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_queue_wait_ms': round(self.wait_total / self.completed * 1000, 2) if self.completed else 0.0,
+                'max_queue_wait_ms': round(self.wait_max * 1000, 2),
+                'avg_hash_ms': round(self.run_total / self.completed * 1000, 2) if self.completed else 0.0
+            }
+
+# Shared pool used by login, signup and the account-creation helpers
+password_pool = PasswordPool()
@@ -0,0 +1,188 @@
+import csv
+import datetime
+import io
+import json
+from sqlalchemy import text
+
+from db import db
+from pagination import parse_date
+from reference_cache import reference_cache
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Columns of pupcs a bulk import writes, in INSERT order
+IMPORT_COLUMNS = ('first_name', 'last_name', 'gender', 'age', 'arrest_date', 'release_date',
+                  'status', 'category_id', 'crime_id', 'mugshot_path', 'created_at')
+
+def import_format(requested, filename, content_type):
+    """csv or jsonl, from ?format=, the upload's file name or its content type"""
+    if requested:
+        fmt = requested.lower()
+    elif filename and '.' in filename:
+        fmt = filename.rsplit('.', 1)[1].lower()
+    else:
+        fmt = 'jsonl' if 'json' in (content_type or '') else 'csv'
+    fmt = {'ndjson': 'jsonl', 'json': 'jsonl'}.get(fmt, fmt)
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+def read_import(stream, fmt):
+    """(line, record, parse error) for each row of a CSV or JSONL upload, read incrementally"""
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is not None:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "More values than header columns"
+            else:
+                yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if isinstance(record, dict):
+            yield line_number, {str(key).lower(): value for key, value in record.items()}, None
+        else:
+            yield line_number, None, "Each line must be a JSON object"
+
+class ReferenceNames:
+    """Crime and category names to ids, built once per import from the reference cache"""
+
+    def __init__(self):
+        self.categories = {}
+        for row in reference_cache.categories():
+            self.categories.setdefault(row['name'].strip().lower(), []).append(row['category_id'])
+        self.crimes = {}
+        for row in reference_cache.crime_types():
+            self.crimes.setdefault(row['name'].strip().lower(), []).append(row)
+
+    def category_id(self, name):
+        ids = self.categories.get(name.strip().lower(), [])
+        if not ids:
+            raise ValueError(f"Unknown category: {name}")
+        if len(ids) > 1:
+            raise ValueError(f"Category name is ambiguous: {name}")
+        return ids[0]
+
+    def crime(self, name, category_id=None):
+        rows = [row for row in self.crimes.get(name.strip().lower(), [])
+                if category_id is None or row['category_id'] == category_id]
+        if not rows:
+            raise ValueError(f"Unknown crime: {name}" if category_id is None
+                             else f"Unknown crime in category {category_id}: {name}")
+        if len(rows) > 1:
+            raise ValueError(f"Crime name is ambiguous, give a category: {name}")
+        return rows[0]
+
+def _value(record, field):
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in (None, '') else value
+
+def _integer(record, field):
+    value = _value(record, field)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer")
+
+def import_row(record, names):
+    """INSERT parameters for one import record; raises ValueError describing the first problem"""
+    for field in ('first_name', 'last_name'):
+        if not _value(record, field):
+            raise ValueError(f"Missing required field: {field}")
+
+    age = _integer(record, 'age')
+    if age is not None and not 0 <= age <= 150:
+        raise ValueError("age must be between 0 and 150")
+    arrest_date = _value(record, 'arrest_date')
+    arrest_date = parse_date(arrest_date, 'arrest_date') if arrest_date else None
+    release_date = _value(record, 'release_date')
+    release_date = parse_date(release_date, 'release_date') if release_date else None
+    if arrest_date and release_date and release_date < arrest_date:
+        raise ValueError("release_date is before arrest_date")
+
+    # Ids win over names; names resolve in memory, a crime's category fills a missing one
+    category_id = _integer(record, 'category_id')
+    if category_id is not None:
+        if reference_cache.category(category_id) is None:
+            raise ValueError(f"Unknown category_id: {category_id}")
+    elif _value(record, 'category'):
+        category_id = names.category_id(_value(record, 'category'))
+
+    crime_id = _integer(record, 'crime_id')
+    if crime_id is not None:
+        crime = reference_cache.crime_type(crime_id)
+        if crime is None:
+            raise ValueError(f"Unknown crime_id: {crime_id}")
+    elif _value(record, 'crime'):
+        crime = names.crime(_value(record, 'crime'), category_id)
+        crime_id = crime['crime_id']
+    else:
+        crime = None
+    if crime is not None:
+        if category_id is None:
+            category_id = crime['category_id']
+        elif crime['category_id'] is not None and crime['category_id'] != category_id:
+            raise ValueError(f"Crime {crime['name']} is not in category {category_id}")
+
+    return {
+        'first_name': _value(record, 'first_name'),
+        'last_name': _value(record, 'last_name'),
+        'gender': _value(record, 'gender'),
+        'age': age,
+        'arrest_date': arrest_date,
+        'release_date': release_date,
+        'status': _value(record, 'status') or 'In Custody',
+        'category_id': category_id,
+        'crime_id': crime_id,
+        'mugshot_path': _value(record, 'mugshot_path')
+    }
+
+def insert_pucs(rows):
+    """Insert rows into pupcs with one multi-row INSERT in the caller's transaction; returns their ids
+
+    The driver's lastrowid is the id of the first row. InnoDB hands a multi-row INSERT
+    of known size one run of AUTO_INCREMENT values spaced by @@auto_increment_increment,
+    so the ids are read back over that run and checked before they are reported; a run
+    that does not hold exactly our rows raises and the caller rolls the chunk back.
+    """
+    now = datetime.datetime.utcnow()
+    values = []
+    params = {}
+    for index, row in enumerate(rows):
+        values.append("(" + ", ".join(f":{column}{index}" for column in IMPORT_COLUMNS) + ")")
+        for column in IMPORT_COLUMNS:
+            params[f"{column}{index}"] = now if column == 'created_at' else row[column]
+    result = db.session.execute(
+        text(f"INSERT INTO pupcs ({', '.join(IMPORT_COLUMNS)}) VALUES " + ", ".join(values)), params
+    )
+    first_id = result.lastrowid
+    step = db.session.execute(text("SELECT @@auto_increment_increment")).scalar() or 1
+
+    # Rows other transactions committed inside the run would show up here too
+    inserted = db.session.execute(
+        text("""
+            SELECT pupc_id, first_name, last_name FROM pupcs
+            WHERE pupc_id >= :first_id AND pupc_id <= :last_id
+            ORDER BY pupc_id
+        """),
+        {"first_id": first_id, "last_id": first_id + (len(rows) - 1) * step}
+    ).fetchall()
+    if ([row.pupc_id for row in inserted] != list(range(first_id, first_id + len(rows) * step, step))
+            or [(row.first_name, row.last_name) for row in inserted]
+            != [(row['first_name'], row['last_name']) for row in rows]):
+        raise RuntimeError(f"Could not read back the ids of {len(rows)} PUCs inserted from id {first_id}")
+    return [row.pupc_id for row in inserted]
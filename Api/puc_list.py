@@ -0,0 +1,128 @@
+from sqlalchemy import text
+
+from db import db
+from pagination import parse_date
+from fieldsets import Projection, iso
+from reference_cache import reference_cache
+
+# Crime type and category columns are resolved from the reference cache rather than
+# joined; both lookups behave like the LEFT JOINs they replace (None when unmatched)
+def crime_type_column(column):
+    return reference_cache.column('crimetypes', column)
+
+def category_column(column):
+    return reference_cache.column('crimecategories', column)
+
+# Row shape of GET /pucs
+PUC_LIST_FIELDS = Projection(
+    "FROM pupcs p",
+    {
+        'pupc_id': ("p.pupc_id", None, None),
+        'first_name': ("p.first_name", None, None),
+        'last_name': ("p.last_name", None, None),
+        'gender': ("p.gender", None, None),
+        'age': ("p.age", None, None),
+        'arrest_date': ("p.arrest_date", None, iso),
+        'release_date': ("p.release_date", None, iso),
+        'status': ("p.status", None, None),
+        'category_id': ("p.category_id", None, None),
+        'mugshot_path': ("p.mugshot_path", None, None),
+        'created_at': ("p.created_at", None, iso),
+        'crime_id': ("p.crime_id", None, None),
+        'crime_type_name': ("p.crime_id", None, crime_type_column('name')),
+        'law_reference': ("p.crime_id", None, crime_type_column('law_reference')),
+        'description': ("p.crime_id", None, crime_type_column('description')),
+        'crime_category': ("p.category_id", None, category_column('name'))
+    }
+)
+
+# Row shape of GET /pucs/<id>; approved_visitors is a second query run only when asked for
+PUC_DETAIL_FIELDS = Projection(
+    "FROM pupcs p",
+    {
+        'pupc_id': ("p.pupc_id", None, None),
+        'first_name': ("p.first_name", None, None),
+        'last_name': ("p.last_name", None, None),
+        'gender': ("p.gender", None, None),
+        'age': ("p.age", None, None),
+        'arrest_date': ("p.arrest_date", None, iso),
+        'release_date': ("p.release_date", None, iso),
+        'status': ("p.status", None, None),
+        'mugshot_path': ("p.mugshot_path", None, None),
+        'category_name': ("p.category_id", None, category_column('name')),
+        'crime_name': ("p.crime_id", None, crime_type_column('name')),
+        'category_id': ("p.category_id", None, category_column('category_id')),
+        'crime_id': ("p.crime_id", None, crime_type_column('crime_id'))
+    },
+    keys=('pupc_id',),
+    extras=('approved_visitors',)
+)
+
+# Whitelisted ?sort= values; pupc_id breaks ties so pages are stable
+PUC_SORTS = {
+    'name': "p.last_name, p.first_name, p.pupc_id",
+    '-name': "p.last_name DESC, p.first_name DESC, p.pupc_id DESC",
+    'arrest_date': "p.arrest_date, p.pupc_id",
+    '-arrest_date': "p.arrest_date DESC, p.pupc_id DESC",
+    'created_at': "p.created_at, p.pupc_id",
+    '-created_at': "p.created_at DESC, p.pupc_id DESC",
+    'status': "p.status, p.last_name, p.first_name, p.pupc_id"
+}
+
+def puc_list_filters(args):
+    """Collect the server-side PUC list filters from the query string"""
+    filters = {}
+    if args.get('q', '').strip():
+        filters['q'] = args['q'].strip()
+    if args.get('status'):
+        filters['status'] = args['status']
+    for key in ('category_id', 'crime_id'):
+        if args.get(key):
+            try:
+                filters[key] = int(args[key])
+            except ValueError:
+                raise ValueError(f"{key} must be an integer")
+    if args.get('arrest_from'):
+        filters['arrest_from'] = parse_date(args['arrest_from'], 'arrest_from')
+    if args.get('arrest_to'):
+        filters['arrest_to'] = parse_date(args['arrest_to'], 'arrest_to')
+    return filters
+
+def puc_where(filters):
+    """WHERE clause (possibly empty) and params for the filters on pupcs aliased as p"""
+    clauses = []
+    params = {}
+
+    if 'q' in filters:
+        # Every search term must prefix-match the first or last name, so the name indexes apply
+        for i, term in enumerate(filters['q'].split()[:5]):
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append(f"(p.first_name LIKE :q{i} OR p.last_name LIKE :q{i})")
+            params[f'q{i}'] = f"{escaped}%"
+    if 'status' in filters:
+        clauses.append("p.status = :status")
+        params['status'] = filters['status']
+    if 'category_id' in filters:
+        clauses.append("p.category_id = :category_id")
+        params['category_id'] = filters['category_id']
+    if 'crime_id' in filters:
+        clauses.append("p.crime_id = :crime_id")
+        params['crime_id'] = filters['crime_id']
+    if 'arrest_from' in filters:
+        clauses.append("p.arrest_date >= :arrest_from")
+        params['arrest_from'] = filters['arrest_from']
+    if 'arrest_to' in filters:
+        clauses.append("p.arrest_date <= :arrest_to")
+        params['arrest_to'] = filters['arrest_to']
+
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+def puc_order_by(sort):
+    if sort not in PUC_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(PUC_SORTS)}")
+    return " ORDER BY " + PUC_SORTS[sort]
+
+def count_pucs(where, params):
+    """Total rows matching the filters; only touches pupcs"""
+    return db.session.execute(text("SELECT COUNT(*) FROM pupcs p" + where), params).scalar()
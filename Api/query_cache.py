@@ -0,0 +1,151 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+
+from db import db
+from table_versions import table_versions
+
+# Tables a statement reads, for tagging entries when no explicit tables are given
+READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+
+class QueryCacheEntry:
+    __slots__ = ('rows', 'tables', 'versions', 'expires_at', 'created_at', 'build_ms', 'hits', 'last_hit')
+
+    def __init__(self, rows, tables, versions, ttl, build_ms):
+        self.rows = rows
+        self.tables = tables
+        self.versions = versions
+        self.created_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+        self.build_ms = build_ms
+        self.hits = 0
+        self.last_hit = None
+
+class QueryCache:
+    """Bounded LRU/TTL cache of read query results, tagged by the tables they read
+
+    Entries are keyed by SQL text and parameters. A commit that writes any tagged
+    table evicts the entry through table_versions (which listens to after_commit),
+    and each entry also remembers the table versions it was built at. A miss is read
+    on its own connection in a transaction that starts after those versions were
+    taken, never through the caller's session, whose REPEATABLE READ snapshot may
+    predate commits already published; a result whose versions moved while it was
+    read is not stored.
+    """
+
+    def __init__(self, max_size=256, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # table -> keys of the entries tagged with it
+        self._by_table = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        """Read cache bounds from the Flask app config"""
+        self.max_size = app.config.get('QUERY_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('QUERY_CACHE_TTL', self.ttl)
+        table_versions.subscribe(self.invalidate_tables)
+
+    def _key(self, sql, params):
+        return (sql, tuple(sorted((params or {}).items())))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for table in entry.tables:
+                keys = self._by_table.get(table)
+                if keys is not None:
+                    keys.discard(key)
+        return entry
+
+    def fetch(self, sql, params=None, tables=None, ttl=None):
+        """All rows of a read-only SQL statement, from the cache when still valid"""
+        key = self._key(sql, params)
+        tables = tuple(tables or sorted({name.lower() for name in READ_TABLES.findall(sql)}))
+        versions = table_versions.snapshot(tables)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > time.monotonic() and entry.versions == versions:
+                    self._entries.move_to_end(key)
+                    entry.hits += 1
+                    entry.last_hit = time.time()
+                    self.hits += 1
+                    return entry.rows
+                self._drop(key)
+                self.evictions += 1
+            self.misses += 1
+
+        if set(tables) & db.session.info.get('written_tables', set()):
+            # The caller's own uncommitted writes must show up in what it reads
+            return db.session.execute(text(sql), params or {}).fetchall()
+
+        started = time.perf_counter()
+        with db.engine.connect() as connection:
+            rows = connection.execute(text(sql), params or {}).fetchall()
+            connection.commit()
+        build_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            # Only store results no commit could have overtaken while they were read
+            if table_versions.snapshot(tables) == versions:
+                self._drop(key)
+                self._entries[key] = QueryCacheEntry(rows, tables, versions, ttl or self.ttl, build_ms)
+                for table in tables:
+                    self._by_table.setdefault(table, set()).add(key)
+                while len(self._entries) > self.max_size:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        return rows
+
+    def scalar(self, sql, params=None, tables=None, ttl=None):
+        rows = self.fetch(sql, params, tables, ttl)
+        return rows[0][0] if rows else None
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                for key in list(self._by_table.pop(table, ())):
+                    if self._drop(key) is not None:
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+
+    def stats(self, top=20):
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = sorted(self._entries.items(), key=lambda item: item[1].hits, reverse=True)[:top]
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': [{
+                    'sql': " ".join(key[0].split())[:200],
+                    'params': dict(key[1]),
+                    'tables': list(entry.tables),
+                    'hits': entry.hits,
+                    'build_ms': round(entry.build_ms, 2),
+                    'created_at': entry.created_at,
+                    'last_hit': entry.last_hit
+                } for key, entry in entries]
+            }
+
+# Shared instance used by the dashboard, stats and report routes
+query_cache = QueryCache()
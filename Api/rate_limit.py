@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+
+from shared_cache import MemoryStore, shared_cache
+
+class MemoryBackend:
+    """Per-process sliding-window log of attempt timestamps"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, now):
+        """Record an attempt and return how many fall inside the window"""
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                if len(self._attempts) >= self.max_keys:
+                    self._prune(window, now)
+                attempts = self._attempts[key] = deque()
+
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            attempts.append(now)
+            return len(attempts)
+
+    def _prune(self, window, now):
+        stale = [key for key, attempts in self._attempts.items()
+                 if not attempts or attempts[-1] <= now - window]
+        for key in stale:
+            del self._attempts[key]
+
+class SharedBackend:
+    """Sliding-window counter over a shared store exposing incr/expire/get, e.g. a redis.Redis client"""
+
+    def __init__(self, store, prefix='ratelimit'):
+        self.store = store
+        self.prefix = prefix
+
+    def hit(self, key, window, now):
+        bucket = int(now // window)
+        current_key = f"{self.prefix}:{key}:{bucket}"
+        previous_key = f"{self.prefix}:{key}:{bucket - 1}"
+
+        current = int(self.store.incr(current_key))
+        if current == 1:
+            # Keep the bucket around long enough to weigh into the next window
+            self.store.expire(current_key, int(window * 2))
+        previous = int(self.store.get(previous_key) or 0)
+
+        # Weight the previous bucket by how much of it still overlaps the window
+        overlap = 1 - (now % window) / window
+        return current + previous * overlap
+
+def backend_from_url(url):
+    """Build a backend from RATE_LIMIT_STORAGE_URL: shared://, memory://, local:// or redis://host:port/db"""
+    if not url or url.startswith('memory://'):
+        return MemoryBackend()
+    if url.startswith('shared://'):
+        # Counters live in the shared cache store, so every node sharing it sees them
+        return SharedBackend(shared_cache.store, prefix=f"{shared_cache.prefix}:ratelimit")
+    if url.startswith('local://'):
+        return SharedBackend(MemoryStore())
+    if url.startswith('redis://'):
+        import redis  # Only needed for multi-worker deployments
+        return SharedBackend(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported rate limit storage: {url}")
+
+class LoginRateLimiter:
+    """Throttles login attempts per username and per remote address before any DB or bcrypt work"""
+
+    def __init__(self, backend=None, max_per_user=10, max_per_ip=30, window=60):
+        self.backend = backend or MemoryBackend()
+        self.max_per_user = max_per_user
+        self.max_per_ip = max_per_ip
+        self.window = window
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled_user = 0
+        self.throttled_ip = 0
+        self.backend_errors = 0
+
+    def init_app(self, app):
+        self.max_per_user = app.config.get('LOGIN_RATE_LIMIT_PER_USER', self.max_per_user)
+        self.max_per_ip = app.config.get('LOGIN_RATE_LIMIT_PER_IP', self.max_per_ip)
+        self.window = app.config.get('LOGIN_RATE_LIMIT_WINDOW', self.window)
+        self.backend = backend_from_url(app.config.get('RATE_LIMIT_STORAGE_URL'))
+
+    def check(self, username, remote_addr):
+        """Record an attempt; returns (allowed, retry_after_seconds)"""
+        now = time.time()
+        try:
+            user_count = self.backend.hit(f"login:user:{(username or '').strip().lower()}", self.window, now)
+            ip_count = self.backend.hit(f"login:ip:{remote_addr or 'unknown'}", self.window, now)
+        except Exception:
+            # An unreachable shared store must not lock everybody out
+            with self._lock:
+                self.backend_errors += 1
+                self.allowed += 1
+            return True, 0
+
+        with self._lock:
+            if user_count > self.max_per_user:
+                self.throttled_user += 1
+                return False, self.window
+            if ip_count > self.max_per_ip:
+                self.throttled_ip += 1
+                return False, self.window
+            self.allowed += 1
+            return True, 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'window_seconds': self.window,
+                'max_per_user': self.max_per_user,
+                'max_per_ip': self.max_per_ip,
+                'allowed': self.allowed,
+                'throttled': self.throttled_user + self.throttled_ip,
+                'throttled_by_user': self.throttled_user,
+                'throttled_by_ip': self.throttled_ip,
+                'backend_errors': self.backend_errors
+            }
+
+# Shared limiter used by the login route
+login_limiter = LoginRateLimiter()
@@ -0,0 +1,12 @@
+from app import create_app
+from stat_counters import stat_counters
+
+# Recount every materialized dashboard counter from the source tables.
+# Usage: python reconcile_counters.py (e.g. nightly, or after bulk imports made outside the API)
+app = create_app()
+
+with app.app_context():
+    for name, value in stat_counters.reconcile().items():
+        print(f"{name}: {value}")
+
+print("Done")
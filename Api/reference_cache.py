@@ -0,0 +1,98 @@
+import threading
+import time
+from sqlalchemy import text
+
+from db import db
+from table_versions import table_versions
+from shared_cache import shared_cache
+
+# table -> (load query, primary key)
+REFERENCE_TABLES = {
+    'crimetypes': ("SELECT crime_id, category_id, name, law_reference, description "
+                   "FROM crimetypes ORDER BY crime_id", 'crime_id'),
+    'crimecategories': ("SELECT category_id, name FROM crimecategories ORDER BY category_id", 'category_id'),
+    'roles': ("SELECT role_id, name FROM roles ORDER BY role_id", 'role_id')
+}
+
+class ReferenceCache:
+    """Read-mostly in-memory copies of the crime taxonomy and roles
+
+    Each table is loaded whole on first use and reloaded when its table_versions
+    counter moves (any committed write to it) or the TTL passes, which bounds how
+    long a write made by another process can go unseen. Lookups are dict reads, so
+    list and report queries can resolve names here instead of joining.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # table -> (version, loaded_at, {primary key: row dict})
+        self._tables = {}
+        self.reloads = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('REFERENCE_CACHE_TTL', self.ttl)
+        self.invalidate()
+
+    def _rows(self, table):
+        version = table_versions.version(table)
+        entry = self._tables.get(table)
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+            return entry[2]
+
+        with self._lock:
+            entry = self._tables.get(table)
+            if entry is None or entry[0] != version or time.monotonic() - entry[1] >= self.ttl:
+                query, key = REFERENCE_TABLES[table]
+                # Another node has usually loaded this version already
+                loaded = shared_cache.for_tables(
+                    f"reference:{table}", (table,),
+                    lambda: [dict(row) for row in db.session.execute(text(query)).mappings()],
+                    ttl=self.ttl
+                )
+                rows = {row[key]: row for row in loaded}
+                entry = (version, time.monotonic(), rows)
+                self._tables[table] = entry
+                self.reloads += 1
+            return entry[2]
+
+    def crime_types(self):
+        return list(self._rows('crimetypes').values())
+
+    def crime_type(self, crime_id):
+        return self._rows('crimetypes').get(crime_id)
+
+    def categories(self):
+        return list(self._rows('crimecategories').values())
+
+    def category(self, category_id):
+        return self._rows('crimecategories').get(category_id)
+
+    def category_ids_named(self, name):
+        return [category_id for category_id, row in self._rows('crimecategories').items()
+                if row['name'] == name]
+
+    def role(self, role_id):
+        return self._rows('roles').get(role_id)
+
+    def column(self, table, column):
+        """Converter from a primary key to one column of the cached row (None when missing)"""
+        def convert(key):
+            row = self._rows(table).get(key)
+            return row[column] if row else None
+        return convert
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables or list(self._tables):
+                self._tables.pop(table, None)
+
+    def stats(self):
+        return {
+            'ttl_seconds': self.ttl,
+            'reloads': self.reloads,
+            'tables': {table: {'rows': len(entry[2]), 'version': entry[0]}
+                       for table, entry in self._tables.items()}
+        }
+
+reference_cache = ReferenceCache()
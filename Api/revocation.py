@@ -0,0 +1,101 @@
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+from table_versions import table_versions
+
+class RevocationIndex:
+    """Compact in-memory map of user_id -> cutoff time; tokens issued before it are rejected
+
+    Cutoffs are written to the revocations table, whose cache_versions counter tells
+    every other worker (through table_versions polling) to reload the map, so a
+    token revoked on one worker stops working on all of them within a poll interval.
+    """
+
+    def __init__(self, retention=24 * 3600):
+        # Cutoffs older than the longest token lifetime can no longer match a live token
+        self.retention = retention
+        self._cutoffs = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.revocations = 0
+        self.rejections = 0
+        self.reloads = 0
+
+    def init_app(self, app):
+        self.retention = app.config.get('REFRESH_TOKEN_HOURS', 24) * 3600
+        table_versions.subscribe(self._tables_written)
+        with self._lock:
+            self._loaded = False
+
+    def _tables_written(self, tables):
+        if 'revocations' in tables:
+            with self._lock:
+                self._loaded = False
+
+    def _load(self):
+        oldest = int((time.time() - self.retention) * 1000)
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                text("SELECT user_id, cutoff_ms FROM revocations WHERE cutoff_ms >= :oldest"),
+                {"oldest": oldest}
+            ).fetchall()
+        with self._lock:
+            self._cutoffs = {user_id: cutoff_ms / 1000 for user_id, cutoff_ms in rows}
+            self._loaded = True
+            self.reloads += 1
+
+    def revoke_user(self, *user_ids):
+        """Reject every token issued to these users up to now, on every worker
+
+        Only adds the cutoffs to the caller's open transaction on db.session, so they
+        commit (or roll back) with the change that calls for them; the commit's
+        revocations bump then reloads the map here and on the other workers.
+        """
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        if not user_ids:
+            return
+        now = time.time()
+        for user_id in user_ids:
+            row = {"user_id": user_id, "cutoff_ms": int(now * 1000)}
+            if db.session.execute(
+                text("UPDATE revocations SET cutoff_ms = :cutoff_ms WHERE user_id = :user_id"), row
+            ).rowcount == 0:
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(
+                            text("INSERT INTO revocations (user_id, cutoff_ms) VALUES (:user_id, :cutoff_ms)"), row
+                        )
+                except IntegrityError:
+                    # Revoked on another worker at the same time; either cutoff will do
+                    pass
+        db.session.execute(
+            text("DELETE FROM revocations WHERE cutoff_ms < :oldest"),
+            {"oldest": int((now - self.retention) * 1000)}
+        )
+        with self._lock:
+            self.revocations += len(user_ids)
+
+    def is_revoked(self, user_id, issued_at):
+        if not self._loaded:
+            self._load()
+        with self._lock:
+            cutoff = self._cutoffs.get(user_id)
+            if cutoff is not None and (issued_at is None or issued_at <= cutoff):
+                self.rejections += 1
+                return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._cutoffs),
+                'revocations': self.revocations,
+                'rejections': self.rejections,
+                'reloads': self.reloads
+            }
+
+# Shared index consulted by token_required and the token refresh endpoint
+revocation_index = RevocationIndex()
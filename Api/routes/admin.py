@@ -1,54 +1,81 @@
 from flask import Blueprint, jsonify, request, current_app
 import traceback
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 import datetime
 
 from db import db, PUPC, Visitor, VisitorLog, User, Role
 from routes.auth import token_required
+from table_versions import conditional_get, table_versions
+from identity_cache import identity_cache
+from password_pool import password_pool
+from revocation import revocation_index
+from rate_limit import login_limiter
+from pagination import page_size, optional_page_size, paged_response, encode_cursor, decode_cursor, parse_datetime
+from audit_archive import AUDIT_LOG_QUERY, audit_log_filters, serialize_audit_log, query_archive
+from visitor_logs import (fetch_visitor_logs, visitor_log_filters, visitor_log_statement, VISITOR_LOG_FIELDS,
+                          PENDING_APPROVALS_QUERY, serialize_pending_approval)
+from fieldsets import Projection, iso
+from reference_cache import reference_cache
+from query_cache import query_cache
+from shared_cache import shared_cache
+from stat_counters import stat_counters
+from parallel_queries import parallel_queries
+from event_feed import event_feed
+from usernames import username_allocator
+from streaming import wants_stream, stream_json_array
+from single_flight import coalesced, single_flight
 
 # Create blueprint
 admin_bp = Blueprint('admin', __name__)
 
+# role_name comes from the reference cache; users.role_id is a NOT NULL foreign key
+USER_FIELDS = Projection(
+    "FROM users u",
+    {
+        'user_id': ("u.user_id", None, None),
+        'username': ("u.username", None, None),
+        'role_id': ("u.role_id", None, None),
+        'role_name': ("u.role_id", None, reference_cache.column('roles', 'name')),
+        'email': ("u.email", None, None),
+        'full_name': ("u.full_name", None, None),
+        'created_at': ("u.created_at", None, iso),
+        'last_login': ("u.last_login", None, iso)
+    }
+)
+
 @admin_bp.route('/visitor-logs', methods=['GET'])
 @token_required
+@conditional_get('visitorlogs', 'pupcs', 'visitors')
 def get_visitor_logs_admin(current_user):
     try:
         # Check if user is admin
         if current_user.role_id != 1:
             return jsonify({"error": "Unauthorized"}), 403
             
-        # Get all visitor logs with PUC and visitor names
-        query = """
-        SELECT vl.visitor_log_id, vl.pupc_id, vl.visitor_id, 
-               p.first_name as pupc_first_name, p.last_name as pupc_last_name,
-               v.first_name as visitor_first_name, v.last_name as visitor_last_name,
-               vl.visit_time, vl.visit_date, vl.purpose, vl.approval_status, vl.created_at
-        FROM visitorlogs vl
-        JOIN pupcs p ON vl.pupc_id = p.pupc_id
-        JOIN visitors v ON vl.visitor_id = v.visitor_id
-        ORDER BY vl.created_at DESC
-        """
+        fields = VISITOR_LOG_FIELDS.requested(request.args.get('fields'))
+        serialize_visitor_log = VISITOR_LOG_FIELDS.serializer(fields)
         
-        result = db.session.execute(text(query))
+        if wants_stream():
+            statement, params = visitor_log_statement(
+                visitor_log_filters(request.args),
+                cursor=request.args.get('cursor'),
+                fields=fields
+            )
+            return stream_json_array(statement, params, serialize_visitor_log)
+        
+        # Get one keyset page of visitor logs with PUC and visitor names
+        rows, next_cursor = fetch_visitor_logs(
+            visitor_log_filters(request.args),
+            cursor=request.args.get('cursor'),
+            limit=optional_page_size(),
+            fields=fields
+        )
         
-        logs = []
-        for row in result:
-            logs.append({
-                'visitor_log_id': row[0],
-                'pupc_id': row[1],
-                'visitor_id': row[2],
-                'pupc_first_name': row[3],
-                'pupc_last_name': row[4],
-                'visitor_first_name': row[5],
-                'visitor_last_name': row[6],
-                'visit_time': str(row[7]),
-                'visit_date': row[8].isoformat() if row[8] else None,
-                'purpose': row[9],
-                'approval_status': row[10],
-                'created_at': row[11].isoformat() if row[11] else None
-            })
+        logs = [serialize_visitor_log(row) for row in rows]
         
-        return jsonify(logs)
+        return paged_response(logs, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching visitor logs: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -56,44 +83,71 @@ def get_visitor_logs_admin(current_user):
 
 @admin_bp.route('/users', methods=['GET'])
 @token_required
+@conditional_get('users', 'roles')
 def get_users(current_user):
     try:
         # Check if user is admin
         if current_user.role_id != 1:
             return jsonify({"error": "Unauthorized"}), 403
             
-        # Get all users with role names
-        query = """
-        SELECT u.user_id, u.username, u.role_id, r.name as role_name,
-               u.email, u.full_name, u.created_at, u.last_login
-        FROM users u
-        JOIN roles r ON u.role_id = r.role_id
-        ORDER BY u.user_id
-        """
+        # Get all users with role names, narrowed to ?fields= when given
+        fields = USER_FIELDS.requested(request.args.get('fields'))
+        query = USER_FIELDS.select(fields) + "ORDER BY u.user_id"
+        serialize_user = USER_FIELDS.serializer(fields)
+        
+        if wants_stream():
+            return stream_json_array(text(query), {}, serialize_user)
         
         result = db.session.execute(text(query))
         
-        users = []
-        for row in result:
-            users.append({
-                'user_id': row[0],
-                'username': row[1],
-                'role_id': row[2],
-                'role_name': row[3],
-                'email': row[4],
-                'full_name': row[5],
-                'created_at': row[6].isoformat() if row[6] else None,
-                'last_login': row[7].isoformat() if row[7] else None
-            })
+        users = [serialize_user(row) for row in result]
             
         return jsonify(users)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching users: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
+@token_required
+def delete_user(current_user, user_id):
+    try:
+        # Check if user is admin
+        if current_user.role_id != 1:
+            return jsonify({"error": "Unauthorized"}), 403
+
+        # Don't allow deleting yourself
+        if user_id == current_user.user_id:
+            return jsonify({"error": "Cannot delete your own account"}), 400
+
+        # The user's approved-visitor entries go with it, in the same transaction
+        db.session.execute(
+            text("DELETE FROM approvedvisitors WHERE user_id = :user_id"), {"user_id": user_id}
+        )
+        deleted = db.session.execute(
+            text("DELETE FROM users WHERE user_id = :user_id"), {"user_id": user_id}
+        ).rowcount
+        if not deleted:
+            db.session.rollback()
+            return jsonify({"error": "User not found"}), 404
+        # Tokens already issued to the account stop working on every worker once this commits
+        revocation_index.revoke_user(user_id)
+        db.session.commit()
+
+        identity_cache.invalidate(user_id)
+
+        return jsonify({"message": "User deleted successfully"})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting user: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @admin_bp.route('/approvals', methods=['GET'])
 @token_required
+@conditional_get('visitorlogs', 'pupcs', 'visitors')
 def get_approvals(current_user):
     try:
         # Check if user is admin or officer
@@ -101,35 +155,12 @@ def get_approvals(current_user):
             return jsonify({"error": "Unauthorized"}), 403
             
         # Get pending visitor logs
-        query = """
-        SELECT vl.visitor_log_id, vl.pupc_id, vl.visitor_id, 
-               p.first_name as pupc_first_name, p.last_name as pupc_last_name,
-               v.first_name as visitor_first_name, v.last_name as visitor_last_name,
-               vl.visit_time, vl.visit_date, vl.purpose, vl.created_at
-        FROM visitorlogs vl
-        JOIN pupcs p ON vl.pupc_id = p.pupc_id
-        JOIN visitors v ON vl.visitor_id = v.visitor_id
-        WHERE vl.approval_status = 'Pending'
-        ORDER BY vl.created_at DESC
-        """
+        if wants_stream():
+            return stream_json_array(text(PENDING_APPROVALS_QUERY), {}, serialize_pending_approval)
         
-        result = db.session.execute(text(query))
+        result = db.session.execute(text(PENDING_APPROVALS_QUERY))
         
-        approvals = []
-        for row in result:
-            approvals.append({
-                'visitor_log_id': row[0],
-                'pupc_id': row[1],
-                'visitor_id': row[2],
-                'pupc_first_name': row[3],
-                'pupc_last_name': row[4],
-                'visitor_first_name': row[5],
-                'visitor_last_name': row[6],
-                'visit_time': str(row[7]),
-                'visit_date': row[8].isoformat() if row[8] else None,
-                'purpose': row[9],
-                'created_at': row[10].isoformat() if row[10] else None
-            })
+        approvals = [serialize_pending_approval(row) for row in result]
         
         return jsonify(approvals)
     except Exception as e:
@@ -137,41 +168,47 @@ def get_approvals(current_user):
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def blacklisted_visitors():
+    """Blacklist entries with PUC and visitor names, newest first"""
+    query = """
+    SELECT b.black_id, b.pupc_id, b.visitor_id, 
+           p.first_name as pupc_first_name, p.last_name as pupc_last_name,
+           v.first_name as visitor_first_name, v.last_name as visitor_last_name,
+           b.reason, b.added_at
+    FROM blacklist b
+    LEFT JOIN pupcs p ON b.pupc_id = p.pupc_id
+    JOIN visitors v ON b.visitor_id = v.visitor_id
+    ORDER BY b.added_at DESC
+    """
+
+    result = db.session.execute(text(query))
+
+    blacklisted = []
+    for row in result:
+        blacklisted.append({
+            'black_id': row[0],
+            'pupc_id': row[1],
+            'visitor_id': row[2],
+            'pupc_first_name': row[3] or "N/A",
+            'pupc_last_name': row[4] or "",
+            'visitor_first_name': row[5],
+            'visitor_last_name': row[6],
+            'reason': row[7],
+            'added_at': row[8].isoformat() if row[8] else None
+        })
+    
+    return blacklisted
+
 @admin_bp.route('/blacklisted', methods=['GET'])
 @token_required
+@conditional_get('blacklist', 'pupcs', 'visitors')
 def get_blacklisted(current_user):
     try:
         # Check if user is admin or officer
         if current_user.role_id not in [1, 2]:
             return jsonify({"error": "Unauthorized"}), 403
             
-        # Get blacklisted visitors
-        query = """
-        SELECT b.black_id, b.pupc_id, b.visitor_id, 
-               p.first_name as pupc_first_name, p.last_name as pupc_last_name,
-               v.first_name as visitor_first_name, v.last_name as visitor_last_name,
-               b.reason, b.added_at
-        FROM blacklist b
-        LEFT JOIN pupcs p ON b.pupc_id = p.pupc_id
-        JOIN visitors v ON b.visitor_id = v.visitor_id
-        ORDER BY b.added_at DESC
-        """
-        
-        result = db.session.execute(text(query))
-        
-        blacklisted = []
-        for row in result:
-            blacklisted.append({
-                'black_id': row[0],
-                'pupc_id': row[1],
-                'visitor_id': row[2],
-                'pupc_first_name': row[3] or "N/A",
-                'pupc_last_name': row[4] or "",
-                'visitor_first_name': row[5],
-                'visitor_last_name': row[6],
-                'reason': row[7],
-                'added_at': row[8].isoformat() if row[8] else None
-            })
+        blacklisted = blacklisted_visitors()
         
         return jsonify(blacklisted)
     except Exception as e:
@@ -179,6 +216,61 @@ def get_blacklisted(current_user):
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def audit_log_page(filters, cursor=None, limit=100):
+    """One newest-first page of audit logs and the cursor of the next one"""
+    before = None
+    if cursor:
+        try:
+            event_time, audit_id = decode_cursor(cursor)
+            before = (parse_datetime(event_time), int(audit_id))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    # Get one page of audit logs from the hot table; the event_time index serves the window
+    clauses = []
+    params = {'limit': limit + 1}
+    if 'start' in filters:
+        clauses.append("a.event_time >= :start")
+        params['start'] = filters['start']
+    if 'end' in filters:
+        clauses.append("a.event_time < :end")
+        params['end'] = filters['end']
+    if 'event_type' in filters:
+        clauses.append("a.event_type = :event_type")
+        params['event_type'] = filters['event_type']
+    if before:
+        clauses.append("""(a.event_time < :before_time
+             OR (a.event_time = :before_time AND a.audit_id < :before_id))""")
+        params['before_time'], params['before_id'] = before
+
+    query = AUDIT_LOG_QUERY
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY a.event_time DESC, a.audit_id DESC LIMIT :limit"
+
+    statement = text(query).bindparams(
+        *[bindparam(name, type_=db.DateTime) for name in ('start', 'end', 'before_time') if name in params]
+    )
+    result = db.session.execute(statement, params)
+
+    logs = [serialize_audit_log(row) for row in result]
+
+    # Once the hot table runs out, continue the same window in the archive
+    if len(logs) <= limit:
+        if logs:
+            before = (parse_datetime(logs[-1]['event_time']), logs[-1]['audit_id'])
+        logs += query_archive(
+            current_app.config['AUDIT_ARCHIVE_DIR'], filters,
+            before=before, limit=limit + 1 - len(logs)
+        )
+
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1]['event_time'], logs[-1]['audit_id'])
+    
+    return logs, next_cursor
+
 @admin_bp.route('/audit-logs', methods=['GET'])
 @token_required
 def get_audit_logs(current_user):
@@ -187,79 +279,95 @@ def get_audit_logs(current_user):
         if current_user.role_id != 1:
             return jsonify({"error": "Unauthorized"}), 403
             
-        # Get audit logs
-        query = """
-        SELECT a.audit_id, a.user_id, u.username, a.event_type, 
-               a.event_time, a.ip_address, a.notes
-        FROM auditlogs a
-        LEFT JOIN users u ON a.user_id = u.user_id
-        ORDER BY a.event_time DESC
-        """
-        
-        result = db.session.execute(text(query))
+        filters = audit_log_filters(request.args)
+        limit = page_size()
         
-        logs = []
-        for row in result:
-            logs.append({
-                'audit_id': row[0],
-                'user_id': row[1],
-                'username': row[2] or "System",
-                'event_type': row[3],
-                'event_time': row[4].isoformat() if row[4] else None,
-                'ip_address': row[5],
-                'notes': row[6]
-            })
+        logs, next_cursor = audit_log_page(filters, request.args.get('cursor'), limit)
         
-        return jsonify(logs)
+        return paged_response(logs, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching audit logs: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
-@admin_bp.route('/dashboard/stats', methods=['GET'])
+@admin_bp.route('/system/stats', methods=['GET'])
 @token_required
-def get_dashboard_stats(current_user):
+def get_system_stats(current_user):
     try:
-        # Check if user is admin or officer
-        if current_user.role_id not in [1, 2]:
+        # Check if user is admin
+        if current_user.role_id != 1:
             return jsonify({"error": "Unauthorized"}), 403
             
+        return jsonify({
+            'identity_cache': identity_cache.stats(),
+            'password_pool': password_pool.stats(),
+            'revocation_index': revocation_index.stats(),
+            'login_rate_limit': login_limiter.stats(),
+            'table_versions': table_versions.stats(),
+            'reference_cache': reference_cache.stats(),
+            'query_cache': query_cache.stats(),
+            'shared_cache': shared_cache.stats(),
+            'single_flight': single_flight.stats(),
+            'stat_counters': stat_counters.stats(),
+            'parallel_queries': parallel_queries.stats(),
+            'event_feed': event_feed.stats(),
+            'username_allocator': username_allocator.stats()
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error fetching system stats: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+def admin_dashboard_stats():
+    """Admin dashboard counts, shared across workers until a counted table is written"""
+    def load():
         # Get counts from various tables
         stats = {}
-        
-        # Count PUCs
-        pucs_count = db.session.execute(text("SELECT COUNT(*) FROM pupcs")).scalar()
-        stats['pucs_count'] = pucs_count
-        
-        # Count visitors
-        visitors_count = db.session.execute(text("SELECT COUNT(*) FROM visitors")).scalar()
-        stats['visitors_count'] = visitors_count
-        
-        # Count pending approvals
-        pending_count = db.session.execute(text("SELECT COUNT(*) FROM visitorlogs WHERE approval_status = 'Pending'")).scalar()
-        stats['pending_count'] = pending_count
-        
-        # Count visits today
-        today = datetime.datetime.now().date()
-        today_visits = db.session.execute(
-            text("SELECT COUNT(*) FROM visitorlogs WHERE DATE(visit_date) = :today"),
-            {"today": today}
-        ).scalar()
-        stats['today_visits'] = today_visits
-        
+
+        # Materialized counts, one keyed read
+        counts = stat_counters.values('pupcs', 'visitors', 'visitorlogs_pending', 'visitorlogs_today')
+        stats['pucs_count'] = counts['pupcs']
+        stats['visitors_count'] = counts['visitors']
+        stats['pending_count'] = counts['visitorlogs_pending']
+        stats['today_visits'] = counts['visitorlogs_today']
+
         # Count users by role
-        users_by_role = db.session.execute(text("""
-            SELECT r.name, COUNT(u.user_id) 
+        users_by_role = query_cache.fetch("""
+            SELECT u.role_id, COUNT(u.user_id) 
             FROM users u
-            JOIN roles r ON u.role_id = r.role_id
-            GROUP BY r.name
-        """))
-        
+            GROUP BY u.role_id
+        """)
+
         role_counts = {}
         for row in users_by_role:
-            role_counts[row[0]] = row[1]
-        
+            role = reference_cache.role(row[0])
+            if role:
+                role_counts[role['name']] = role_counts.get(role['name'], 0) + row[1]
+
         stats['users_by_role'] = role_counts
+
+        return stats
+
+    # Shared by every worker and node until one of these tables is written
+    return shared_cache.for_tables(
+        f"admin-dashboard-stats:{datetime.date.today()}",
+        ('pupcs', 'visitors', 'visitorlogs', 'users', 'roles'),
+        load
+    )
+
+@admin_bp.route('/dashboard/stats', methods=['GET'])
+@token_required
+@conditional_get('pupcs', 'visitors', 'visitorlogs', 'users', 'roles')
+@coalesced
+def get_dashboard_stats(current_user):
+    try:
+        # Check if user is admin or officer
+        if current_user.role_id not in [1, 2]:
+            return jsonify({"error": "Unauthorized"}), 403
+            
+        stats = admin_dashboard_stats()
         
         return jsonify(stats)
     except Exception as e:
@@ -269,89 +377,104 @@ def get_dashboard_stats(current_user):
 
 @admin_bp.route('/reports/status-changes', methods=['GET'])
 @token_required
+@coalesced
 def get_status_changes(current_user):
     try:
         # Check if user is admin or officer
         if current_user.role_id not in [1, 2]:
             return jsonify({"error": "Unauthorized"}), 403
             
-        # Get PUC status counts
-        status_query = """
-        SELECT status, COUNT(*) as count
-        FROM pupcs
-        GROUP BY status
-        ORDER BY count DESC
-        """
+        def load():
+            # Get PUC status counts
+            status_query = """
+            SELECT status, COUNT(*) as count
+            FROM pupcs
+            GROUP BY status
+            ORDER BY count DESC
+            """
+        
+            status_result = query_cache.fetch(status_query)
+            status_counts = [{"status": row[0] or "Unknown", "count": row[1]} for row in status_result]
         
-        status_result = db.session.execute(text(status_query))
-        status_counts = [{"status": row[0] or "Unknown", "count": row[1]} for row in status_result]
+            # Get crime category counts; names come from the reference cache
+            category_query = """
+            SELECT p.category_id, COUNT(*) as count
+            FROM pupcs p
+            WHERE p.category_id IS NOT NULL
+            GROUP BY p.category_id
+            """
         
-        # Get crime category counts
-        category_query = """
-        SELECT cc.name, COUNT(*) as count
-        FROM pupcs p
-        JOIN crimecategories cc ON p.category_id = cc.category_id
-        GROUP BY cc.name
-        ORDER BY count DESC
-        """
+            by_name = {}
+            for row in query_cache.fetch(category_query):
+                category = reference_cache.category(row[0])
+                if category:
+                    by_name[category['name']] = by_name.get(category['name'], 0) + row[1]
+            category_counts = [{"name": name, "count": count}
+                               for name, count in sorted(by_name.items(), key=lambda item: -item[1])]
         
-        category_result = db.session.execute(text(category_query))
-        category_counts = [{"name": row[0], "count": row[1]} for row in category_result]
+            crime_name = reference_cache.column('crimetypes', 'name')
         
-        # Get recently released PUCs
-        released_query = """
-        SELECT 
-            CONCAT(p.first_name, ' ', p.last_name) as name,
-            ct.name as crime,
-            p.release_date,
-            p.arrest_date
-        FROM pupcs p
-        LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
-        WHERE p.release_date IS NOT NULL
-        ORDER BY p.release_date DESC
-        LIMIT 5
-        """
+            # Get recently released PUCs
+            released_query = """
+            SELECT 
+                CONCAT(p.first_name, ' ', p.last_name) as name,
+                p.crime_id,
+                p.release_date,
+                p.arrest_date
+            FROM pupcs p
+            WHERE p.release_date IS NOT NULL
+            ORDER BY p.release_date DESC
+            LIMIT 5
+            """
         
-        released_result = db.session.execute(text(released_query))
-        released_pucs = []
-        for row in released_result:
-            released_pucs.append({
-                "name": row[0],
-                "crime": row[1],
-                "release_date": row[2].isoformat() if row[2] else None,
-                "arrest_date": row[3].isoformat() if row[3] else None
-            })
+            released_result = query_cache.fetch(released_query)
+            released_pucs = []
+            for row in released_result:
+                released_pucs.append({
+                    "name": row[0],
+                    "crime": crime_name(row[1]),
+                    "release_date": row[2].isoformat() if row[2] else None,
+                    "arrest_date": row[3].isoformat() if row[3] else None
+                })
         
-        # Get recently added PUCs
-        recent_query = """
-        SELECT 
-            CONCAT(p.first_name, ' ', p.last_name) as name,
-            ct.name as crime,
-            p.status,
-            p.created_at
-        FROM pupcs p
-        LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
-        ORDER BY p.created_at DESC
-        LIMIT 5
-        """
+            # Get recently added PUCs
+            recent_query = """
+            SELECT 
+                CONCAT(p.first_name, ' ', p.last_name) as name,
+                p.crime_id,
+                p.status,
+                p.created_at
+            FROM pupcs p
+            ORDER BY p.created_at DESC
+            LIMIT 5
+            """
         
-        recent_result = db.session.execute(text(recent_query))
-        recent_pucs = []
-        for row in recent_result:
-            recent_pucs.append({
-                "name": row[0],
-                "crime": row[1],
-                "status": row[2],
-                "created_at": row[3].isoformat() if row[3] else None
-            })
+            recent_result = query_cache.fetch(recent_query)
+            recent_pucs = []
+            for row in recent_result:
+                recent_pucs.append({
+                    "name": row[0],
+                    "crime": crime_name(row[1]),
+                    "status": row[2],
+                    "created_at": row[3].isoformat() if row[3] else None
+                })
+        
+            # Combine all data
+            report_data = {
+                "status_counts": status_counts,
+                "category_counts": category_counts,
+                "released_pucs": released_pucs,
+                "recent_pucs": recent_pucs
+            }
+            
+            return report_data
         
-        # Combine all data
-        report_data = {
-            "status_counts": status_counts,
-            "category_counts": category_counts,
-            "released_pucs": released_pucs,
-            "recent_pucs": recent_pucs
-        }
+        # Shared by every worker and node until one of these tables is written
+        report_data = shared_cache.for_tables(
+            "status-changes-report",
+            ('pupcs', 'crimetypes', 'crimecategories'),
+            load
+        )
         
         return jsonify(report_data)
     except Exception as e:
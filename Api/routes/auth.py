@@ -6,29 +6,115 @@ import traceback
 from functools import wraps
 from sqlalchemy import text
 
-from db import db, User
+from db import db, User, user_query, USER_LOGIN_COLUMNS
+from identity_cache import identity_cache
+from password_pool import password_pool, PasswordPoolBusy
+from revocation import revocation_index
+from rate_limit import login_limiter
 
 # Create blueprint
 auth_bp = Blueprint('auth', __name__)
 bcrypt = Bcrypt()
 
+class ClaimsUser:
+    """Identity built from signed token claims; profile columns are loaded lazily on first use"""
+
+    def __init__(self, claims):
+        self.user_id = claims['user_id']
+        self.role_id = claims['role_id']
+        self.visitor_id = claims.get('visitor_id')
+        self.username = claims.get('username')
+        self._profile = None
+
+    def _load_profile(self):
+        if self._profile is None:
+            self._profile = identity_cache.get(self.user_id)
+            if self._profile is None:
+                user = user_query().filter_by(user_id=self.user_id).first()
+                self._profile = identity_cache.put(user) if user else False
+        return self._profile or None
+
+    @property
+    def email(self):
+        profile = self._load_profile()
+        return profile.email if profile else None
+
+    @property
+    def full_name(self):
+        profile = self._load_profile()
+        return profile.full_name if profile else None
+
+def _encode_token(claims, lifetime):
+    now = datetime.datetime.utcnow()
+    claims = dict(claims, iat=now.replace(tzinfo=datetime.timezone.utc).timestamp(), exp=now + lifetime)
+    return jwt.encode(claims, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+def issue_access_token(user):
+    """Short-lived token carrying the claims routes authorize on"""
+    return _encode_token({
+        'type': 'access',
+        'user_id': user.user_id,
+        'role_id': user.role_id,
+        'visitor_id': getattr(user, 'visitor_id', None),
+        'username': user.username
+    }, datetime.timedelta(minutes=current_app.config.get('ACCESS_TOKEN_MINUTES', 15)))
+
+def issue_refresh_token(user):
+    return _encode_token({
+        'type': 'refresh',
+        'user_id': user.user_id
+    }, datetime.timedelta(hours=current_app.config.get('REFRESH_TOKEN_HOURS', 24)))
+
+# WSGI environ key under which /api/batch hands its authenticated caller to sub-requests
+BATCH_USER_ENVIRON = 'themis.batch_user'
+
+def query_token_allowed(f):
+    """Let token_required also read ?access_token= (EventSource cannot send headers)"""
+    f.query_token_allowed = True
+    return f
+
 # Token required decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Sub-requests of a batch run as the caller the batch already authenticated
+        batch_user = request.environ.get(BATCH_USER_ENVIRON)
+        if batch_user is not None:
+            return f(batch_user, *args, **kwargs)
+        
         token = None
         if 'Authorization' in request.headers:
             token = request.headers['Authorization'].split(" ")[1]
+        elif getattr(f, 'query_token_allowed', False):
+            token = request.args.get('access_token')
         
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
         
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.filter_by(user_id=data['user_id']).first()
+            
+            if data.get('type') == 'refresh':
+                return jsonify({'message': 'Token is invalid!'}), 401
+            if revocation_index.is_revoked(data['user_id'], data.get('iat')):
+                return jsonify({'message': 'Token has been revoked!'}), 401
+            
+            if 'role_id' in data:
+                # Signed claims are enough to authorize without touching MySQL
+                current_user = ClaimsUser(data)
+            else:
+                # Tokens issued before claims were added; serve from the identity cache
+                current_user = identity_cache.get(data['user_id'])
+                if current_user is None:
+                    user = user_query().filter_by(user_id=data['user_id']).first()
+                    if user:
+                        current_user = identity_cache.put(user)
         except Exception as e:
             current_app.logger.error(f"Token error: {str(e)}")
             return jsonify({'message': 'Token is invalid!'}), 401
+        
+        if current_user is None:
+            return jsonify({'message': 'Token is invalid!'}), 401
             
         return f(current_user, *args, **kwargs)
     
@@ -41,11 +127,11 @@ def signup():
         current_app.logger.info(f"Signup request received: {data}")
         
         # Check if user already exists
-        if User.query.filter_by(username=data['username']).first():
+        if db.session.query(User.user_id).filter_by(username=data['username']).first():
             return jsonify({'message': 'Username already exists!'}), 409
         
-        # Hash the password
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        # Hash the password on the bounded hashing pool
+        hashed_password = password_pool.hash(data['password'])
         
         # Get first and last name directly from request
         first_name = data.get('first_name', '')
@@ -90,6 +176,10 @@ def signup():
         db.session.commit()
         
         return jsonify({'message': 'User created successfully!'}), 201
+    except PasswordPoolBusy as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Signup rejected: {str(e)}")
+        return jsonify({'message': 'Server is busy, please try again shortly'}), 503, {'Retry-After': '2'}
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error in signup: {str(e)}")
@@ -102,8 +192,14 @@ def login():
         data = request.get_json()
         current_app.logger.info(f"Login request received for user: {data.get('username', 'unknown')}")
         
+        # Throttle before any database lookup or password hashing
+        allowed, retry_after = login_limiter.check(data.get('username'), request.remote_addr)
+        if not allowed:
+            current_app.logger.warning(f"Login throttled for user: {data.get('username', 'unknown')} from {request.remote_addr}")
+            return jsonify({'message': 'Too many login attempts, please try again later'}), 429, {'Retry-After': str(retry_after)}
+        
         # Find user by username
-        user = User.query.filter_by(username=data['username']).first()
+        user = user_query(*USER_LOGIN_COLUMNS).filter_by(username=data['username']).first()
         current_app.logger.info(f"User found: {user is not None}")
         
         # Check if user exists
@@ -115,10 +211,12 @@ def login():
             password_correct = True
             current_app.logger.info("Plain text password match")
         else:
-            # Try bcrypt verification as fallback
+            # Try bcrypt verification as fallback, on the bounded hashing pool
             try:
-                password_correct = bcrypt.check_password_hash(user.password_hash, data['password'])
+                password_correct = password_pool.verify(user.password_hash, data['password'])
                 current_app.logger.info(f"Bcrypt password check: {password_correct}")
+            except PasswordPoolBusy:
+                raise
             except Exception as e:
                 current_app.logger.error(f"Password check error: {str(e)}")
                 password_correct = False
@@ -126,15 +224,14 @@ def login():
         if not password_correct:
             return jsonify({'message': 'Invalid password!'}), 401
         
-        # Generate token
-        token = jwt.encode({
-            'user_id': user.user_id,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-        }, current_app.config['SECRET_KEY'], algorithm="HS256")
+        # Generate a short-lived access token and a refresh token
+        token = issue_access_token(user)
+        refresh_token = issue_refresh_token(user)
         
         # Get user data safely
         user_data = {
             'token': token,
+            'refresh_token': refresh_token,
             'user_id': user.user_id,
             'username': user.username,
             'role_id': user.role_id
@@ -148,11 +245,48 @@ def login():
             pass
         
         return jsonify(user_data)
+    except PasswordPoolBusy as e:
+        current_app.logger.warning(f"Login rejected: {str(e)}")
+        return jsonify({'message': 'Server is busy, please try again shortly'}), 503, {'Retry-After': '2'}
     except Exception as e:
         current_app.logger.error(f"Error in login: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({'message': f'An error occurred during login: {str(e)}'}), 500
 
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    try:
+        data = request.get_json() or {}
+        if not data.get('refresh_token'):
+            return jsonify({'message': 'Refresh token is missing!'}), 401
+        
+        try:
+            claims = jwt.decode(data['refresh_token'], current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        except jwt.InvalidTokenError as e:
+            current_app.logger.info(f"Refresh token error: {str(e)}")
+            return jsonify({'message': 'Refresh token is invalid!'}), 401
+        
+        if claims.get('type') != 'refresh':
+            return jsonify({'message': 'Refresh token is invalid!'}), 401
+        if revocation_index.is_revoked(claims['user_id'], claims.get('iat')):
+            return jsonify({'message': 'Token has been revoked!'}), 401
+        
+        # Reload the user so role changes are picked up at refresh time
+        user = user_query().filter_by(user_id=claims['user_id']).first()
+        if not user:
+            return jsonify({'message': 'User not found!'}), 401
+        identity_cache.put(user)
+        
+        return jsonify({
+            'token': issue_access_token(user),
+            'user_id': user.user_id,
+            'role_id': user.role_id
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error refreshing token: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'message': 'An error occurred while refreshing the token'}), 500
+
 @auth_bp.route('/profile', methods=['GET'])
 @token_required
 def get_profile(current_user):
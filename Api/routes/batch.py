@@ -0,0 +1,141 @@
+from flask import Blueprint, jsonify, request, current_app
+import traceback
+from urllib.parse import parse_qs
+
+from routes.auth import token_required, BATCH_USER_ENVIRON
+from parallel_queries import parallel_queries, ParallelQueriesBusy
+
+# Create blueprint
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+# Response headers a sub-request result carries back
+BATCH_HEADERS = ('ETag', 'X-Next-Cursor', 'X-Total-Count', 'Retry-After')
+# Client-address headers a sub-request takes from the batch request, never from its own headers
+FORWARDED_HEADERS = ('Forwarded', 'X-Forwarded-For', 'X-Forwarded-Host', 'X-Forwarded-Proto', 'X-Real-IP')
+BATCH_OWN_HEADERS = {'authorization'} | {name.lower() for name in FORWARDED_HEADERS}
+# Routes that fan out on the parallel query pool themselves; nesting them in a
+# parallel batch could leave every worker waiting on tasks queued behind it
+PARALLEL_PATHS = ('/api/dashboard/bundle',)
+# Streaming responses (server-sent events, ?stream=1 exports) would hold the batch open
+# until the stream ends, since a sub-request's body is read whole
+STREAMING_PATHS = ('/api/events',)
+
+def streams(path):
+    """True for a sub-request path whose response is streamed"""
+    route, _, query = path.partition('?')
+    if route.rstrip('/') in STREAMING_PATHS:
+        return True
+    return any(value.lower() in ('1', 'true', 'yes') for value in parse_qs(query).get('stream', []))
+
+def batch_items(data, max_requests):
+    """Validated sub-requests from the batch body"""
+    items = (data or {}).get('requests')
+    if not isinstance(items, list) or not items:
+        raise ValueError("requests must be a non-empty list")
+    if len(items) > max_requests:
+        raise ValueError(f"At most {max_requests} requests per batch")
+
+    validated = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise ValueError(f"Request {index} needs a path")
+        method = str(item.get('method', 'GET')).upper()
+        if method not in BATCH_METHODS:
+            raise ValueError(f"Request {index}: unsupported method {method}")
+        path = item['path']
+        if not path.startswith('/api/') or path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            raise ValueError(f"Request {index}: path must be an /api/ route other than /api/batch")
+        if streams(path):
+            raise ValueError(f"Request {index}: streaming responses cannot be batched")
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise ValueError(f"Request {index}: headers must be an object")
+        validated.append({
+            'id': item.get('id', index),
+            'method': method,
+            'path': path,
+            'body': item.get('body'),
+            # The batch's own authentication and client address stand in for the sub-request's
+            'headers': {name: value for name, value in headers.items() if name.lower() not in BATCH_OWN_HEADERS}
+        })
+    return validated
+
+def client_environ():
+    """WSGI environ entries that identify the batch's client, for its sub-requests"""
+    environ = {'REMOTE_ADDR': request.remote_addr}
+    for name in FORWARDED_HEADERS:
+        if name in request.headers:
+            environ['HTTP_' + name.upper().replace('-', '_')] = request.headers[name]
+    return environ
+
+def dispatch(app, item, user, client):
+    """Run one sub-request through the app's normal routing and hooks"""
+    with app.test_request_context(
+        item['path'],
+        method=item['method'],
+        headers=item['headers'],
+        json=item['body'] if item['method'] != 'GET' else None,
+        environ_base={**client, BATCH_USER_ENVIRON: user}
+    ):
+        response = app.full_dispatch_request()
+        body = response.get_data()
+        result = {
+            'id': item['id'],
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in BATCH_HEADERS if name in response.headers}
+        }
+        if response.is_json:
+            result['body'] = response.get_json()
+        else:
+            result['body'] = body.decode('utf-8', errors='replace') if body else None
+        return result
+
+@batch_bp.route('/batch', methods=['POST'])
+@token_required
+def run_batch(current_user):
+    """Several API calls in one round trip, authenticated once
+
+    Body: {"requests": [{"id", "method", "path", "body", "headers"}], "parallel": false}.
+    Sub-requests run in order, each in its own app context (so a failing one cannot
+    poison the others' session); with "parallel": true, a batch of GETs runs
+    concurrently on the parallel query pool instead (routes that use the pool
+    themselves are refused there). Sub-requests see the batch client's address. Results come back in request
+    order with their status, selected headers and JSON body.
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = batch_items(data, current_app.config.get('BATCH_MAX_REQUESTS', 20))
+        parallel = bool(data.get('parallel'))
+        if parallel and any(item['method'] != 'GET' for item in items):
+            raise ValueError("Only GET requests can run in parallel")
+        if parallel and any(item['path'].split('?', 1)[0].rstrip('/') in PARALLEL_PATHS for item in items):
+            raise ValueError(f"{', '.join(PARALLEL_PATHS)} cannot run in a parallel batch")
+
+        app = current_app._get_current_object()
+        client = client_environ()
+
+        if parallel:
+            results, errors = parallel_queries.run({
+                index: (lambda item=item: dispatch(app, item, current_user, client))
+                for index, item in enumerate(items)
+            })
+            responses = [results[index] if index in results
+                         else {'id': item['id'], 'status': 500, 'headers': {}, 'body': {"error": errors[index]}}
+                         for index, item in enumerate(items)]
+        else:
+            responses = []
+            for item in items:
+                with app.app_context():
+                    responses.append(dispatch(app, item, current_user, client))
+
+        return jsonify({"responses": responses})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ParallelQueriesBusy as e:
+        current_app.logger.warning(f"Parallel batch rejected: {str(e)}")
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503, {'Retry-After': '2'}
+    except Exception as e:
+        current_app.logger.error(f"Error running batch: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
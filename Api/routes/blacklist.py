@@ -5,6 +5,9 @@ import datetime
 
 from db import db
 from routes.auth import token_required
+from table_versions import conditional_get
+from streaming import wants_stream, stream_json_array
+from fieldsets import Projection, iso
 
 # Create blueprint
 blacklist_bp = Blueprint('blacklist', __name__)
@@ -79,32 +82,44 @@ def add_to_blacklist(current_user):
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+# The visitors join only ever dropped entries without a visitor_id, which the
+# WHERE clause in get_blacklist keeps doing when the join is left out
+BLACKLIST_FIELDS = Projection(
+    "FROM blacklist b",
+    {
+        'black_id': ("b.black_id", None, None),
+        'visitor_id': ("b.visitor_id", None, None),
+        'first_name': ("v.first_name", 'visitor', None),
+        'last_name': ("v.last_name", 'visitor', None),
+        'reason': ("b.reason", None, None),
+        'added_at': ("b.added_at", None, iso)
+    },
+    joins={'visitor': "JOIN visitors v ON b.visitor_id = v.visitor_id"}
+)
+
 @blacklist_bp.route('/blacklist', methods=['GET'])
 @token_required
+@conditional_get('blacklist', 'visitors')
 def get_blacklist(current_user):
     try:
-        # Get all blacklisted visitors
-        query = text("""
-            SELECT b.black_id, b.visitor_id, v.first_name, v.last_name, b.reason, b.added_at
-            FROM blacklist b
-            JOIN visitors v ON b.visitor_id = v.visitor_id
+        # Get all blacklisted visitors, narrowed to ?fields= when given
+        fields = BLACKLIST_FIELDS.requested(request.args.get('fields'))
+        query = text(BLACKLIST_FIELDS.select(fields) + """
+            WHERE b.visitor_id IS NOT NULL
             ORDER BY b.added_at DESC
         """)
+        serialize_blacklist_entry = BLACKLIST_FIELDS.serializer(fields)
+        
+        if wants_stream():
+            return stream_json_array(query, {}, serialize_blacklist_entry)
         
         result = db.session.execute(query)
         
-        blacklist = []
-        for row in result:
-            blacklist.append({
-                'black_id': row[0],
-                'visitor_id': row[1],
-                'first_name': row[2],
-                'last_name': row[3],
-                'reason': row[4],
-                'added_at': row[5].isoformat() if row[5] else None
-            })
+        blacklist = [serialize_blacklist_entry(row) for row in result]
         
         return jsonify(blacklist)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching blacklist: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -1,38 +1,126 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, request, current_app
 import traceback
+from sqlalchemy import text
 
 from db import db, User, PUPC, VisitorLog, Blacklist
+from table_versions import conditional_get
+from stat_counters import stat_counters
+from shared_cache import shared_cache
+from single_flight import coalesced
+from parallel_queries import parallel_queries, ParallelQueriesBusy
+from pagination import page_size
+from routes.auth import token_required
+from routes.admin import USER_FIELDS, admin_dashboard_stats, blacklisted_visitors, audit_log_page
+from routes.officer import officer_dashboard_stats
+from visitor_logs import fetch_visitor_logs, serialize_visitor_log, PENDING_APPROVALS_QUERY, serialize_pending_approval
 
 # Create blueprint
 dashboard_bp = Blueprint('dashboard', __name__)
 
+def dashboard_summary():
+    """Headline counts shown on the admin and officer dashboard home"""
+    def load():
+        counts = stat_counters.values('users', 'pupcs', 'visitorlogs', 'visitorlogs_pending', 'blacklist')
+        return {
+            "user_count": counts['users'],
+            "pupc_count": counts['pupcs'],
+            "visitor_log_count": counts['visitorlogs'],
+            "pending_approval_count": counts['visitorlogs_pending'],
+            "blacklisted_count": counts['blacklist'],
+            "system_status": "Online"
+        }
+    
+    # Shared by every worker and node until one of these tables is written
+    return shared_cache.for_tables(
+        "dashboard-stats",
+        ('users', 'pupcs', 'visitorlogs', 'blacklist'),
+        load
+    )
+
 @dashboard_bp.route('/stats', methods=['GET'])
+@conditional_get('users', 'pupcs', 'visitorlogs', 'blacklist')
+@coalesced
 def get_dashboard_stats():
     try:
-        # Get user count
-        user_count = User.query.count()
-        
-        # Get PUC count
-        pupc_count = PUPC.query.count()
+        return jsonify(dashboard_summary())
+    except Exception as e:
+        current_app.logger.error(f"Error fetching dashboard stats: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+def pending_approvals():
+    return [serialize_pending_approval(row) for row in db.session.execute(text(PENDING_APPROVALS_QUERY))]
+
+def all_users():
+    serialize_user = USER_FIELDS.serializer(USER_FIELDS.fields)
+    query = USER_FIELDS.select(USER_FIELDS.fields) + "ORDER BY u.user_id"
+    return [serialize_user(row) for row in db.session.execute(text(query))]
+
+def visitor_log_page(limit):
+    rows, next_cursor = fetch_visitor_logs({}, limit=limit)
+    return [serialize_visitor_log(row) for row in rows], next_cursor
+
+# Sections of each role's dashboard: name -> callable(limit); paged sections return (items, next cursor)
+BUNDLE_SECTIONS = {
+    1: {
+        'summary': lambda limit: dashboard_summary(),
+        'stats': lambda limit: admin_dashboard_stats(),
+        'approvals': lambda limit: pending_approvals(),
+        'blacklisted': lambda limit: blacklisted_visitors(),
+        'users': lambda limit: all_users(),
+        'visitor_logs': visitor_log_page,
+        'audit_logs': lambda limit: audit_log_page({}, limit=limit)
+    },
+    2: {
+        'summary': lambda limit: dashboard_summary(),
+        'stats': lambda limit: officer_dashboard_stats(),
+        'approvals': lambda limit: pending_approvals(),
+        'blacklisted': lambda limit: blacklisted_visitors(),
+        'visitor_logs': visitor_log_page
+    }
+}
+PAGED_SECTIONS = ('visitor_logs', 'audit_logs')
+
+@dashboard_bp.route('/bundle', methods=['GET'])
+@token_required
+def get_dashboard_bundle(current_user):
+    """Every section a dashboard loads on open, queried concurrently on separate connections
+
+    ?sections= narrows the bundle; ?limit= sizes the first page of the paged sections,
+    whose next-page cursors are returned under next_cursors. A section that fails is
+    reported under errors without failing the others.
+    """
+    try:
+        sections = BUNDLE_SECTIONS.get(current_user.role_id)
+        if sections is None:
+            return jsonify({"error": "Unauthorized"}), 403
         
-        # Get visitor logs count
-        visitor_log_count = VisitorLog.query.count()
+        names = list(sections)
+        if request.args.get('sections'):
+            names = [name.strip() for name in request.args['sections'].split(',') if name.strip()]
+            unknown = [name for name in names if name not in sections]
+            if unknown:
+                raise ValueError(f"Unknown section(s): {', '.join(unknown)}")
         
-        # Get pending approvals count
-        pending_approval_count = VisitorLog.query.filter_by(approval_status='Pending').count()
+        limit = page_size()
+        results, errors = parallel_queries.run({
+            name: (lambda section=sections[name]: section(limit)) for name in names
+        })
         
-        # Get blacklisted count
-        blacklisted_count = Blacklist.query.count()
+        bundle = {"next_cursors": {}, "errors": errors}
+        for name, result in results.items():
+            if name in PAGED_SECTIONS:
+                bundle[name], bundle["next_cursors"][name] = result
+            else:
+                bundle[name] = result
         
-        return jsonify({
-            "user_count": user_count,
-            "pupc_count": pupc_count,
-            "visitor_log_count": visitor_log_count,
-            "pending_approval_count": pending_approval_count,
-            "blacklisted_count": blacklisted_count,
-            "system_status": "Online"
-        })
+        return jsonify(bundle)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ParallelQueriesBusy as e:
+        current_app.logger.warning(f"Dashboard bundle rejected: {str(e)}")
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503, {'Retry-After': '2'}
     except Exception as e:
-        current_app.logger.error(f"Error fetching dashboard stats: {str(e)}")
+        current_app.logger.error(f"Error fetching dashboard bundle: {str(e)}")
         current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
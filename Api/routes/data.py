@@ -5,267 +5,109 @@ import datetime
 
 from db import db, PUPC, Visitor, VisitorLog, User, CrimeType
 from routes.auth import token_required
+from table_versions import conditional_get
+from reference_cache import reference_cache
+from pagination import optional_page_size, page_offset, paged_response
+from puc_list import puc_list_filters, puc_where, puc_order_by, count_pucs, PUC_LIST_FIELDS
+from visitor_logs import fetch_visitor_logs, visitor_log_filters, visitor_log_statement, VISITOR_LOG_FIELDS
+from streaming import wants_stream, stream_json_array
 
 # Create blueprint
 data_bp = Blueprint('data', __name__)
 
 @data_bp.route('/pucs', methods=['GET'])
 @token_required
+@conditional_get('pupcs', 'crimetypes', 'crimecategories')
 def get_pucs(current_user):
     try:
-        # Get all PUCs with crime type and category information
-        query = """
-        SELECT p.pupc_id, p.first_name, p.last_name, p.gender, p.age, 
-               p.arrest_date, p.release_date, p.status, p.category_id, 
-               p.mugshot_path, p.created_at, p.crime_id,
-               ct.name as crime_type_name, ct.law_reference, ct.description,
-               cc.name as crime_category
-        FROM pupcs p
-        LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
-        LEFT JOIN crimecategories cc ON p.category_id = cc.category_id
-        """
+        # Filter, sort and page on the server; only the requested page is joined
+        where, params = puc_where(puc_list_filters(request.args))
+        order_by = puc_order_by(request.args.get('sort', 'name'))
+        
+        # ?fields= narrows the SELECT list, the joins and the payload together
+        fields = PUC_LIST_FIELDS.requested(request.args.get('fields'))
+        select = PUC_LIST_FIELDS.select(fields)
+        serialize_puc = PUC_LIST_FIELDS.serializer(fields)
+        
+        if wants_stream():
+            # Full export of every matching row, written out as it is read
+            response = stream_json_array(text(select + where + order_by), params, serialize_puc)
+            response.headers['X-Total-Count'] = str(count_pucs(where, params))
+            return response
+        
+        # Get one page of PUCs (all of them without ?limit= / ?page=) with crime and category names
+        query = select + where + order_by
+        limit = optional_page_size()
+        if limit is not None:
+            params['limit'] = limit
+            params['offset'] = page_offset(limit)
+            query += " LIMIT :limit OFFSET :offset"
         
-        result = db.session.execute(text(query))
+        result = db.session.execute(text(query), params)
         
-        pucs = []
-        for row in result:
-            pucs.append({
-                'pupc_id': row[0],
-                'first_name': row[1],
-                'last_name': row[2],
-                'gender': row[3],
-                'age': row[4],
-                'arrest_date': row[5].isoformat() if row[5] else None,
-                'release_date': row[6].isoformat() if row[6] else None,
-                'status': row[7],
-                'category_id': row[8],
-                'mugshot_path': row[9],
-                'created_at': row[10].isoformat() if row[10] else None,
-                'crime_id': row[11],
-                'crime_type_name': row[12],
-                'law_reference': row[13],
-                'description': row[14],
-                'crime_category': row[15]
-            })
+        pucs = [serialize_puc(row) for row in result]
         
-        return jsonify(pucs)
+        return paged_response(pucs, total=count_pucs(where, params))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching PUCs: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
-@data_bp.route('/pucs', methods=['POST'])
-@token_required
-def create_puc(current_user):
-    try:
-        # Check if user is admin or officer
-        if current_user.role_id not in [1, 2]:  # 1=Admin, 2=Officer
-            return jsonify({"error": "Unauthorized"}), 403
-            
-        data = request.json
-        
-        # Validate required fields
-        required_fields = ['first_name', 'last_name']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
-        # Create new PUC record
-        new_puc = PUPC(
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            gender=data.get('gender'),
-            age=data.get('age'),
-            arrest_date=data.get('arrest_date'),
-            release_date=data.get('release_date'),
-            status=data.get('status', 'Pending'),
-            category_id=data.get('category_id'),
-            mugshot_path=data.get('mugshot_path'),
-            crime_id=data.get('crime_id'),
-            created_at=datetime.datetime.utcnow()
-        )
-        
-        db.session.add(new_puc)
-        db.session.commit()
-        
-        # Return the created PUC with all fields
-        return jsonify({
-            'pupc_id': new_puc.pupc_id,
-            'first_name': new_puc.first_name,
-            'last_name': new_puc.last_name,
-            'gender': new_puc.gender,
-            'age': new_puc.age,
-            'arrest_date': new_puc.arrest_date.isoformat() if new_puc.arrest_date else None,
-            'release_date': new_puc.release_date.isoformat() if new_puc.release_date else None,
-            'status': new_puc.status,
-            'category_id': new_puc.category_id,
-            'mugshot_path': new_puc.mugshot_path,
-            'created_at': new_puc.created_at.isoformat() if new_puc.created_at else None,
-            'crime_id': new_puc.crime_id
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error creating PUC: {str(e)}")
-        current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": str(e)}), 500
-
-@data_bp.route('/pucs/<int:pupc_id>', methods=['PUT'])
-@token_required
-def update_puc(current_user, pupc_id):
-    try:
-        # Check if user is admin or officer
-        if current_user.role_id not in [1, 2]:  # 1=Admin, 2=Officer
-            return jsonify({"error": "Unauthorized"}), 403
-            
-        data = request.json
-        
-        # Find the PUC record
-        puc = PUPC.query.get(pupc_id)
-        if not puc:
-            return jsonify({"error": "PUC record not found"}), 404
-        
-        # Update fields
-        if 'first_name' in data:
-            puc.first_name = data['first_name']
-        if 'last_name' in data:
-            puc.last_name = data['last_name']
-        if 'gender' in data:
-            puc.gender = data['gender']
-        if 'age' in data:
-            puc.age = data['age']
-        if 'arrest_date' in data:
-            puc.arrest_date = data['arrest_date']
-        if 'release_date' in data:
-            puc.release_date = data['release_date']
-        if 'status' in data:
-            puc.status = data['status']
-        if 'category_id' in data:
-            puc.category_id = data['category_id']
-        if 'mugshot_path' in data:
-            puc.mugshot_path = data['mugshot_path']
-        if 'crime_id' in data:
-            puc.crime_id = data['crime_id']
-        
-        db.session.commit()
-        
-        # Return the updated PUC
-        return jsonify({
-            'pupc_id': puc.pupc_id,
-            'first_name': puc.first_name,
-            'last_name': puc.last_name,
-            'gender': puc.gender,
-            'age': puc.age,
-            'arrest_date': puc.arrest_date.isoformat() if puc.arrest_date else None,
-            'release_date': puc.release_date.isoformat() if puc.release_date else None,
-            'status': puc.status,
-            'category_id': puc.category_id,
-            'mugshot_path': puc.mugshot_path,
-            'created_at': puc.created_at.isoformat() if puc.created_at else None,
-            'crime_id': puc.crime_id
-        })
-        
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error updating PUC: {str(e)}")
-        current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": str(e)}), 500
-
 @data_bp.route('/visitor-logs', methods=['GET'])
 @token_required
+@conditional_get('visitorlogs', 'pupcs', 'visitors', 'users')
 def get_visitor_logs(current_user):
     try:
-        # For admin or officer users, return all visitor logs
-        if current_user.role_id in [1, 2]:
-            # Get all visitor logs with PUC and visitor names
-            query = """
-            SELECT vl.visitor_log_id, vl.pupc_id, vl.visitor_id, 
-                   p.first_name as pupc_first_name, p.last_name as pupc_last_name,
-                   v.first_name as visitor_first_name, v.last_name as visitor_last_name,
-                   vl.visit_time, vl.visit_date, vl.purpose, vl.approval_status, vl.created_at
-            FROM visitorlogs vl
-            JOIN pupcs p ON vl.pupc_id = p.pupc_id
-            JOIN visitors v ON vl.visitor_id = v.visitor_id
-            ORDER BY vl.created_at DESC
-            """
+        filters = visitor_log_filters(request.args)
+        fields = VISITOR_LOG_FIELDS.requested(request.args.get('fields'))
+        
+        # Admin and officer users may page through all visitor logs
+        if current_user.role_id not in [1, 2]:
+            # For regular users, get visitor_id from request or user record
+            visitor_id = filters.get('visitor_id')
             
-            result = db.session.execute(text(query))
+            if not visitor_id:
+                # Try to get visitor_id from current user
+                if hasattr(current_user, 'visitor_id') and current_user.visitor_id:
+                    visitor_id = current_user.visitor_id
+                else:
+                    # Try to get visitor_id from database
+                    try:
+                        user_record = db.session.execute(
+                            text("SELECT visitor_id FROM users WHERE user_id = :user_id"),
+                            {"user_id": current_user.user_id}
+                        ).fetchone()
+                        
+                        if user_record and user_record[0]:
+                            visitor_id = user_record[0]
+                    except:
+                        pass
             
-            logs = []
-            for row in result:
-                logs.append({
-                    'visitor_log_id': row[0],
-                    'pupc_id': row[1],
-                    'visitor_id': row[2],
-                    'pupc_first_name': row[3],
-                    'pupc_last_name': row[4],
-                    'visitor_first_name': row[5],
-                    'visitor_last_name': row[6],
-                    'visit_time': str(row[7]),
-                    'visit_date': row[8].isoformat() if row[8] else None,
-                    'purpose': row[9],
-                    'approval_status': row[10],
-                    'created_at': row[11].isoformat() if row[11] else None
-                })
+            if not visitor_id:
+                return jsonify([])
             
-            return jsonify(logs)
-        
-        # For regular users, get visitor_id from request or user record
-        visitor_id = request.args.get('visitor_id')
-        
-        if not visitor_id:
-            # Try to get visitor_id from current user
-            if hasattr(current_user, 'visitor_id') and current_user.visitor_id:
-                visitor_id = current_user.visitor_id
-            else:
-                # Try to get visitor_id from database
-                try:
-                    user_record = db.session.execute(
-                        text("SELECT visitor_id FROM users WHERE user_id = :user_id"),
-                        {"user_id": current_user.user_id}
-                    ).fetchone()
-                    
-                    if user_record and user_record[0]:
-                        visitor_id = user_record[0]
-                except:
-                    pass
-        
-        if not visitor_id:
-            return jsonify([])
-        
-        # Get visitor logs for specific visitor
-        query = """
-        SELECT vl.visitor_log_id, vl.pupc_id, vl.visitor_id, 
-               p.first_name as pupc_first_name, p.last_name as pupc_last_name,
-               v.first_name as visitor_first_name, v.last_name as visitor_last_name,
-               vl.visit_time, vl.visit_date, vl.purpose, vl.approval_status, vl.created_at
-        FROM visitorlogs vl
-        JOIN pupcs p ON vl.pupc_id = p.pupc_id
-        JOIN visitors v ON vl.visitor_id = v.visitor_id
-        WHERE vl.visitor_id = :visitor_id
-        ORDER BY vl.created_at DESC
-        """
-        
-        result = db.session.execute(text(query), {"visitor_id": visitor_id})
+            filters['visitor_id'] = visitor_id
+        
+        if wants_stream():
+            statement, params = visitor_log_statement(filters, cursor=request.args.get('cursor'), fields=fields)
+            return stream_json_array(statement, params, VISITOR_LOG_FIELDS.serializer(fields))
+        
+        # Get one keyset page of visitor logs with PUC and visitor names
+        rows, next_cursor = fetch_visitor_logs(
+            filters,
+            cursor=request.args.get('cursor'),
+            limit=optional_page_size(),
+            fields=fields
+        )
         
-        logs = []
-        for row in result:
-            logs.append({
-                'visitor_log_id': row[0],
-                'pupc_id': row[1],
-                'visitor_id': row[2],
-                'pupc_first_name': row[3],
-                'pupc_last_name': row[4],
-                'visitor_first_name': row[5],
-                'visitor_last_name': row[6],
-                'visit_time': str(row[7]),
-                'visit_date': row[8].isoformat() if row[8] else None,
-                'purpose': row[9],
-                'approval_status': row[10],
-                'created_at': row[11].isoformat() if row[11] else None
-            })
+        serialize_visitor_log = VISITOR_LOG_FIELDS.serializer(fields)
+        logs = [serialize_visitor_log(row) for row in rows]
         
-        return jsonify(logs)
+        return paged_response(logs, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching visitor logs: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -408,41 +250,35 @@ def create_visit(current_user):
 
 @data_bp.route('/crimetypes', methods=['GET'])
 @token_required
+@conditional_get('crimetypes')
 def get_crime_types(current_user):
     try:
-        crime_types = CrimeType.query.all()
         result = []
-        for crime_type in crime_types:
+        for crime_type in reference_cache.crime_types():
             result.append({
-                'crime_id': crime_type.crime_id,
-                'category_id': crime_type.category_id,
-                'name': crime_type.name,
-                'law_reference': crime_type.law_reference,
-                'description': crime_type.description
+                'crime_id': crime_type['crime_id'],
+                'category_id': crime_type['category_id'],
+                'name': crime_type['name'],
+                'law_reference': crime_type['law_reference'],
+                'description': crime_type['description']
             })
         return jsonify(result)
     except Exception as e:
         current_app.logger.error(f"Error fetching crime types: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
+
 @data_bp.route('/categories', methods=['GET'])
 @token_required
+@conditional_get('crimecategories')
 def get_categories(current_user):
     try:
-        # Get all crime categories
-        query = text("""
-            SELECT category_id, name
-            FROM crimecategories
-            ORDER BY name
-        """)
-        
-        result = db.session.execute(query)
-        
+        # Get all crime categories from the reference cache
         categories = []
-        for row in result:
+        for row in sorted(reference_cache.categories(), key=lambda row: row['name'].lower()):
             categories.append({
-                'category_id': row[0],
-                'name': row[1]
+                'category_id': row['category_id'],
+                'name': row['name']
             })
         
         return jsonify(categories)
@@ -453,28 +289,21 @@ def get_categories(current_user):
 
 @data_bp.route('/crimes', methods=['GET'])
 @token_required
+@conditional_get('crimetypes')
 def get_crimes(current_user):
     try:
-        # Get all crime types
-        query = text("""
-            SELECT crime_id, category_id, name, law_reference
-            FROM crimetypes
-            ORDER BY name
-        """)
-        
-        result = db.session.execute(query)
-        
+        # Get all crime types from the reference cache
         crimes = []
-        for row in result:
+        for row in sorted(reference_cache.crime_types(), key=lambda row: row['name'].lower()):
             crimes.append({
-                'crime_id': row[0],
-                'category_id': row[1],
-                'name': row[2],
-                'law_reference': row[3]
+                'crime_id': row['crime_id'],
+                'category_id': row['category_id'],
+                'name': row['name'],
+                'law_reference': row['law_reference']
             })
         
         return jsonify(crimes)
     except Exception as e:
         current_app.logger.error(f"Error fetching crimes: {str(e)}")
         current_app.logger.error(traceback.format_exc())
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -6,6 +6,10 @@ import string
 import mysql.connector
 import bcrypt
 
+from usernames import username_allocator, username_base
+from table_versions import table_versions
+from stat_counters import stat_counters
+
 # Create blueprint
 direct_visitor_bp = Blueprint('direct_visitor', __name__)
 
@@ -30,20 +34,8 @@ def create_visitor():
         cursor = conn.cursor()
         
         try:
-            # Generate username and password
-            first_name = data['first_name'].lower()
-            last_name = data['last_name'].lower()
-            base_username = f"{first_name[0]}{last_name}"[:15]
-            
-            # Check if username exists and append number if needed
-            username = base_username
-            counter = 1
-            
-            cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
-            while cursor.fetchone():
-                username = f"{base_username}{counter}"
-                counter += 1
-                cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
+            # Generate username (one prefix lookup covers the base and its numbered forms)
+            username = username_allocator.allocate([username_base(data['first_name'], data['last_name'])], cursor=cursor)[0]
             
             # Generate random password
             password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
@@ -53,6 +45,8 @@ def create_visitor():
                 INSERT INTO visitors (first_name, last_name, relationship_to_puc, registered_at)
                 VALUES (%s, %s, %s, NOW())
             """, (data['first_name'], data['last_name'], data.get('relationship')))
+            table_versions.publish_raw(conn, 'visitors')
+            stat_counters.mark_stale_raw(conn, 'visitors')
             conn.commit()
             
             # Get the visitor_id
@@ -66,6 +60,8 @@ def create_visitor():
                 INSERT INTO users (username, password_hash, role_id, email, full_name, visitor_id, created_at)
                 VALUES (%s, %s, %s, %s, %s, %s, NOW())
             """, (username, hashed_password, 3, data.get('email'), full_name, visitor_id))
+            table_versions.publish_raw(conn, 'users')
+            stat_counters.mark_stale_raw(conn, 'users')
             conn.commit()
             
             # Get the user_id
@@ -87,6 +83,7 @@ def create_visitor():
                 username, 
                 password
             ))
+            table_versions.publish_raw(conn, 'approvedvisitors')
             conn.commit()
             
             # Get the approval_id
@@ -0,0 +1,71 @@
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
+import json
+import time
+import traceback
+
+from routes.auth import token_required, query_token_allowed
+from event_feed import event_feed
+from stat_counters import stat_counters, COUNTERS
+
+# Create blueprint
+events_bp = Blueprint('events', __name__)
+
+def sse(event_type, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {data}"]
+    return "\n".join(lines) + "\n\n"
+
+@events_bp.route('/events', methods=['GET'])
+@token_required
+@query_token_allowed
+def stream_events(current_user):
+    """Server-Sent Events: visit_log.created / approved / rejected and counters
+
+    Resumes after the Last-Event-ID header (or ?last_event_id=); a fresh connection
+    starts with a counters snapshot and then only new events. The stream ends after
+    EVENT_STREAM_MAX_SECONDS and the browser reconnects with its Last-Event-ID.
+    """
+    try:
+        # Check if user is admin or officer
+        if current_user.role_id not in [1, 2]:
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        resume_from = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if resume_from:
+            try:
+                last_id = int(resume_from)
+            except ValueError:
+                raise ValueError("Invalid Last-Event-ID")
+            opening = []
+        else:
+            last_id = event_feed.latest_id()
+            snapshot = {'values': stat_counters.values(*COUNTERS), 'deltas': {}}
+            opening = [sse('counters', json.dumps(snapshot))]
+        
+        heartbeat = current_app.config.get('EVENT_STREAM_HEARTBEAT', 15)
+        max_seconds = current_app.config.get('EVENT_STREAM_MAX_SECONDS', 300)
+        
+        def generate(last_id):
+            yield f"retry: {current_app.config.get('EVENT_STREAM_RETRY_MS', 3000)}\n\n"
+            yield from opening
+            ends_at = time.monotonic() + max_seconds
+            while time.monotonic() < ends_at:
+                events = event_feed.events_after(last_id, min(heartbeat, ends_at - time.monotonic()))
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event_id, event_type, payload in events:
+                    yield sse(event_type, payload, event_id)
+                    last_id = event_id
+        
+        response = Response(stream_with_context(generate(last_id)), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error opening event stream: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
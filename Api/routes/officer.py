@@ -5,12 +5,18 @@ import datetime
 
 from db import db, PUPC, Visitor, VisitorLog, User, Role
 from routes.auth import token_required
+from table_versions import conditional_get
+from visitor_logs import PENDING_APPROVALS_QUERY, serialize_pending_approval
+from streaming import wants_stream, stream_json_array
+from shared_cache import shared_cache
+from stat_counters import stat_counters
 
 # Create blueprint
 officer_bp = Blueprint('officer', __name__)
 
 @officer_bp.route('/approvals', methods=['GET'])
 @token_required
+@conditional_get('visitorlogs', 'pupcs', 'visitors')
 def get_approvals(current_user):
     try:
         # Check if user is officer
@@ -18,35 +24,12 @@ def get_approvals(current_user):
             return jsonify({"error": "Unauthorized"}), 403
             
         # Get pending visitor logs
-        query = """
-        SELECT vl.visitor_log_id, vl.pupc_id, vl.visitor_id, 
-               p.first_name as pupc_first_name, p.last_name as pupc_last_name,
-               v.first_name as visitor_first_name, v.last_name as visitor_last_name,
-               vl.visit_time, vl.visit_date, vl.purpose, vl.created_at
-        FROM visitorlogs vl
-        JOIN pupcs p ON vl.pupc_id = p.pupc_id
-        JOIN visitors v ON vl.visitor_id = v.visitor_id
-        WHERE vl.approval_status = 'Pending'
-        ORDER BY vl.created_at DESC
-        """
+        if wants_stream():
+            return stream_json_array(text(PENDING_APPROVALS_QUERY), {}, serialize_pending_approval)
         
-        result = db.session.execute(text(query))
+        result = db.session.execute(text(PENDING_APPROVALS_QUERY))
         
-        approvals = []
-        for row in result:
-            approvals.append({
-                'visitor_log_id': row[0],
-                'pupc_id': row[1],
-                'visitor_id': row[2],
-                'pupc_first_name': row[3],
-                'pupc_last_name': row[4],
-                'visitor_first_name': row[5],
-                'visitor_last_name': row[6],
-                'visit_time': str(row[7]),
-                'visit_date': row[8].isoformat() if row[8] else None,
-                'purpose': row[9],
-                'created_at': row[10].isoformat() if row[10] else None
-            })
+        approvals = [serialize_pending_approval(row) for row in result]
         
         return jsonify(approvals)
     except Exception as e:
@@ -56,6 +39,7 @@ def get_approvals(current_user):
 
 @officer_bp.route('/blacklisted', methods=['GET'])
 @token_required
+@conditional_get('blacklist', 'pupcs', 'visitors')
 def get_blacklisted(current_user):
     try:
         # Check if user is officer
@@ -96,36 +80,38 @@ def get_blacklisted(current_user):
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def officer_dashboard_stats():
+    """Officer dashboard counts, shared across workers until a counted table is written"""
+    def load():
+        # Get counts from various tables
+        stats = {}
+
+        # Materialized counts, one keyed read
+        counts = stat_counters.values('pupcs', 'visitors', 'visitorlogs_pending', 'visitorlogs_today')
+        stats['pucs_count'] = counts['pupcs']
+        stats['visitors_count'] = counts['visitors']
+        stats['pending_count'] = counts['visitorlogs_pending']
+        stats['today_visits'] = counts['visitorlogs_today']
+
+        return stats
+
+    # Shared by every worker and node until one of these tables is written
+    return shared_cache.for_tables(
+        f"officer-dashboard-stats:{datetime.date.today()}",
+        ('pupcs', 'visitors', 'visitorlogs'),
+        load
+    )
+
 @officer_bp.route('/dashboard/stats', methods=['GET'])
 @token_required
+@conditional_get('pupcs', 'visitors', 'visitorlogs')
 def get_dashboard_stats(current_user):
     try:
         # Check if user is officer
         if current_user.role_id != 2:
             return jsonify({"error": "Unauthorized"}), 403
             
-        # Get counts from various tables
-        stats = {}
-        
-        # Count PUCs
-        pucs_count = db.session.execute(text("SELECT COUNT(*) FROM pupcs")).scalar()
-        stats['pucs_count'] = pucs_count
-        
-        # Count visitors
-        visitors_count = db.session.execute(text("SELECT COUNT(*) FROM visitors")).scalar()
-        stats['visitors_count'] = visitors_count
-        
-        # Count pending approvals
-        pending_count = db.session.execute(text("SELECT COUNT(*) FROM visitorlogs WHERE approval_status = 'Pending'")).scalar()
-        stats['pending_count'] = pending_count
-        
-        # Count visits today
-        today = datetime.datetime.now().date()
-        today_visits = db.session.execute(
-            text("SELECT COUNT(*) FROM visitorlogs WHERE DATE(visit_date) = :today"),
-            {"today": today}
-        ).scalar()
-        stats['today_visits'] = today_visits
+        stats = officer_dashboard_stats()
         
         return jsonify(stats)
     except Exception as e:
@@ -1,12 +1,22 @@
 from flask import Blueprint, jsonify, request, current_app
 import traceback
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import datetime
 import random
 import string
 
-from db import db, PUPC, Visitor, User
-from routes.auth import token_required, bcrypt
+from db import db, PUPC, Visitor
+from routes.auth import token_required
+from table_versions import conditional_get
+from identity_cache import identity_cache
+from revocation import revocation_index
+from pagination import optional_page_size, page_offset, paged_response
+from puc_list import puc_list_filters, puc_where, puc_order_by, count_pucs, PUC_DETAIL_FIELDS
+from password_pool import password_pool, PasswordPoolBusy
+from fieldsets import iso
+from usernames import username_allocator, username_base
+from puc_import import import_format, read_import, import_row, insert_pucs, ReferenceNames
 
 # Create blueprint
 pucs_bp = Blueprint('pucs', __name__)
@@ -15,7 +25,15 @@ pucs_bp = Blueprint('pucs', __name__)
 @token_required
 def get_pucs(current_user):
     try:
-        # Get all PUCs
+        # Filter, sort and page on the server; only the requested page is joined
+        where, params = puc_where(puc_list_filters(request.args))
+        order_by = puc_order_by(request.args.get('sort', 'name'))
+        limit = optional_page_size()
+        if limit is not None:
+            params['limit'] = limit
+            params['offset'] = page_offset(limit)
+        
+        # Get one page of PUCs, or all of them without ?limit= / ?page=
         query = text("""
             SELECT p.pupc_id, p.first_name, p.last_name, p.gender, p.age, 
                    p.arrest_date, p.release_date, p.status, p.mugshot_path,
@@ -24,10 +42,9 @@ def get_pucs(current_user):
             FROM pupcs p
             LEFT JOIN crimecategories cc ON p.category_id = cc.category_id
             LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
-            ORDER BY p.last_name, p.first_name
-        """)
+        """ + where + order_by + (" LIMIT :limit OFFSET :offset" if limit is not None else ""))
         
-        result = db.session.execute(query)
+        result = db.session.execute(query, params)
         
         pucs = []
         for row in result:
@@ -47,7 +64,9 @@ def get_pucs(current_user):
                 'full_name': f"{row[1]} {row[2]}"
             })
         
-        return jsonify(pucs)
+        return paged_response(pucs, total=count_pucs(where, params))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching PUCs: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -55,40 +74,22 @@ def get_pucs(current_user):
 
 @pucs_bp.route('/pucs/<int:pupc_id>', methods=['GET'])
 @token_required
+@conditional_get('pupcs', 'crimetypes', 'crimecategories', 'approvedvisitors')
 def get_puc(current_user, pupc_id):
     try:
-        # Get specific PUC
-        query = text("""
-            SELECT p.pupc_id, p.first_name, p.last_name, p.gender, p.age, 
-                   p.arrest_date, p.release_date, p.status, p.mugshot_path,
-                   cc.name as category_name, ct.name as crime_name,
-                   cc.category_id, ct.crime_id
-            FROM pupcs p
-            LEFT JOIN crimecategories cc ON p.category_id = cc.category_id
-            LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
-            WHERE p.pupc_id = :pupc_id
-        """)
+        # Get specific PUC, narrowed to ?fields= when given
+        fields = PUC_DETAIL_FIELDS.requested(request.args.get('fields'))
+        query = text(PUC_DETAIL_FIELDS.select(fields) + "WHERE p.pupc_id = :pupc_id")
         
         result = db.session.execute(query, {"pupc_id": pupc_id}).fetchone()
         
         if not result:
             return jsonify({"error": "PUC not found"}), 404
         
-        puc = {
-            'pupc_id': result[0],
-            'first_name': result[1],
-            'last_name': result[2],
-            'gender': result[3],
-            'age': result[4],
-            'arrest_date': result[5].isoformat() if result[5] else None,
-            'release_date': result[6].isoformat() if result[6] else None,
-            'status': result[7],
-            'mugshot_path': result[8],
-            'category_name': result[9],
-            'crime_name': result[10],
-            'category_id': result[11],
-            'crime_id': result[12]
-        }
+        puc = PUC_DETAIL_FIELDS.serializer(fields)(result)
+        
+        if 'approved_visitors' not in fields:
+            return jsonify(puc)
         
         # Get approved visitors for this PUC
         visitors_query = text("""
@@ -120,11 +121,108 @@ def get_puc(current_user, pupc_id):
         puc['approved_visitors'] = approved_visitors
         
         return jsonify(puc)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching PUC: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def visitor_username_base(visitor_data):
+    return username_base(visitor_data['first_name'], visitor_data['last_name'])
+
+def puc_record(puc):
+    """Fields of a PUC as returned after it is created or updated"""
+    return {
+        'pupc_id': puc.pupc_id,
+        'first_name': puc.first_name,
+        'last_name': puc.last_name,
+        'gender': puc.gender,
+        'age': puc.age,
+        'arrest_date': iso(puc.arrest_date),
+        'release_date': iso(puc.release_date),
+        'status': puc.status,
+        'category_id': puc.category_id,
+        'mugshot_path': puc.mugshot_path,
+        'created_at': iso(puc.created_at),
+        'crime_id': puc.crime_id
+    }
+
+def generate_password():
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+
+def insert_approved_visitors(pupc_id, visitors, passwords, password_hashes):
+    """Visitor, user and approvedvisitors rows for each visitor, in the caller's transaction
+
+    Visitor ids come from the driver's lastrowid; users and approvedvisitors are each
+    written with one executemany, and the new user ids are read back in one query by
+    their (unique) usernames.
+    """
+    now = datetime.datetime.utcnow()
+    usernames = username_allocator.allocate(visitor_username_base(visitor) for visitor in visitors)
+    
+    visitor_query = text("""
+        INSERT INTO visitors (first_name, last_name, relationship_to_puc, registered_at)
+        VALUES (:first_name, :last_name, :relationship, :registered_at)
+    """)
+    visitor_ids = [
+        db.session.execute(visitor_query, {
+            "first_name": visitor['first_name'],
+            "last_name": visitor['last_name'],
+            "relationship": visitor.get('relationship'),
+            "registered_at": now
+        }).lastrowid
+        for visitor in visitors
+    ]
+    
+    db.session.execute(text("""
+        INSERT INTO users (username, password_hash, role_id, email, full_name, visitor_id, created_at)
+        VALUES (:username, :password_hash, :role_id, :email, :full_name, :visitor_id, :created_at)
+    """), [{
+        "username": username,
+        "password_hash": password_hash,
+        "role_id": 3,  # Visitor role
+        "email": visitor.get('email'),
+        "full_name": f"{visitor['first_name']} {visitor['last_name']}",
+        "visitor_id": visitor_id,
+        "created_at": now
+    } for visitor, username, password_hash, visitor_id in zip(visitors, usernames, password_hashes, visitor_ids)])
+    
+    user_ids = dict(db.session.execute(
+        text("SELECT username, user_id FROM users WHERE username IN :usernames")
+        .bindparams(bindparam('usernames', expanding=True)),
+        {"usernames": usernames}
+    ).fetchall())
+    
+    db.session.execute(text("""
+        INSERT INTO approvedvisitors (pupc_id, first_name, last_name, relationship, email, phone, visitor_id, user_id, username, password, account_created, created_at)
+        VALUES (:pupc_id, :first_name, :last_name, :relationship, :email, :phone, :visitor_id, :user_id, :username, :password, 1, :created_at)
+    """), [{
+        "pupc_id": pupc_id,
+        "first_name": visitor['first_name'],
+        "last_name": visitor['last_name'],
+        "relationship": visitor.get('relationship'),
+        "email": visitor.get('email'),
+        "phone": visitor.get('phone'),
+        "visitor_id": visitor_id,
+        "user_id": user_ids[username],
+        "username": username,
+        "password": password,
+        "created_at": now
+    } for visitor, username, password, visitor_id in zip(visitors, usernames, passwords, visitor_ids)])
+    
+    return [{
+        'visitor_id': visitor_id,
+        'user_id': user_ids[username],
+        'first_name': visitor['first_name'],
+        'last_name': visitor['last_name'],
+        'relationship': visitor.get('relationship'),
+        'email': visitor.get('email'),
+        'phone': visitor.get('phone'),
+        'username': username,
+        'password': password
+    } for visitor, username, password, visitor_id in zip(visitors, usernames, passwords, visitor_ids)]
+
 @pucs_bp.route('/pucs', methods=['POST'])
 @token_required
 def create_puc(current_user):
@@ -133,9 +231,22 @@ def create_puc(current_user):
         if current_user.role_id not in [1, 2]:  # Assuming 1=admin, 2=officer
             return jsonify({"error": "Unauthorized"}), 403
             
-        data = request.json
+        data = request.json or {}
+        
+        # Validate everything before writing anything
+        for field in ('first_name', 'last_name'):
+            if not data.get(field):
+                raise ValueError(f"Missing required field: {field}")
+        approved_visitors = data.get('approved_visitors') or []
+        for index, visitor_data in enumerate(approved_visitors):
+            for field in ('first_name', 'last_name'):
+                if not visitor_data.get(field):
+                    raise ValueError(f"Approved visitor {index}: missing required field: {field}")
+        
+        # Hash before the transaction opens so bcrypt never runs while rows are locked
+        passwords = [generate_password() for _ in approved_visitors]
+        password_hashes = [password_pool.hash(password) for password in passwords]
         
-        # Create new PUC using direct SQL
         puc_query = text("""
             INSERT INTO pupcs (
                 first_name, last_name, gender, age, arrest_date, 
@@ -146,134 +257,153 @@ def create_puc(current_user):
             )
         """)
         
-        db.session.execute(puc_query, {
-            "first_name": data['first_name'],
-            "last_name": data['last_name'],
-            "gender": data.get('gender'),
-            "age": data.get('age'),
-            "arrest_date": data.get('arrest_date'),
-            "release_date": data.get('release_date'),
-            "status": data.get('status', 'In Custody'),
-            "category_id": data.get('category_id'),
-            "crime_id": data.get('crime_id'),
-            "mugshot_path": data.get('mugshot_path'),
-            "created_at": datetime.datetime.utcnow()
-        })
-        db.session.commit()
-        
-        # Get the pupc_id
-        pupc_id_query = text("SELECT LAST_INSERT_ID()")
-        pupc_id = db.session.execute(pupc_id_query).scalar()
-        
-        # Process approved visitors if provided
-        approved_visitors = data.get('approved_visitors', [])
-        created_visitors = []
-        
-        for visitor_data in approved_visitors:
+        # The PUC and all its visitors commit together or not at all
+        for attempt in range(2):
             try:
-                # Create visitor record
-                visitor_query = text("""
-                    INSERT INTO visitors (first_name, last_name, relationship_to_puc, registered_at)
-                    VALUES (:first_name, :last_name, :relationship, :registered_at)
-                """)
-                
-                db.session.execute(visitor_query, {
-                    "first_name": visitor_data['first_name'],
-                    "last_name": visitor_data['last_name'],
-                    "relationship": visitor_data.get('relationship'),
-                    "registered_at": datetime.datetime.utcnow()
-                })
-                db.session.commit()
-                
-                # Get the visitor_id
-                visitor_id_query = text("SELECT LAST_INSERT_ID()")
-                visitor_id = db.session.execute(visitor_id_query).scalar()
-                
-                # Generate username and password
-                first_name = visitor_data['first_name'].lower()
-                last_name = visitor_data['last_name'].lower()
-                base_username = f"{first_name[0]}{last_name}"[:15]
-                
-                # Check if username exists and append number if needed
-                username = base_username
-                counter = 1
-                while User.query.filter_by(username=username).first():
-                    username = f"{base_username}{counter}"
-                    counter += 1
-                
-                # Generate random password
-                password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-                
-                # Create user account
-                hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-                user_query = text("""
-                    INSERT INTO users (username, password_hash, role_id, email, full_name, visitor_id, created_at)
-                    VALUES (:username, :password_hash, :role_id, :email, :full_name, :visitor_id, :created_at)
-                """)
-                
-                db.session.execute(user_query, {
-                    "username": username,
-                    "password_hash": hashed_password,
-                    "role_id": 3,
-                    "email": visitor_data.get('email'),
-                    "full_name": f"{visitor_data['first_name']} {visitor_data['last_name']}",
-                    "visitor_id": visitor_id,
+                pupc_id = db.session.execute(puc_query, {
+                    "first_name": data['first_name'],
+                    "last_name": data['last_name'],
+                    "gender": data.get('gender'),
+                    "age": data.get('age'),
+                    "arrest_date": data.get('arrest_date'),
+                    "release_date": data.get('release_date'),
+                    "status": data.get('status', 'In Custody'),
+                    "category_id": data.get('category_id'),
+                    "crime_id": data.get('crime_id'),
+                    "mugshot_path": data.get('mugshot_path'),
                     "created_at": datetime.datetime.utcnow()
-                })
-                db.session.commit()
+                }).lastrowid
                 
-                # Get the user_id
-                user_id_query = text("SELECT LAST_INSERT_ID()")
-                user_id = db.session.execute(user_id_query).scalar()
+                created_visitors = []
+                if approved_visitors:
+                    created_visitors = insert_approved_visitors(pupc_id, approved_visitors, passwords, password_hashes)
                 
-                # Insert into approvedvisitors
-                approved_query = text("""
-                    INSERT INTO approvedvisitors (pupc_id, first_name, last_name, relationship, email, phone, visitor_id, user_id, username, password, account_created)
-                    VALUES (:pupc_id, :first_name, :last_name, :relationship, :email, :phone, :visitor_id, :user_id, :username, :password, 1)
-                """)
-                
-                db.session.execute(approved_query, {
-                    "pupc_id": pupc_id,
-                    "first_name": visitor_data['first_name'],
-                    "last_name": visitor_data['last_name'],
-                    "relationship": visitor_data.get('relationship'),
-                    "email": visitor_data.get('email'),
-                    "phone": visitor_data.get('phone'),
-                    "visitor_id": visitor_id,
-                    "user_id": user_id,
-                    "username": username,
-                    "password": password
-                })
                 db.session.commit()
-                
-                created_visitors.append({
-                    'visitor_id': visitor_id,
-                    'user_id': user_id,
-                    'first_name': visitor_data['first_name'],
-                    'last_name': visitor_data['last_name'],
-                    'relationship': visitor_data.get('relationship'),
-                    'email': visitor_data.get('email'),
-                    'phone': visitor_data.get('phone'),
-                    'username': username,
-                    'password': password
-                })
-                
-            except Exception as e:
-                current_app.logger.error(f"Error creating visitor: {str(e)}")
+                break
+            except IntegrityError:
                 db.session.rollback()
+                if attempt:
+                    raise
+                # A concurrent request took one of our usernames; allocate again
         
+        for visitor in created_visitors:
+            identity_cache.invalidate(visitor['user_id'])
+        
+        # The PUC's own fields too, which the dashboards add to their lists as they are
         return jsonify({
-            'pupc_id': pupc_id,
+            **puc_record(db.session.get(PUPC, pupc_id)),
+            'success': True,
             'message': 'PUC created successfully',
             'approved_visitors': created_visitors
         }), 201
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except PasswordPoolBusy as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Creating PUC rejected: {str(e)}")
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503, {'Retry-After': '2'}
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error creating PUC: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def write_import_chunk(chunk):
+    """Insert one chunk of validated import rows in its own transaction, recording each outcome"""
+    try:
+        pupc_ids = insert_pucs([params for _, params in chunk])
+        db.session.commit()
+    except (SQLAlchemyError, RuntimeError) as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing PUC rows {chunk[0][0]['row']}-{chunk[-1][0]['row']}: {str(e)}")
+        for result, _ in chunk:
+            result.update(status='error', error="Database error, this chunk was not written")
+        return
+    for (result, _), pupc_id in zip(chunk, pupc_ids):
+        result.update(status='inserted', pupc_id=pupc_id)
+
+@pucs_bp.route('/pucs/import', methods=['POST'])
+@token_required
+def import_pucs(current_user):
+    """Bulk PUC intake from a CSV or JSONL upload
+
+    The file is the multipart field "file" or the raw request body; ?format=csv|jsonl
+    overrides detection from the file name or content type. Rows are validated as they
+    are read, crime and category names resolve against the reference cache, and every
+    ?chunk_size= valid rows are written with one multi-row INSERT and committed, so a
+    failing chunk does not undo the ones before it. ?dry_run=1 validates only. The
+    report has one entry per row: inserted (with its pupc_id), valid or error.
+    """
+    try:
+        # Check if user has permission (admin or officer)
+        if current_user.role_id not in [1, 2]:  # Assuming 1=admin, 2=officer
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        upload = request.files.get('file')
+        if upload:
+            stream, filename, content_type = upload.stream, upload.filename, upload.content_type
+        else:
+            stream, filename, content_type = request.stream, None, request.content_type
+        fmt = import_format(request.args.get('format'), filename, content_type)
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        max_rows = current_app.config.get('PUC_IMPORT_MAX_ROWS', 5000)
+        chunk_size = request.args.get('chunk_size', current_app.config.get('PUC_IMPORT_CHUNK_SIZE', 200), type=int)
+        if not chunk_size or not 1 <= chunk_size <= 1000:
+            raise ValueError("chunk_size must be between 1 and 1000")
+        
+        names = ReferenceNames()
+        results = []
+        chunk = []
+        truncated = False
+        for line, record, error in read_import(stream, fmt):
+            if len(results) >= max_rows:
+                truncated = True
+                break
+            result = {'row': line}
+            results.append(result)
+            if error is None:
+                try:
+                    params = import_row(record, names)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                result.update(status='error', error=error)
+            elif dry_run:
+                result['status'] = 'valid'
+            else:
+                chunk.append((result, params))
+                if len(chunk) >= chunk_size:
+                    write_import_chunk(chunk)
+                    chunk = []
+        if chunk:
+            write_import_chunk(chunk)
+        
+        if not results:
+            raise ValueError("The upload has no rows")
+        
+        summary = {status: sum(1 for result in results if result['status'] == status)
+                   for status in ('inserted', 'valid', 'error')}
+        return jsonify({
+            'format': fmt,
+            'dry_run': dry_run,
+            'rows': len(results),
+            'truncated': truncated,
+            'max_rows': max_rows,
+            'summary': summary,
+            'results': results
+        })
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing PUCs: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @pucs_bp.route('/pucs/<int:pupc_id>', methods=['PUT'])
 @token_required
 def update_puc(current_user, pupc_id):
@@ -289,6 +419,16 @@ def update_puc(current_user, pupc_id):
         if not puc:
             return jsonify({"error": "PUC not found"}), 404
             
+        created_visitors = []
+        updated_user_ids, deleted_user_ids = [], []
+        
+        # Sync the roster first: it hashes new visitors' passwords before writing anything.
+        # Visitors left out of approved_visitors are only removed with replace_roster: true
+        if 'approved_visitors' in data:
+            created_visitors, updated_user_ids, deleted_user_ids = update_approved_visitors(
+                pupc_id, data['approved_visitors'], replace=data.get('replace_roster') is True
+            )
+        
         # Update PUC fields
         if 'first_name' in data:
             puc.first_name = data['first_name']
@@ -310,22 +450,28 @@ def update_puc(current_user, pupc_id):
             puc.crime_id = data['crime_id']
         if 'mugshot_path' in data:
             puc.mugshot_path = data['mugshot_path']
-            
-        db.session.commit()
         
-        created_visitors = []
+        # PUC fields, roster changes and the removed visitors' token revocations commit together
+        revocation_index.revoke_user(*deleted_user_ids)
+        db.session.commit()
         
-        # Process approved visitors if provided
-        if 'approved_visitors' in data:
-            # Handle approved visitors updates
-            created_visitors = update_approved_visitors(pupc_id, data['approved_visitors'])
+        identity_cache.invalidate(*updated_user_ids, *deleted_user_ids)
         
+        # The dashboards merge the returned fields into the PUC they show
         return jsonify({
-            'pupc_id': puc.pupc_id,
+            **puc_record(puc),
+            'success': True,
             'message': 'PUC updated successfully',
             'approved_visitors': created_visitors
         })
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except PasswordPoolBusy as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Updating PUC rejected: {str(e)}")
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503, {'Retry-After': '2'}
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error updating PUC: {str(e)}")
@@ -352,6 +498,10 @@ def add_visitor(current_user, pupc_id):
         
         return jsonify(result), 201
         
+    except PasswordPoolBusy as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Adding visitor rejected: {str(e)}")
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503, {'Retry-After': '2'}
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error adding visitor: {str(e)}")
@@ -360,24 +510,11 @@ def add_visitor(current_user, pupc_id):
 
 def create_approved_visitor(pupc_id, visitor_data):
     try:
-        # Generate username and password
-        first_name = visitor_data['first_name'].lower()
-        last_name = visitor_data['last_name'].lower()
-        base_username = f"{first_name[0]}{last_name}"[:15]  # First initial + last name, max 15 chars
-        
-        # Check if username exists and append number if needed
-        username = base_username
-        counter = 1
-        while User.query.filter_by(username=username).first():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
         # Generate random password
-        password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+        password = generate_password()
         
         # Log what we're about to do
         current_app.logger.info(f"Creating visitor: {visitor_data['first_name']} {visitor_data['last_name']}")
-        current_app.logger.info(f"Username: {username}, Password: {password}")
         
         # Create visitor record using direct SQL
         visitor_query = text("""
@@ -404,7 +541,11 @@ def create_approved_visitor(pupc_id, visitor_data):
             VALUES (:username, :password_hash, :role_id, :email, :full_name, :visitor_id, :created_at)
         """)
         
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = password_pool.hash(password)
+        
+        # Allocated in the transaction that inserts the user, which holds the reservation
+        username = username_allocator.allocate([visitor_username_base(visitor_data)])[0]
+        current_app.logger.info(f"Username: {username}, Password: {password}")
         
         db.session.execute(user_query, {
             "username": username,
@@ -420,6 +561,7 @@ def create_approved_visitor(pupc_id, visitor_data):
         # Get the user_id
         user_id_query = text("SELECT LAST_INSERT_ID()")
         user_id_result = db.session.execute(user_id_query).scalar()
+        identity_cache.invalidate(user_id_result)
         current_app.logger.info(f"Created user with ID: {user_id_result}")
         
         # Create approved visitor record using direct SQL
@@ -517,171 +659,120 @@ def create_approved_visitor(pupc_id, visitor_data):
         current_app.logger.error(traceback.format_exc())
         raise e
 
-def update_approved_visitors(pupc_id, visitors_data):
-    # Track created visitors
-    created_visitors = []
+# Columns of an approved visitor the roster sync compares and writes
+APPROVED_VISITOR_COLUMNS = ('first_name', 'last_name', 'relationship', 'email', 'phone')
+
+def update_approved_visitors(pupc_id, visitors_data, replace=False):
+    """Sync the PUC's approved-visitor roster to visitors_data, in the caller's transaction
+
+    The current roster is read once and diffed in memory: entries with a known
+    approval_id are updated only when something changed and entries without one are
+    created. Roster rows left out are kept, unless replace is set, in which case they
+    are deleted with their user and visitor. Each
+    kind of change is applied with one multi-row statement per table, so the number
+    of queries does not grow with the roster. Returns the submitted entries with
+    their ids and credentials in order, the updated user ids and the deleted ones.
+    """
+    roster = {row.approval_id: row for row in db.session.execute(text("""
+        SELECT approval_id, visitor_id, user_id, username, password,
+               first_name, last_name, relationship, email, phone
+        FROM approvedvisitors
+        WHERE pupc_id = :pupc_id
+    """), {"pupc_id": pupc_id})}
     
-    # Check if approvedvisitors table exists
-    check_table_query = text("""
-        SELECT COUNT(*) 
-        FROM information_schema.tables 
-        WHERE table_schema = 'themis_db' 
-        AND table_name = 'approvedvisitors'
-    """)
-    table_exists = db.session.execute(check_table_query).scalar() > 0
+    updates, inserts, kept = [], [], set()
+    for index, visitor_data in enumerate(visitors_data):
+        approval_id = visitor_data.get('approval_id')
+        if approval_id:
+            current = roster.get(approval_id)
+            if current is None:
+                raise ValueError(f"Approved visitor {index}: approval_id {approval_id} is not on this PUC's roster")
+            kept.add(approval_id)
+            # Fields left out keep their current value
+            merged = {column: visitor_data.get(column, getattr(current, column)) for column in APPROVED_VISITOR_COLUMNS}
+            if not merged['first_name'] or not merged['last_name']:
+                raise ValueError(f"Approved visitor {index}: first_name and last_name cannot be empty")
+            changed = any(merged[column] != getattr(current, column) for column in APPROVED_VISITOR_COLUMNS)
+            updates.append((index, current, merged, changed))
+        else:
+            for field in ('first_name', 'last_name'):
+                if not visitor_data.get(field):
+                    raise ValueError(f"Approved visitor {index}: missing required field: {field}")
+            inserts.append((index, visitor_data))
+    # A partial or not-yet-loaded list must never empty the roster by accident
+    removed = [row for approval_id, row in roster.items() if approval_id not in kept] if replace else []
     
-    if table_exists:
-        # Get existing approved visitors
-        existing_query = text("""
-            SELECT approval_id, visitor_id, user_id, username, password
-            FROM approvedvisitors
-            WHERE pupc_id = :pupc_id
-        """)
-        existing_results = db.session.execute(existing_query, {"pupc_id": pupc_id}).fetchall()
-        existing_ids = {row[0] for row in existing_results}
-        
-        # Track processed IDs
-        processed_ids = set()
+    # Hash before writing so bcrypt never runs while rows are locked
+    passwords = [generate_password() for _ in inserts]
+    password_hashes = [password_pool.hash(password) for password in passwords]
     
-    # Process each visitor in the data
-    for visitor_data in visitors_data:
-        try:
-            if table_exists and 'approval_id' in visitor_data and visitor_data['approval_id']:
-                # Update existing visitor
-                approval_id = visitor_data['approval_id']
-                processed_ids.add(approval_id)
-                
-                # Get visitor and user IDs
-                get_ids_query = text("""
-                    SELECT visitor_id, user_id
-                    FROM approvedvisitors
-                    WHERE approval_id = :approval_id
-                """)
-                ids_result = db.session.execute(get_ids_query, {"approval_id": approval_id}).fetchone()
-                
-                if ids_result:
-                    visitor_id = ids_result[0]
-                    user_id = ids_result[1]
-                    
-                    # Update visitors table
-                    visitor_update_query = text("""
-                        UPDATE visitors 
-                        SET first_name = :first_name, 
-                            last_name = :last_name, 
-                            relationship_to_puc = :relationship
-                        WHERE visitor_id = :visitor_id
-                    """)
-                    
-                    db.session.execute(visitor_update_query, {
-                        "first_name": visitor_data.get('first_name'),
-                        "last_name": visitor_data.get('last_name'),
-                        "relationship": visitor_data.get('relationship'),
-                        "visitor_id": visitor_id
-                    })
-                    db.session.commit()
-                    
-                    # Update users table
-                    user_update_query = text("""
-                        UPDATE users
-                        SET email = :email,
-                            full_name = :full_name
-                        WHERE user_id = :user_id
-                    """)
-                    
-                    db.session.execute(user_update_query, {
-                        "email": visitor_data.get('email'),
-                        "full_name": f"{visitor_data.get('first_name')} {visitor_data.get('last_name')}",
-                        "user_id": user_id
-                    })
-                    db.session.commit()
-                    
-                    # Update approvedvisitors table
-                    approved_update_query = text("""
-                        UPDATE approvedvisitors 
-                        SET first_name = :first_name, 
-                            last_name = :last_name, 
-                            relationship = :relationship,
-                            email = :email,
-                            phone = :phone
-                        WHERE approval_id = :approval_id
-                    """)
-                    
-                    db.session.execute(approved_update_query, {
-                        "first_name": visitor_data.get('first_name'),
-                        "last_name": visitor_data.get('last_name'),
-                        "relationship": visitor_data.get('relationship'),
-                        "email": visitor_data.get('email'),
-                        "phone": visitor_data.get('phone'),
-                        "approval_id": approval_id
-                    })
-                    db.session.commit()
-                    
-                    # Get username and password
-                    creds_query = text("""
-                        SELECT username, password
-                        FROM approvedvisitors
-                        WHERE approval_id = :approval_id
-                    """)
-                    creds_result = db.session.execute(creds_query, {"approval_id": approval_id}).fetchone()
-                    
-                    # Add to created_visitors list with existing credentials
-                    created_visitors.append({
-                        'approval_id': approval_id,
-                        'visitor_id': visitor_id,
-                        'user_id': user_id,
-                        'first_name': visitor_data.get('first_name'),
-                        'last_name': visitor_data.get('last_name'),
-                        'username': creds_result[0] if creds_result else '',
-                        'password': creds_result[1] if creds_result else ''
-                    })
-            else:
-                # Add new visitor
-                new_visitor = create_approved_visitor(pupc_id, visitor_data)
-                created_visitors.append(new_visitor)
-        except Exception as e:
-            current_app.logger.error(f"Error processing visitor: {str(e)}")
-            current_app.logger.error(traceback.format_exc())
+    changed = [(current, merged) for _, current, merged, is_changed in updates if is_changed]
+    if changed:
+        visitor_rows = [{
+            "visitor_id": current.visitor_id,
+            "first_name": merged['first_name'],
+            "last_name": merged['last_name'],
+            "relationship": merged['relationship']
+        } for current, merged in changed if current.visitor_id is not None]
+        if visitor_rows:
+            db.session.execute(text("""
+                UPDATE visitors 
+                SET first_name = :first_name, 
+                    last_name = :last_name, 
+                    relationship_to_puc = :relationship
+                WHERE visitor_id = :visitor_id
+            """), visitor_rows)
+        
+        user_rows = [{
+            "user_id": current.user_id,
+            "email": merged['email'],
+            "full_name": f"{merged['first_name']} {merged['last_name']}"
+        } for current, merged in changed if current.user_id is not None]
+        if user_rows:
+            db.session.execute(text("""
+                UPDATE users
+                SET email = :email,
+                    full_name = :full_name
+                WHERE user_id = :user_id
+            """), user_rows)
+        
+        db.session.execute(text("""
+            UPDATE approvedvisitors 
+            SET first_name = :first_name, 
+                last_name = :last_name, 
+                relationship = :relationship,
+                email = :email,
+                phone = :phone
+            WHERE approval_id = :approval_id
+        """), [dict(merged, approval_id=current.approval_id) for current, merged in changed])
     
-    # Remove visitors not in the updated list if approvedvisitors table exists
-    if table_exists:
-        for approval_id in existing_ids - processed_ids:
-            try:
-                # Get visitor and user IDs first
-                get_ids_query = text("""
-                    SELECT visitor_id, user_id
-                    FROM approvedvisitors
-                    WHERE approval_id = :approval_id
-                """)
-                ids_result = db.session.execute(get_ids_query, {"approval_id": approval_id}).fetchone()
-                
-                if ids_result:
-                    visitor_id = ids_result[0]
-                    user_id = ids_result[1]
-                    
-                    # Delete from approvedvisitors
-                    delete_approved_query = text("""
-                        DELETE FROM approvedvisitors
-                        WHERE approval_id = :approval_id
-                    """)
-                    db.session.execute(delete_approved_query, {"approval_id": approval_id})
-                    db.session.commit()
-                    
-                    # Delete from users
-                    delete_user_query = text("""
-                        DELETE FROM users
-                        WHERE user_id = :user_id
-                    """)
-                    db.session.execute(delete_user_query, {"user_id": user_id})
-                    db.session.commit()
-                    
-                    # Delete from visitors
-                    delete_visitor_query = text("""
-                        DELETE FROM visitors
-                        WHERE visitor_id = :visitor_id
-                    """)
-                    db.session.execute(delete_visitor_query, {"visitor_id": visitor_id})
-                    db.session.commit()
-            except Exception as e:
-                current_app.logger.error(f"Error removing visitor: {str(e)}")
+    if removed:
+        # Children first: approvedvisitors points at users, users at visitors
+        for query, ids in (
+            ("DELETE FROM approvedvisitors WHERE approval_id IN :ids", [row.approval_id for row in removed]),
+            ("DELETE FROM users WHERE user_id IN :ids", [row.user_id for row in removed if row.user_id is not None]),
+            ("DELETE FROM visitors WHERE visitor_id IN :ids", [row.visitor_id for row in removed if row.visitor_id is not None])
+        ):
+            if ids:
+                db.session.execute(text(query).bindparams(bindparam('ids', expanding=True)), {"ids": ids})
+    
+    results = [None] * len(visitors_data)
+    for index, current, merged, _ in updates:
+        results[index] = {
+            'approval_id': current.approval_id,
+            'visitor_id': current.visitor_id,
+            'user_id': current.user_id,
+            'first_name': merged['first_name'],
+            'last_name': merged['last_name'],
+            'username': current.username or '',
+            'password': current.password or ''
+        }
+    if inserts:
+        created = insert_approved_visitors(pupc_id, [visitor_data for _, visitor_data in inserts],
+                                           passwords, password_hashes)
+        for (index, _), visitor in zip(inserts, created):
+            results[index] = visitor
     
-    return created_visitors
\ No newline at end of file
+    updated_user_ids = [current.user_id for current, _ in changed if current.user_id is not None]
+    deleted_user_ids = [row.user_id for row in removed if row.user_id is not None]
+    return results, updated_user_ids, deleted_user_ids
@@ -4,10 +4,20 @@ from fpdf import FPDF
 import io
 import os
 import datetime
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+
+from reference_cache import reference_cache
+from query_cache import query_cache
 
 reports_bp = Blueprint('reports', __name__)
 
+def with_crime_names(rows):
+    """Replace each row's crime_id with the crime type name from the reference cache"""
+    crime_name = reference_cache.column('crimetypes', 'name')
+    for row in rows:
+        row['crime'] = crime_name(row.pop('crime_id'))
+    return rows
+
 class PDF(FPDF):
     def header(self):
         # Logo
@@ -35,14 +45,12 @@ def export_puc_report(format):
             SELECT 
                 p.pupc_id,
                 CONCAT(p.first_name, ' ', p.last_name) as name,
-                ct.name as crime,
+                p.crime_id,
                 p.status,
                 p.arrest_date,
                 p.release_date,
                 p.created_at
             FROM pupcs p
-            LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
-            LEFT JOIN crimecategories cc ON p.category_id = cc.category_id
             WHERE 1=1
         """
         params = {}
@@ -52,8 +60,9 @@ def export_puc_report(format):
             params['status'] = status
             
         if category:
-            query += " AND cc.name = :category"
-            params['category'] = category
+            # Resolve the category name to ids up front instead of joining crimecategories
+            query += " AND p.category_id IN :category_ids"
+            params['category_ids'] = reference_cache.category_ids_named(category)
             
         if date_range != 'all':
             if date_range == 'today':
@@ -64,8 +73,11 @@ def export_puc_report(format):
                 query += " AND p.created_at >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)"
         
         # Execute query
-        result = db.session.execute(text(query), params)
-        pucs = [dict(row._mapping) for row in result]
+        statement = text(query)
+        if category:
+            statement = statement.bindparams(bindparam('category_ids', expanding=True))
+        result = db.session.execute(statement, params)
+        pucs = with_crime_names([dict(row._mapping) for row in result])
         
         if format == 'pdf':
             return generate_puc_pdf(pucs)
@@ -141,51 +153,53 @@ def export_analytics_report(format):
             GROUP BY status
             ORDER BY count DESC
         """
-        status_result = db.session.execute(text(status_query))
+        status_result = query_cache.fetch(status_query)
         status_counts = [dict(row._mapping) for row in status_result]
         
         # 2. Category counts
         category_query = """
-            SELECT cc.name, COUNT(*) as count
+            SELECT p.category_id, COUNT(*) as count
             FROM pupcs p
-            LEFT JOIN crimecategories cc ON p.category_id = cc.category_id
             WHERE p.category_id IS NOT NULL
-            GROUP BY cc.name
-            ORDER BY count DESC
+            GROUP BY p.category_id
         """
-        category_result = db.session.execute(text(category_query))
-        category_counts = [dict(row._mapping) for row in category_result]
+        category_result = query_cache.fetch(category_query)
+        by_name = {}
+        for row in category_result:
+            category = reference_cache.category(row[0])
+            name = category['name'] if category else None
+            by_name[name] = by_name.get(name, 0) + row[1]
+        category_counts = [{'name': name, 'count': count}
+                           for name, count in sorted(by_name.items(), key=lambda item: -item[1])]
         
         # 3. Recently released PUCs
         released_query = """
             SELECT 
                 CONCAT(p.first_name, ' ', p.last_name) as name,
-                ct.name as crime,
+                p.crime_id,
                 p.release_date,
                 p.arrest_date
             FROM pupcs p
-            LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
             WHERE p.release_date IS NOT NULL
             ORDER BY p.release_date DESC
             LIMIT 10
         """
-        released_result = db.session.execute(text(released_query))
-        released_pucs = [dict(row._mapping) for row in released_result]
+        released_result = query_cache.fetch(released_query)
+        released_pucs = with_crime_names([dict(row._mapping) for row in released_result])
         
         # 4. Recently added PUCs
         recent_query = """
             SELECT 
                 CONCAT(p.first_name, ' ', p.last_name) as name,
-                ct.name as crime,
+                p.crime_id,
                 p.status,
                 p.created_at
             FROM pupcs p
-            LEFT JOIN crimetypes ct ON p.crime_id = ct.crime_id
             ORDER BY p.created_at DESC
             LIMIT 10
         """
-        recent_result = db.session.execute(text(recent_query))
-        recent_pucs = [dict(row._mapping) for row in recent_result]
+        recent_result = query_cache.fetch(recent_query)
+        recent_pucs = with_crime_names([dict(row._mapping) for row in recent_result])
         
         # Combine all data
         analytics_data = {
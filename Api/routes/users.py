@@ -2,8 +2,10 @@ from flask import Blueprint, jsonify, request, current_app
 import traceback
 from sqlalchemy import text
 
-from db import db, User, Role
+from db import db, User, Role, user_query
 from routes.auth import token_required
+from identity_cache import identity_cache
+from revocation import revocation_index
 
 # Create blueprint
 users_bp = Blueprint('users', __name__)
@@ -108,7 +110,7 @@ def delete_user(current_user, user_id):
             return jsonify({"error": "Unauthorized"}), 403
             
         # Check if user exists
-        user = User.query.get(user_id)
+        user = user_query(User.user_id, User.visitor_id).filter_by(user_id=user_id).first()
         if not user:
             return jsonify({"error": "User not found"}), 404
             
@@ -130,7 +132,9 @@ def delete_user(current_user, user_id):
         
         # Delete user
         db.session.delete(user)
+        revocation_index.revoke_user(user_id)
         db.session.commit()
+        identity_cache.invalidate(user_id)
         
         return jsonify({"message": "User deleted successfully"})
     except Exception as e:
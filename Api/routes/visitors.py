@@ -6,6 +6,10 @@ import string
 import mysql.connector
 import bcrypt
 
+from usernames import username_allocator, username_base
+from table_versions import table_versions
+from stat_counters import stat_counters
+
 # Create blueprint
 visitors_bp = Blueprint('visitors', __name__)
 
@@ -30,20 +34,8 @@ def add_visitor(pupc_id):
         cursor = conn.cursor(dictionary=True)
         
         try:
-            # Generate username and password
-            first_name = data['first_name'].lower()
-            last_name = data['last_name'].lower()
-            base_username = f"{first_name[0]}{last_name}"[:15]
-            
-            # Check if username exists and append number if needed
-            username = base_username
-            counter = 1
-            
-            cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
-            while cursor.fetchone():
-                username = f"{base_username}{counter}"
-                counter += 1
-                cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
+            # Generate username (one prefix lookup covers the base and its numbered forms)
+            username = username_allocator.allocate([username_base(data['first_name'], data['last_name'])], cursor=cursor)[0]
             
             # Generate random password
             password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
@@ -64,6 +56,8 @@ def add_visitor(pupc_id):
                     "INSERT INTO visitors (first_name, last_name, relationship_to_puc, registered_at) VALUES (%s, %s, %s, %s)",
                     (data['first_name'], data['last_name'], data.get('relationship'), datetime.datetime.now())
                 )
+                table_versions.publish_raw(conn, 'visitors')
+                stat_counters.mark_stale_raw(conn, 'visitors')
                 conn.commit()
                 
                 # Get the visitor_id
@@ -83,6 +77,8 @@ def add_visitor(pupc_id):
                 "INSERT INTO users (username, password_hash, role_id, email, full_name, visitor_id, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s)",
                 (username, hashed_password, 3, data.get('email'), full_name, visitor_id, datetime.datetime.now())
             )
+            table_versions.publish_raw(conn, 'users')
+            stat_counters.mark_stale_raw(conn, 'users')
             conn.commit()
             
             # Get the user_id
@@ -94,6 +90,7 @@ def add_visitor(pupc_id):
                 "INSERT INTO approvedvisitors (pupc_id, first_name, last_name, relationship, email, phone, visitor_id, user_id, username, password, account_created) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
                 (pupc_id, data['first_name'], data['last_name'], data.get('relationship'), data.get('email'), data.get('phone'), visitor_id, user_id, username, password, True)
             )
+            table_versions.publish_raw(conn, 'approvedvisitors')
             conn.commit()
             
             # Get the approval_id
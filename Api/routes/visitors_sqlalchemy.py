@@ -6,7 +6,10 @@ import string
 from sqlalchemy import text
 
 from db import db
-from routes.auth import token_required, bcrypt
+from routes.auth import token_required
+from identity_cache import identity_cache
+from password_pool import password_pool, PasswordPoolBusy
+from usernames import username_allocator, username_base
 
 # Create blueprint
 visitors_bp = Blueprint('visitors', __name__)
@@ -28,20 +31,6 @@ def add_visitor(current_user, pupc_id):
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
         try:
-            # Generate username and password
-            first_name = data['first_name'].lower()
-            last_name = data['last_name'].lower()
-            base_username = f"{first_name[0]}{last_name}"[:15]
-            
-            # Check if username exists and append number if needed
-            username_query = text("SELECT username FROM users WHERE username = :username")
-            username = base_username
-            counter = 1
-            
-            while db.session.execute(username_query, {"username": username}).fetchone():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
             # Generate random password (limited to 20 chars for database column)
             password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
             
@@ -75,9 +64,12 @@ def add_visitor(current_user, pupc_id):
                 raise Exception(f"Visitor with ID {visitor_id} does not exist")
             
             # Create user account
-            hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+            hashed_password = password_pool.hash(password)
             full_name = f"{data['first_name']} {data['last_name']}"
             
+            # Allocated in the transaction that inserts the user, which holds the reservation
+            username = username_allocator.allocate([username_base(data['first_name'], data['last_name'])])[0]
+            
             user_query = text("""
                 INSERT INTO users (username, password_hash, role_id, email, full_name, visitor_id, created_at)
                 VALUES (:username, :password_hash, :role_id, :email, :full_name, :visitor_id, :created_at)
@@ -97,6 +89,7 @@ def add_visitor(current_user, pupc_id):
             # Get the user_id
             user_id_query = text("SELECT LAST_INSERT_ID()")
             user_id = db.session.execute(user_id_query).scalar()
+            identity_cache.invalidate(user_id)
             current_app.logger.info(f"Created user with ID: {user_id}")
             
             # Log the values being inserted
@@ -149,6 +142,10 @@ def add_visitor(current_user, pupc_id):
                 'message': 'Visitor added and account created'
             })
             
+        except PasswordPoolBusy as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Adding visitor rejected: {str(e)}")
+            return jsonify({"error": "Server is busy, please try again shortly"}), 503, {'Retry-After': '2'}
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Database error: {str(e)}")
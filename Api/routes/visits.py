@@ -1,11 +1,15 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_bcrypt import Bcrypt
 import traceback
-from sqlalchemy import desc
+from sqlalchemy import desc, text, bindparam
 import datetime
 
 from db import db, PUPC, Visitor, VisitorLog, User, AuditLog
 from routes.auth import token_required
+from pagination import optional_page_size, paged_response
+from visitor_logs import fetch_visitor_logs, visitor_log_filters
+from event_feed import event_feed, visit_log_payload, STATUS_EVENTS
+from stat_counters import stat_counters
 
 # Create blueprint
 visits_bp = Blueprint('visits', __name__)
@@ -179,6 +183,152 @@ def reject_visit(current_user, log_id):
         current_app.logger.error(f"Error rejecting visit: {str(e)}")
         current_app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
+
+# Accepted spellings of a decision -> the approval_status it sets
+DECISIONS = {'approve': 'Approved', 'approved': 'Approved', 'reject': 'Rejected', 'rejected': 'Rejected'}
+# approval_status -> (audit event type, audit note) of a decision
+DECISION_AUDIT = {
+    'Approved': ('Visit Approval', 'Approved visit request #{}'),
+    'Rejected': ('Visit Rejection', 'Rejected visit request #{}')
+}
+
+DECISION_ROWS_QUERY = text("""
+    SELECT visitor_log_id, pupc_id, visitor_id, visit_date, visit_time, purpose, approval_status, approved_by
+    FROM visitorlogs
+    WHERE visitor_log_id IN :ids
+""").bindparams(bindparam('ids', expanding=True))
+# Every row it changes leaves Pending, so the caller reports the pending counter's delta
+DECIDE_PENDING = text("""
+    UPDATE visitorlogs SET approval_status = :decision, approved_by = :approved_by
+    WHERE visitor_log_id IN :ids AND approval_status = 'Pending'
+""").bindparams(bindparam('ids', expanding=True)).execution_options(stat_counters_counted=True)
+
+def decision_request(data, max_items):
+    """(approval_status, visitor_log_ids without duplicates, remarks) from a batch decision body"""
+    decision = DECISIONS.get(str(data.get('decision', '')).strip().lower())
+    if decision is None:
+        raise ValueError("decision must be approve or reject")
+    ids = data.get('visitor_log_ids')
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("visitor_log_ids must be a non-empty list")
+    if len(ids) > max_items:
+        raise ValueError(f"At most {max_items} visit requests per batch")
+    if not all(isinstance(log_id, int) and not isinstance(log_id, bool) for log_id in ids):
+        raise ValueError("visitor_log_ids must be integers")
+    remarks = data.get('remarks')
+    if remarks is not None and (not isinstance(remarks, str) or len(remarks) > 255):
+        raise ValueError("remarks must be a string of at most 255 characters")
+    return decision, list(dict.fromkeys(ids)), remarks
+
+def decide_visit_logs(decision, ids, current_user, remarks):
+    """Move the still-pending ids to decision in one transaction; returns ({id: row as read}, decided ids)"""
+    rows = {row.visitor_log_id: row for row in db.session.execute(DECISION_ROWS_QUERY, {"ids": ids})}
+    pending = [log_id for log_id in ids if log_id in rows and rows[log_id].approval_status == 'Pending']
+    params = {"decision": decision, "approved_by": current_user.user_id}
+    
+    decided = []
+    if pending:
+        # The Pending condition makes the UPDATE itself the arbiter between officers
+        if db.session.execute(DECIDE_PENDING, {**params, "ids": pending}).rowcount == len(pending):
+            decided = pending
+        else:
+            # Someone decided part of the batch since it was read: redo it row by row to learn which
+            db.session.rollback()
+            decided = [log_id for log_id in pending
+                       if db.session.execute(DECIDE_PENDING, {**params, "ids": [log_id]}).rowcount]
+    
+    if decided:
+        # Added after any fallback: its rollback discards deltas reported before it
+        stat_counters.add(db.session, 'visitorlogs_pending', -len(decided))
+        now = datetime.datetime.utcnow()
+        event_type, note = DECISION_AUDIT[decision]
+        db.session.execute(text("""
+            INSERT INTO auditlogs (user_id, event_type, event_time, ip_address, notes)
+            VALUES (:user_id, :event_type, :event_time, :ip_address, :notes)
+        """), [{
+            "user_id": current_user.user_id,
+            "event_type": event_type,
+            "event_time": now,
+            "ip_address": request.remote_addr,
+            "notes": note.format(log_id)
+        } for log_id in decided])
+        db.session.execute(text("""
+            INSERT INTO visitorapprovals (visitor_log_id, approved_by, decision, decision_time, remarks)
+            VALUES (:visitor_log_id, :approved_by, :decision, :decision_time, :remarks)
+        """), [{
+            "visitor_log_id": log_id,
+            "approved_by": current_user.user_id,
+            "decision": decision,
+            "decision_time": now,
+            "remarks": remarks
+        } for log_id in decided])
+        # Raw UPDATEs bypass the ORM flush the event feed watches
+        for log_id in decided:
+            event_feed.record(db.session, STATUS_EVENTS[decision], {
+                **visit_log_payload(rows[log_id]),
+                'approval_status': decision,
+                'approved_by': current_user.user_id
+            })
+    
+    db.session.commit()
+    return rows, decided
+
+@visits_bp.route('/visitor-logs/decisions', methods=['POST'])
+@token_required
+def decide_visits(current_user):
+    """Approve or reject many visit requests at once
+
+    Body: {"decision": "approve" | "reject", "visitor_log_ids": [...], "remarks"}.
+    Pending requests are decided with one set-based UPDATE, and their audit log and
+    visitorapprovals rows are written with one multi-row insert each, all in one
+    transaction. Each id is reported as decided, already_decided (by whom and how,
+    including requests another officer decided meanwhile) or not_found.
+    """
+    try:
+        # Check if user has permission (admin or officer)
+        if current_user.role_id not in [1, 2]:  # Assuming 1=admin, 2=officer
+            return jsonify({"error": "Unauthorized"}), 403
+        
+        decision, ids, remarks = decision_request(
+            request.get_json(silent=True) or {},
+            current_app.config.get('VISIT_DECISION_MAX_ITEMS', 500)
+        )
+        rows, decided = decide_visit_logs(decision, ids, current_user, remarks)
+        
+        # Requests another officer decided while we held a stale Pending read
+        decided_ids = set(decided)
+        stale = [log_id for log_id in ids
+                 if log_id in rows and log_id not in decided_ids and rows[log_id].approval_status == 'Pending']
+        if stale:
+            rows.update({row.visitor_log_id: row for row in db.session.execute(DECISION_ROWS_QUERY, {"ids": stale})})
+        
+        results = []
+        for log_id in ids:
+            if log_id in decided_ids:
+                results.append({'visitor_log_id': log_id, 'outcome': 'decided',
+                                'approval_status': decision, 'approved_by': current_user.user_id})
+            elif log_id in rows:
+                results.append({'visitor_log_id': log_id, 'outcome': 'already_decided',
+                                'approval_status': rows[log_id].approval_status,
+                                'approved_by': rows[log_id].approved_by})
+            else:
+                results.append({'visitor_log_id': log_id, 'outcome': 'not_found'})
+        
+        return jsonify({
+            'decision': decision,
+            'summary': {outcome: sum(1 for result in results if result['outcome'] == outcome)
+                        for outcome in ('decided', 'already_decided', 'not_found')},
+            'results': results
+        })
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deciding visits: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @visits_bp.route('/visitor-logs/stats', methods=['GET'])
 @token_required
 def get_visitor_stats(current_user):
@@ -237,41 +387,37 @@ def get_visitor_stats(current_user):
 def get_visitor_logs(current_user):
     try:
         # Get visitor ID from the current user
-        visitor = Visitor.query.filter_by(user_id=current_user.user_id).first()
+        visitor_id = getattr(current_user, 'visitor_id', None)
         
-        if not visitor:
+        if not visitor_id:
             return jsonify({"error": "No visitor profile found for this user"}), 404
-            
-        visitor_id = visitor.visitor_id
-        
-        # Query visitor logs with PUC names
-        query = db.session.query(
-            VisitorLog,
-            PUPC.first_name.label('pupc_first_name'),
-            PUPC.last_name.label('pupc_last_name')
-        ).join(
-            PUPC, VisitorLog.pupc_id == PUPC.pupc_id
-        ).filter(
-            VisitorLog.visitor_id == visitor_id
-        ).order_by(desc(VisitorLog.created_at))
         
-        visits = query.all()
+        # Query one keyset page of this visitor's logs with PUC names
+        filters = visitor_log_filters(request.args)
+        filters['visitor_id'] = visitor_id
+        rows, next_cursor = fetch_visitor_logs(
+            filters,
+            cursor=request.args.get('cursor'),
+            limit=optional_page_size()
+        )
         
         result = []
-        for visit, pupc_first_name, pupc_last_name in visits:
+        for row in rows:
             result.append({
-                'visitor_log_id': visit.visitor_log_id,
-                'pupc_id': visit.pupc_id,
-                'visitor_id': visit.visitor_id,
-                'pupc_name': f"{pupc_first_name} {pupc_last_name}",
-                'visit_time': str(visit.visit_time),
-                'visit_date': visit.visit_date,
-                'purpose': visit.purpose,
-                'approval_status': visit.approval_status,
-                'created_at': visit.created_at
+                'visitor_log_id': row.visitor_log_id,
+                'pupc_id': row.pupc_id,
+                'visitor_id': row.visitor_id,
+                'pupc_name': f"{row.pupc_first_name} {row.pupc_last_name}",
+                'visit_time': str(row.visit_time),
+                'visit_date': row.visit_date,
+                'purpose': row.purpose,
+                'approval_status': row.approval_status,
+                'created_at': row.created_at
             })
         
-        return jsonify(result)
+        return paged_response(result, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching visitor logs: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from table_versions import table_versions
+
+class MemoryStore:
+    """In-process key-value store speaking the subset of the redis client protocol we use
+
+    get/set(ex=)/delete/incr/expire/ttl behave like redis.Redis (values come back as
+    bytes, incr on a missing key starts at 0), so it serves both as the single-node
+    backend and as the stand-in for the networked store in tests. Bounded by LRU.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._values.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        with self._lock:
+            self._store(key, value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._values.pop(key, None) is not None)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires_at = self._live(key) or (b'0', None)
+            value = int(value) + 1
+            self._store(key, str(value).encode('ascii'), expires_at)
+            return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._values[key] = (entry[0], time.time() + seconds)
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else max(0, int(entry[1] - time.time()))
+
+    def _store(self, key, value, expires_at):
+        self._values[key] = (value, expires_at)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_keys:
+            self._values.popitem(last=False)
+
+    def _live(self, key):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._values[key]
+            return None
+        return entry
+
+def store_from_url(url):
+    """Build the store for SHARED_CACHE_URL: memory:// or redis://host:port/db"""
+    if not url or url.startswith('memory://'):
+        return MemoryStore()
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        import redis  # Only needed when several API nodes share the cache
+        return redis.Redis.from_url(url)
+    raise ValueError(f"Unsupported shared cache storage: {url}")
+
+class SharedCache:
+    """JSON values with TTLs in a store shared by every worker and node that points at it
+
+    Holds session-independent data only: anything cached here must be safe to hand
+    to any caller. Store failures degrade to cache misses.
+    """
+
+    def __init__(self, store=None, prefix='themis', default_ttl=60):
+        self.store = store or MemoryStore()
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.store = store_from_url(app.config.get('SHARED_CACHE_URL'))
+        self.default_ttl = app.config.get('SHARED_CACHE_TTL', self.default_ttl)
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        try:
+            raw = self.store.get(self._key(key))
+        except Exception:
+            self._count('errors')
+            return None
+        if raw is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.store.set(self._key(key), json.dumps(value), ex=ttl or self.default_ttl)
+        except Exception:
+            self._count('errors')
+
+    def delete(self, *keys):
+        try:
+            self.store.delete(*[self._key(key) for key in keys])
+        except Exception:
+            self._count('errors')
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def for_tables(self, name, tables, compute, ttl=None):
+        """compute() cached under the current cache_versions of the tables it reads
+
+        Any committed write to those tables moves the key on every node, so stale
+        entries are never read again and simply expire.
+        """
+        versions = table_versions.shared_key(tables)
+        if versions is None:
+            return compute()
+        return self.get_or_set(f"{name}:{versions}", compute, ttl)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'store': type(self.store).__name__,
+                'default_ttl_seconds': self.default_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'errors': self.errors
+            }
+
+# Shared instance for dashboard stats, reference tables, reports and rate-limit counters
+shared_cache = SharedCache()
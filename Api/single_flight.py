@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+
+class Flight:
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        # (body, status, headers) once the leader finishes, None if it raised
+        self.result = None
+
+class SingleFlight:
+    """Coalesce concurrent identical requests onto one in-flight computation
+
+    The first request for a key (the leader) runs the view; identical requests that
+    arrive meanwhile wait for its response instead of running the same queries.
+    While a recomputation is in flight, a response finished less than stale_seconds
+    ago is served immediately (stale-while-revalidate) rather than waited for.
+    """
+
+    def __init__(self, stale_seconds=5, wait_timeout=30, max_keys=256):
+        self.stale_seconds = stale_seconds
+        self.wait_timeout = wait_timeout
+        self.max_keys = max_keys
+        self._flights = {}
+        # key -> (finished_at, result) of the last successful leader
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.timeouts = 0
+
+    def init_app(self, app):
+        self.stale_seconds = app.config.get('SINGLE_FLIGHT_STALE', self.stale_seconds)
+        self.wait_timeout = app.config.get('SINGLE_FLIGHT_WAIT', self.wait_timeout)
+
+    def run(self, key, compute):
+        """(body, status, headers) for key, shared with concurrent callers of the same key"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                leader = True
+                self.leaders += 1
+            else:
+                leader = False
+                recent = self._recent.get(key)
+                if recent is not None and time.monotonic() - recent[0] < self.stale_seconds:
+                    self.stale_served += 1
+                    return recent[1]
+
+        if not leader:
+            if flight.done.wait(self.wait_timeout) and flight.result is not None:
+                with self._lock:
+                    self.coalesced += 1
+                return flight.result
+            # The leader failed or is stuck; answer this request on its own
+            with self._lock:
+                self.timeouts += 1
+            return compute()
+
+        try:
+            flight.result = compute()
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                if flight.result is not None and flight.result[1] == 200:
+                    self._recent[key] = (time.monotonic(), flight.result)
+                    self._recent.move_to_end(key)
+                    while len(self._recent) > self.max_keys:
+                        self._recent.popitem(last=False)
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stale_seconds': self.stale_seconds,
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'stale_served': self.stale_served,
+                'timeouts': self.timeouts
+            }
+
+single_flight = SingleFlight()
+
+def coalesced(f):
+    """Share one run of the view between identical concurrent requests
+
+    Requests are identical when they hit the same route with the same query string
+    (parameter order ignored) under the same authorization scope (the caller's role
+    for views behind token_required). Only use on views whose body depends on nothing
+    else about the caller.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        user = args[0] if args else None
+        query = "&".join(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+        key = f"{request.path}?{query}|role:{getattr(user, 'role_id', '')}"
+
+        def compute():
+            response = make_response(f(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+
+        body, status, headers = single_flight.run(key, compute)
+        return make_response(body, status, headers)
+    return decorated
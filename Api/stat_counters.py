@@ -0,0 +1,274 @@
+import datetime
+import threading
+from sqlalchemy import event, inspect, text, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+from db import db
+from table_versions import WRITE_TARGET
+
+def same_day(value, today):
+    """True when a visit_date (date or ISO string) falls on today"""
+    return value is not None and str(value)[:10] == today.isoformat()
+
+# counter -> (table it counts, COUNT query, (column, test) for a filtered counter);
+# :today marks a per-day counter
+COUNTERS = {
+    'users': ('users', "SELECT COUNT(*) FROM users", None),
+    'pupcs': ('pupcs', "SELECT COUNT(*) FROM pupcs", None),
+    'visitors': ('visitors', "SELECT COUNT(*) FROM visitors", None),
+    'visitorlogs': ('visitorlogs', "SELECT COUNT(*) FROM visitorlogs", None),
+    'visitorlogs_pending': ('visitorlogs', "SELECT COUNT(*) FROM visitorlogs WHERE approval_status = 'Pending'",
+                            ('approval_status', lambda value, today: value == 'Pending')),
+    'visitorlogs_today': ('visitorlogs', "SELECT COUNT(*) FROM visitorlogs WHERE visit_date = :today",
+                          ('visit_date', same_day)),
+    'blacklist': ('blacklist', "SELECT COUNT(*) FROM blacklist", None)
+}
+
+ADD_TO_COUNTER = text("UPDATE stat_counters SET value = value + :delta WHERE name = :name")
+ADD_TO_DAY_COUNTER = text(
+    "UPDATE stat_counters SET value = value + :delta WHERE name = :name AND as_of = :today"
+)
+# A refreshed_at this old makes the next read recount the counter
+STALE = datetime.datetime(2000, 1, 1)
+MARK_STALE = text("UPDATE stat_counters SET refreshed_at = :stale WHERE name = :name")
+UPDATE_COUNTER = text(
+    "UPDATE stat_counters SET value = :value, as_of = :as_of, refreshed_at = :now WHERE name = :name"
+)
+INSERT_COUNTER = text(
+    "INSERT INTO stat_counters (name, value, as_of, refreshed_at) VALUES (:name, :value, :as_of, :now)"
+)
+
+def per_day(name):
+    return ':today' in COUNTERS[name][1]
+
+class StatCounters:
+    """Dashboard counts kept in stat_counters so reading them is one keyed SELECT
+
+    Write paths move the counters by deltas in their own transaction, applied as
+    value = value + :delta so concurrent writers add up instead of overwriting each
+    other: ORM flushes count their new and deleted rows (and status / date changes of
+    visit logs), raw INSERT and DELETE statements count their rowcount, and raw
+    UPDATEs that move a filtered counter report it with add() and run with the
+    stat_counters_counted execution option (other raw UPDATEs mark those counters
+    stale). Missing rows, stale rows, per-day counters from an earlier day and
+    counters not recounted for max_age seconds are recounted on read; reconcile()
+    recounts everything.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.delta_updates = 0
+        self.marked_stale = 0
+        self.reconciled = 0
+
+    def init_app(self, app):
+        self.max_age = app.config.get('STAT_COUNTER_MAX_AGE', self.max_age)
+        # before_commit is registered after table_versions, whose before_commit flushes
+        for name, listener in (('do_orm_execute', self._track_statement),
+                               ('after_flush', self._track_flush),
+                               ('before_commit', self._apply),
+                               ('after_rollback', self._discard)):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+
+    def add(self, session, name, delta):
+        """Move a counter by delta with the session's next commit"""
+        if delta:
+            deltas = session.info.setdefault('counter_deltas', {})
+            deltas[name] = deltas.get(name, 0) + delta
+
+    def mark_stale(self, session, *names):
+        """Have these counters recounted on the next read after the session commits"""
+        session.info.setdefault('stale_counters', set()).update(names)
+
+    def _track_statement(self, state):
+        if state.is_select:
+            return
+        statement = state.statement
+        if isinstance(statement, TextClause):
+            match = WRITE_TARGET.match(statement.text)
+            if not match:
+                return
+            table = match.group(1).lower()
+            verb = statement.text.split(None, 1)[0].upper()
+        elif state.is_insert or state.is_update or state.is_delete:
+            table = statement.table.name
+            verb = None
+        else:
+            return
+        names = [name for name, (counted, _, _) in COUNTERS.items() if counted == table]
+        if not names:
+            return
+
+        if verb == 'UPDATE':
+            # Row counts do not move; filtered counters might, unless the caller reports them
+            if not state.execution_options.get('stat_counters_counted'):
+                self.mark_stale(state.session, *[name for name in names if COUNTERS[name][2]])
+            return
+        if verb not in ('INSERT', 'DELETE'):
+            self.mark_stale(state.session, *names)
+            return
+
+        result = state.invoke_statement()
+        sign = 1 if verb == 'INSERT' else -1
+        for name in names:
+            if COUNTERS[name][2] is None:
+                self.add(state.session, name, sign * result.rowcount)
+            elif result.rowcount:
+                # Which of the rows match the filter is not known from a raw statement
+                self.mark_stale(state.session, name)
+        return result
+
+    def _track_flush(self, session, flush_context):
+        today = datetime.date.today()
+        for instances, sign in ((session.new, 1), (session.deleted, -1)):
+            for instance in instances:
+                table = getattr(instance, '__tablename__', None)
+                values = inspect(instance).dict
+                for name, (counted, _, condition) in COUNTERS.items():
+                    if counted != table:
+                        continue
+                    if condition is None:
+                        self.add(session, name, sign)
+                    elif condition[0] not in values:
+                        self.mark_stale(session, name)
+                    elif condition[1](values[condition[0]], today):
+                        self.add(session, name, sign)
+
+        for instance in session.dirty:
+            table = getattr(instance, '__tablename__', None)
+            state = inspect(instance)
+            for name, (counted, _, condition) in COUNTERS.items():
+                if counted != table or condition is None:
+                    continue
+                history = state.attrs[condition[0]].history
+                if not history.added:
+                    continue
+                if not history.deleted:
+                    # The previous value was never loaded
+                    self.mark_stale(session, name)
+                    continue
+                self.add(session, name, int(condition[1](history.added[0], today))
+                         - int(condition[1](history.deleted[0], today)))
+
+    def _apply(self, session):
+        session.flush()
+        deltas = {name: delta for name, delta in session.info.pop('counter_deltas', {}).items() if delta}
+        stale = session.info.pop('stale_counters', set())
+        names = sorted(set(deltas) | stale)
+        if not names:
+            return
+
+        today = datetime.date.today()
+        # Sorted so concurrent writers lock counter rows in the same order
+        for name in names:
+            if name in stale:
+                session.execute(MARK_STALE, {"name": name, "stale": STALE})
+            else:
+                session.execute(ADD_TO_DAY_COUNTER if per_day(name) else ADD_TO_COUNTER,
+                                {"name": name, "delta": deltas[name], "today": today})
+
+        # name -> (before, after) for counters this commit moved, e.g. for the event feed
+        moved = sorted(set(deltas) - stale)
+        if moved:
+            changes = session.info.setdefault('counter_changes', {})
+            for name, value, as_of in session.execute(
+                text("SELECT name, value, as_of FROM stat_counters WHERE name IN :names")
+                .bindparams(bindparam('names', expanding=True)),
+                {"names": moved}
+            ):
+                if not per_day(name) or as_of == today:
+                    changes[name] = (value - deltas[name], value)
+
+        with self._lock:
+            self.delta_updates += len(moved)
+            self.marked_stale += len(stale)
+
+    def mark_stale_raw(self, connection, *tables):
+        """Have the counters of tables written on a raw DB-API connection recounted, before it commits"""
+        names = sorted(name for name, (counted, _, _) in COUNTERS.items() if counted in tables)
+        if not names:
+            return
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "UPDATE stat_counters SET refreshed_at = %s WHERE name IN ("
+                + ", ".join(["%s"] * len(names)) + ")",
+                [STALE] + names
+            )
+        finally:
+            cursor.close()
+        with self._lock:
+            self.marked_stale += len(names)
+
+    def _discard(self, session):
+        session.info.pop('counter_deltas', None)
+        session.info.pop('stale_counters', None)
+
+    def _count(self, connection, name, today):
+        query = COUNTERS[name][1]
+        return connection.execute(text(query), {"today": today} if per_day(name) else {}).scalar() or 0
+
+    def reconcile(self, names=None):
+        """Recount counters from scratch (all of them by default), creating missing rows"""
+        names = sorted(names or COUNTERS)
+        today = datetime.date.today()
+        values = {}
+        for name in names:
+            with db.engine.begin() as connection:
+                params = {"name": name, "value": None, "as_of": today, "now": datetime.datetime.utcnow()}
+                # Lock the row before counting: writers that already moved it have committed,
+                # later ones wait and add their delta on top of this count
+                locked = connection.execute(
+                    text("UPDATE stat_counters SET refreshed_at = :now WHERE name = :name"), params
+                ).rowcount
+                params['value'] = self._count(connection, name, today)
+                if locked:
+                    connection.execute(UPDATE_COUNTER, params)
+                else:
+                    try:
+                        with connection.begin_nested():
+                            connection.execute(INSERT_COUNTER, params)
+                    except IntegrityError:
+                        # Another worker created the row meanwhile; its count is as good as ours
+                        pass
+            values[name] = params['value']
+        with self._lock:
+            self.reconciled += len(names)
+        return values
+
+    def values(self, *names):
+        """Current value of each named counter"""
+        rows = db.session.execute(
+            text("SELECT name, value, as_of, refreshed_at FROM stat_counters WHERE name IN :names")
+            .bindparams(bindparam('names', expanding=True)),
+            {"names": list(names)}
+        ).fetchall()
+
+        today = datetime.date.today()
+        oldest = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.max_age)
+        values = {}
+        for name, value, as_of, refreshed_at in rows:
+            if refreshed_at < oldest or (per_day(name) and as_of != today):
+                continue
+            values[name] = value
+
+        missing = [name for name in names if name not in values]
+        if missing:
+            values.update(self.reconcile(missing))
+        return values
+
+    def stats(self):
+        with self._lock:
+            return {
+                'counters': sorted(COUNTERS),
+                'max_age_seconds': self.max_age,
+                'delta_updates': self.delta_updates,
+                'marked_stale': self.marked_stale,
+                'reconciled': self.reconciled
+            }
+
+stat_counters = StatCounters()
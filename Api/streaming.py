@@ -0,0 +1,32 @@
+from flask import Response, current_app, request, stream_with_context
+
+from db import db
+
+STREAM_BATCH_SIZE = 500
+
+def wants_stream():
+    """True when the client opted into streaming with ?stream=1"""
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+def stream_json_array(statement, params, serialize, batch_size=STREAM_BATCH_SIZE):
+    """Stream a JSON array straight from a server-side cursor
+
+    Rows are fetched batch_size at a time on a dedicated connection and written out as
+    they arrive, so memory stays flat and the first byte leaves before the last row is read.
+    """
+    def generate():
+        dumps = current_app.json.dumps
+        with db.engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True, yield_per=batch_size
+            ).execute(statement, params or {})
+
+            yield '['
+            first = True
+            for rows in result.partitions():
+                chunk = ','.join(dumps(serialize(row)) for row in rows)
+                yield chunk if first else ',' + chunk
+                first = False
+            yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,255 @@
+import datetime
+import hashlib
+import re
+import threading
+import time
+import uuid
+from functools import wraps
+from flask import request, make_response, current_app
+from sqlalchemy import event, text, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+from db import db, CacheVersion
+
+# Tables whose writes are published to cache_versions for the other workers
+SHARED_TABLES = (
+    'pupcs', 'visitorlogs', 'blacklist', 'users', 'approvedvisitors',
+    'visitors', 'crimetypes', 'crimecategories', 'roles', 'revocations'
+)
+
+# Target table of a raw INSERT / UPDATE / DELETE / REPLACE statement
+WRITE_TARGET = re.compile(
+    r'^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?',
+    re.IGNORECASE
+)
+
+class TableVersions:
+    """Per-table write counters used as cheap validators for conditional GETs
+
+    Every committed session that wrote to a table bumps that table's version, so a
+    response that only reads some tables can be revalidated from their versions
+    without running its queries. Writes are tracked from ORM flushes and from DML
+    statements run through Session.execute, and only counted once the commit has
+    happened, so a validator never runs ahead of the data it describes. Tables left
+    pending by a rollback are bumped with the next commit, which is harmless.
+
+    Writes to the shared tables also bump their row in cache_versions inside the
+    committing transaction, and every worker polls that table (at most once per
+    poll interval, piggybacked on incoming requests) to bump its own counters for
+    writes made elsewhere. A worker's own commit forgets the shared versions of the
+    tables it wrote, and the next poll bumps every table whose version differs from
+    the last one seen (or is no longer known), so the worker's own writes come back
+    as a second, harmless bump and writes made elsewhere in between are not lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        # Callables told which tables a commit just wrote, e.g. to evict cached results
+        self._listeners = []
+        self.shared_tables = frozenset(SHARED_TABLES)
+        self.poll_interval = 1.0
+        # cache_versions as of the last poll
+        self._shared = {}
+        self._next_poll = 0.0
+        self.polls = 0
+        self.remote_bumps = 0
+        # Changes on restart so validators issued by an earlier process never match
+        self._epoch = uuid.uuid4().hex[:8]
+
+    def init_app(self, app):
+        self.shared_tables = frozenset(app.config.get('CACHE_VERSION_TABLES', SHARED_TABLES))
+        self.poll_interval = app.config.get('CACHE_VERSION_POLL', self.poll_interval)
+        for name, listener in (('do_orm_execute', self._track_statement),
+                               ('after_flush', self._track_flush),
+                               ('before_commit', self._publish),
+                               ('after_commit', self._apply)):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+        app.before_request(self.sync)
+
+    def _pending(self, session):
+        return session.info.setdefault('written_tables', set())
+
+    def _track_statement(self, state):
+        if state.is_select:
+            return
+        statement = state.statement
+        if isinstance(statement, TextClause):
+            match = WRITE_TARGET.match(statement.text)
+            if match and match.group(1).lower() != CacheVersion.__tablename__:
+                self._pending(state.session).add(match.group(1).lower())
+        elif state.is_insert or state.is_update or state.is_delete:
+            self._pending(state.session).add(statement.table.name)
+
+    def _track_flush(self, session, flush_context):
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(instance, '__table__', None)
+            if table is not None:
+                self._pending(session).add(table.name)
+
+    def _publish(self, session):
+        """Bump the shared counters of the written tables in the transaction being committed"""
+        # commit() only flushes after before_commit, so flush here to see pending ORM writes
+        session.flush()
+        tables = sorted(session.info.get('written_tables', set()) & self.shared_tables)
+        if tables:
+            session.execute(
+                text("UPDATE cache_versions SET version = version + 1 WHERE table_name IN :tables")
+                .bindparams(bindparam('tables', expanding=True)),
+                {"tables": tables}
+            )
+
+    def publish_raw(self, connection, *tables):
+        """Bump cache_versions for tables written on a raw DB-API connection, before it commits
+
+        Writers that bypass the Session (direct mysql.connector code) call this so every
+        worker's next poll sees their writes.
+        """
+        tables = sorted(set(tables) & self.shared_tables)
+        if not tables:
+            return
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "UPDATE cache_versions SET version = version + 1 WHERE table_name IN ("
+                + ", ".join(["%s"] * len(tables)) + ")",
+                tables
+            )
+        finally:
+            cursor.close()
+
+    def sync(self):
+        """Bump local counters for tables other workers have written since the last poll"""
+        now = time.monotonic()
+        if not self.shared_tables or now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+
+        try:
+            with db.engine.connect() as connection:
+                shared = dict(connection.execute(
+                    text("SELECT table_name, version FROM cache_versions")
+                ).fetchall())
+                for table in self.shared_tables - shared.keys():
+                    # First run against this database: seed the missing counters
+                    try:
+                        connection.execute(
+                            text("INSERT INTO cache_versions (table_name, version) VALUES (:table, 0)"),
+                            {"table": table}
+                        )
+                        connection.commit()
+                    except IntegrityError:
+                        connection.rollback()
+                    shared[table] = 0
+        except Exception as e:
+            current_app.logger.warning(f"Cache version poll failed: {str(e)}")
+            return
+
+        with self._lock:
+            # Tables our own commits dropped from _shared count as changed too, or a write
+            # made elsewhere between that commit and this poll would go unnoticed
+            changed = [table for table, version in shared.items()
+                       if self.polls and self._shared.get(table) != version]
+            self._shared = shared
+            self.polls += 1
+            self.remote_bumps += len(changed)
+        if changed:
+            self.bump(*changed)
+
+    def _apply(self, session):
+        tables = session.info.pop('written_tables', None)
+        if tables:
+            self.bump(*tables)
+            written = self.shared_tables & tables
+            if written:
+                # Our own commit moved these shared counters: stop using the old shared keys
+                # and re-read cache_versions on the next request
+                with self._lock:
+                    self._shared = {table: version for table, version in self._shared.items()
+                                    if table not in written}
+                self._next_poll = 0.0
+
+    def subscribe(self, listener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+        for listener in self._listeners:
+            listener(tables)
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+    def snapshot(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def shared_key(self, tables):
+        """cache_versions of tables as a key fragment valid on every node; None before the first poll"""
+        shared = self._shared
+        if any(table not in shared for table in tables):
+            return None
+        return ".".join(str(shared[table]) for table in tables)
+
+    def etag(self, tables, scope=''):
+        """Validator for a response built from tables; scope covers everything else it depends on
+
+        Built from cache_versions when they are known, so every worker and node issues
+        and accepts the same validator; otherwise (before the first poll, or right after
+        this worker wrote one of the tables) from the local counters and process epoch.
+        """
+        digest = hashlib.sha1(scope.encode('utf-8')).hexdigest()[:16]
+        shared = self.shared_key(tables) if set(tables) <= self.shared_tables else None
+        if shared is not None:
+            return f"s{shared}-{digest}"
+        versions = ".".join(str(self.version(table)) for table in tables)
+        return f"{self._epoch}-{versions}-{digest}"
+
+    def stats(self):
+        with self._lock:
+            return {
+                'epoch': self._epoch,
+                'versions': dict(self._versions),
+                'shared_versions': dict(self._shared),
+                'poll_interval_seconds': self.poll_interval,
+                'polls': self.polls,
+                'remote_bumps': self.remote_bumps
+            }
+
+table_versions = TableVersions()
+
+def conditional_get(*tables):
+    """Answer If-None-Match with 304 before running the view when none of tables changed
+
+    The validator also covers the full URL (so filters, pages and ?fields= differ),
+    the calling user for views behind token_required, and the current date for
+    views that count "today".
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            user = args[0] if args else None
+            scope = "|".join([
+                request.full_path,
+                f"{getattr(user, 'user_id', '')}:{getattr(user, 'role_id', '')}",
+                datetime.date.today().isoformat()
+            ])
+            etag = table_versions.etag(tables, scope)
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Let browsers keep the body but revalidate it on every use
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,111 @@
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from db import db
+
+def username_base(first_name, last_name):
+    """First initial + last name, lower case, max 15 chars"""
+    return f"{first_name.lower()[0]}{last_name.lower()}"[:15]
+
+def prefix_pattern(base):
+    """LIKE pattern (ESCAPE '!') matching base and every suffixed form of it"""
+    return base.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+class UsernameAllocator:
+    """Free usernames (base, base1, base2, ...) for a whole batch of generated accounts
+
+    Every username any of the bases could collide with is read with one prefix query
+    (LIKE on the prefix uses the unique index on users.username), and suffixes are
+    assigned in memory, so a family of visitors sharing a surname costs one query
+    instead of one per candidate. Handed-out names stay reserved in this worker until
+    the allocating session commits or rolls back (or reservation_seconds pass for
+    callers outside the session), so concurrent requests here do not pick the same
+    name; across workers the unique index still has the last word.
+    """
+
+    def __init__(self, reservation_seconds=60):
+        self.reservation_seconds = reservation_seconds
+        self._lock = threading.Lock()
+        # username -> monotonic expiry
+        self._reserved = {}
+        self.lookups = 0
+        self.allocated = 0
+
+    def init_app(self, app):
+        self.reservation_seconds = app.config.get('USERNAME_RESERVATION_SECONDS', self.reservation_seconds)
+        for name in ('after_commit', 'after_rollback'):
+            if not event.contains(Session, name, self._release_session):
+                event.listen(Session, name, self._release_session)
+
+    def _taken(self, bases, cursor):
+        bases = sorted(set(bases))
+        if cursor is not None:
+            # DB-API cursor of a direct mysql.connector caller
+            cursor.execute(
+                "SELECT username FROM users WHERE " +
+                " OR ".join(["username LIKE %s ESCAPE '!'"] * len(bases)),
+                [prefix_pattern(base) for base in bases]
+            )
+            return {row['username'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()}
+
+        params = {f"prefix{index}": prefix_pattern(base) for index, base in enumerate(bases)}
+        return {row[0] for row in db.session.execute(
+            text("SELECT username FROM users WHERE " +
+                 " OR ".join(f"username LIKE :{name} ESCAPE '!'" for name in params)),
+            params
+        )}
+
+    def allocate(self, bases, cursor=None):
+        """One free username per base, in order, using a single lookup query
+
+        Without a cursor the lookup runs on db.session and the names are released
+        when that session's transaction ends.
+        """
+        bases = list(bases)
+        if not bases:
+            return []
+        taken = self._taken(bases, cursor)
+
+        now = time.monotonic()
+        usernames = []
+        with self._lock:
+            for username, expires in list(self._reserved.items()):
+                if expires <= now:
+                    del self._reserved[username]
+            for base in bases:
+                username = base
+                counter = 1
+                while username in taken or username in self._reserved:
+                    username = f"{base}{counter}"
+                    counter += 1
+                taken.add(username)
+                self._reserved[username] = now + self.reservation_seconds
+                usernames.append(username)
+            self.lookups += 1
+            self.allocated += len(usernames)
+
+        if cursor is None:
+            db.session.info.setdefault('reserved_usernames', []).extend(usernames)
+        return usernames
+
+    def release(self, *usernames):
+        with self._lock:
+            for username in usernames:
+                self._reserved.pop(username, None)
+
+    def _release_session(self, session):
+        # Committed names are visible to the next lookup; rolled back ones are free again
+        self.release(*session.info.pop('reserved_usernames', []))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'reservation_seconds': self.reservation_seconds,
+                'reserved': len(self._reserved),
+                'lookups': self.lookups,
+                'allocated': self.allocated
+            }
+
+username_allocator = UsernameAllocator()
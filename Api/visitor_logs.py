@@ -0,0 +1,137 @@
+from sqlalchemy import text, bindparam, DateTime
+
+from db import db
+from pagination import decode_cursor, encode_cursor, parse_date, parse_datetime
+from fieldsets import Projection, iso
+
+# pupc_id and visitor_id are NOT NULL foreign keys, so leaving out an unused join
+# never changes which logs are returned
+VISITOR_LOG_FIELDS = Projection(
+    "FROM visitorlogs vl",
+    {
+        'visitor_log_id': ("vl.visitor_log_id", None, None),
+        'pupc_id': ("vl.pupc_id", None, None),
+        'visitor_id': ("vl.visitor_id", None, None),
+        'pupc_first_name': ("p.first_name", 'pupc', None),
+        'pupc_last_name': ("p.last_name", 'pupc', None),
+        'visitor_first_name': ("v.first_name", 'visitor', None),
+        'visitor_last_name': ("v.last_name", 'visitor', None),
+        'visit_time': ("vl.visit_time", None, str),
+        'visit_date': ("vl.visit_date", None, iso),
+        'purpose': ("vl.purpose", None, None),
+        'approval_status': ("vl.approval_status", None, None),
+        'created_at': ("vl.created_at", None, iso)
+    },
+    joins={
+        'pupc': "JOIN pupcs p ON vl.pupc_id = p.pupc_id",
+        'visitor': "JOIN visitors v ON vl.visitor_id = v.visitor_id"
+    },
+    keys=('created_at', 'visitor_log_id')
+)
+
+def visitor_log_filters(args):
+    """Collect the server-side visitor-log filters from the query string"""
+    filters = {}
+    if args.get('status'):
+        filters['status'] = args['status']
+    for key in ('pupc_id', 'visitor_id'):
+        if args.get(key):
+            try:
+                filters[key] = int(args[key])
+            except ValueError:
+                raise ValueError(f"{key} must be an integer")
+    if args.get('date_from'):
+        filters['date_from'] = parse_date(args['date_from'], 'date_from')
+    if args.get('date_to'):
+        filters['date_to'] = parse_date(args['date_to'], 'date_to')
+    return filters
+
+def visitor_log_statement(filters, cursor=None, limit=None, fields=None):
+    """Newest-first visitor-log statement and params; no LIMIT when limit is None"""
+    clauses = []
+    params = {}
+
+    if 'status' in filters:
+        clauses.append("vl.approval_status = :status")
+        params['status'] = filters['status']
+    if 'pupc_id' in filters:
+        clauses.append("vl.pupc_id = :pupc_id")
+        params['pupc_id'] = filters['pupc_id']
+    if 'visitor_id' in filters:
+        clauses.append("vl.visitor_id = :visitor_id")
+        params['visitor_id'] = filters['visitor_id']
+    if 'date_from' in filters:
+        clauses.append("vl.visit_date >= :date_from")
+        params['date_from'] = filters['date_from']
+    if 'date_to' in filters:
+        clauses.append("vl.visit_date <= :date_to")
+        params['date_to'] = filters['date_to']
+
+    if cursor:
+        try:
+            created_at, log_id = decode_cursor(cursor)
+            params['cursor_created_at'] = parse_datetime(created_at)
+            params['cursor_id'] = int(log_id)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        # Expanded row comparison so MySQL can range-scan (created_at, visitor_log_id)
+        clauses.append("""(vl.created_at < :cursor_created_at
+             OR (vl.created_at = :cursor_created_at AND vl.visitor_log_id < :cursor_id))""")
+
+    query = VISITOR_LOG_FIELDS.select(fields or VISITOR_LOG_FIELDS.fields)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY vl.created_at DESC, vl.visitor_log_id DESC"
+    if limit is not None:
+        query += " LIMIT :limit"
+        params['limit'] = limit
+
+    statement = text(query)
+    if cursor:
+        statement = statement.bindparams(bindparam('cursor_created_at', type_=DateTime))
+    return statement, params
+
+def fetch_visitor_logs(filters, cursor=None, limit=100, fields=None):
+    """One keyset page of visitor logs, newest first; returns (rows, next_cursor)
+
+    limit=None returns every matching row and no cursor.
+    """
+    statement, params = visitor_log_statement(filters, cursor, None if limit is None else limit + 1, fields)
+    rows = db.session.execute(statement, params).fetchall()
+    if limit is None:
+        return rows, None
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].visitor_log_id)
+    return rows, next_cursor
+
+serialize_visitor_log = VISITOR_LOG_FIELDS.serializer(VISITOR_LOG_FIELDS.fields)
+
+PENDING_APPROVALS_QUERY = """
+    SELECT vl.visitor_log_id, vl.pupc_id, vl.visitor_id, 
+           p.first_name as pupc_first_name, p.last_name as pupc_last_name,
+           v.first_name as visitor_first_name, v.last_name as visitor_last_name,
+           vl.visit_time, vl.visit_date, vl.purpose, vl.created_at
+    FROM visitorlogs vl
+    JOIN pupcs p ON vl.pupc_id = p.pupc_id
+    JOIN visitors v ON vl.visitor_id = v.visitor_id
+    WHERE vl.approval_status = 'Pending'
+    ORDER BY vl.created_at DESC
+"""
+
+def serialize_pending_approval(row):
+    return {
+        'visitor_log_id': row[0],
+        'pupc_id': row[1],
+        'visitor_id': row[2],
+        'pupc_first_name': row[3],
+        'pupc_last_name': row[4],
+        'visitor_first_name': row[5],
+        'visitor_last_name': row[6],
+        'visit_time': str(row[7]),
+        'visit_date': row[8].isoformat() if row[8] else None,
+        'purpose': row[9],
+        'created_at': row[10].isoformat() if row[10] else None
+    }
@@ -22,6 +22,8 @@ const PUCModal = ({ puc, isOpen, onClose, onSave, mode }) => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [visitorModalOpen, setVisitorModalOpen] = useState(false);
+  // The roster is only sent back once it has been loaded from the server
+  const [rosterLoaded, setRosterLoaded] = useState(false);
 
   useEffect(() => {
     // If editing or viewing, populate form with PUC data
@@ -38,6 +40,7 @@ const PUCModal = ({ puc, isOpen, onClose, onSave, mode }) => {
         crime_id: puc.crime_id || '',
         approved_visitors: puc.approved_visitors || []
       });
+      setRosterLoaded(false);
       
       // Fetch approved visitors for this PUC
       if (puc.pupc_id) {
@@ -60,6 +63,7 @@ const PUCModal = ({ puc, isOpen, onClose, onSave, mode }) => {
           ...prev,
           approved_visitors: response.data.approved_visitors
         }));
+        setRosterLoaded(true);
       }
     } catch (err) {
       console.error('Error fetching approved visitors:', err);
@@ -109,7 +113,12 @@ const PUCModal = ({ puc, isOpen, onClose, onSave, mode }) => {
     setError(null);
     
     try {
-      await onSave(formData);
+      // Without the loaded roster, leave it out so the server keeps the visitors as they are
+      const fields = { ...formData };
+      if (!rosterLoaded) {
+        delete fields.approved_visitors;
+      }
+      await onSave(fields);
       onClose();
     } catch (err) {
       console.error('Error saving PUC:', err);
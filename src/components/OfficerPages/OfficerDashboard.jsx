@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
 import axios from 'axios';
@@ -81,8 +81,77 @@ const OfficerDashboard = () => {
       });
   };
 
+  // Sections the dashboard bundle filled; their first visit needs no request of its own
+  const bundled = useRef(new Set());
+  const [bundleLoaded, setBundleLoaded] = useState(false);
+
+  // Load the visitor logs after a bundled first page by following X-Next-Cursor
+  const fetchRemainingVisitorLogs = async (cursor, headers) => {
+    let logs = [];
+    while (cursor) {
+      const response = await axios.get('http://localhost:5000/api/visitor-logs', {
+        headers,
+        params: { limit: 500, cursor }
+      });
+      logs = logs.concat(response.data);
+      cursor = response.headers['x-next-cursor'];
+    }
+    return logs;
+  };
+
+  // One request loads every section the dashboard opens with; sections it could not
+  // load fall back to their own endpoints
+  useEffect(() => {
+    const headers = { Authorization: `Bearer ${localStorage.getItem('token')}` };
+    setLoading(prev => ({ ...prev, stats: true, approvals: true, blacklisted: true, visitorLogs: true }));
+
+    axios.get('http://localhost:5000/api/dashboard/bundle', {
+      headers,
+      params: { sections: 'summary,approvals,blacklisted,visitor_logs', limit: 100 }
+    })
+      .then(response => {
+        const { errors = {}, next_cursors: nextCursors = {} } = response.data;
+        const sections = {
+          summary: ['home', 'stats', setDashboardStats],
+          approvals: ['approvals', 'approvals', setApprovals],
+          blacklisted: ['blacklisted', 'blacklisted', setBlacklisted],
+          visitor_logs: ['visitor-logs', 'visitorLogs', setVisitorLogs]
+        };
+        Object.entries(sections).forEach(([name, [section, loadingKey, setter]]) => {
+          if (name in response.data && !(name in errors)) {
+            setter(response.data[name]);
+            setError(prev => ({ ...prev, [loadingKey]: null }));
+            bundled.current.add(section);
+          }
+        });
+
+        if (bundled.current.has('visitor-logs') && nextCursors.visitor_logs) {
+          fetchRemainingVisitorLogs(nextCursors.visitor_logs, headers)
+            .then(logs => setVisitorLogs(prev => prev.concat(logs)))
+            .catch(err => {
+              console.error('Error fetching visitor logs:', err);
+              setError(prev => ({ ...prev, visitorLogs: 'Failed to load visitor logs' }));
+            });
+        }
+      })
+      .catch(err => {
+        console.error('Error fetching dashboard bundle:', err);
+      })
+      .finally(() => {
+        setLoading(prev => ({ ...prev, stats: false, approvals: false, blacklisted: false, visitorLogs: false }));
+        setBundleLoaded(true);
+      });
+  }, []);
+
   // Fetch data based on active section
   useEffect(() => {
+    if (!bundleLoaded) {
+      return;
+    }
+    // The bundle already loaded this section; later visits refresh it
+    if (bundled.current.delete(activeSection)) {
+      return;
+    }
     switch (activeSection) {
       case 'home':
         fetchData('home', 'dashboard/stats', 'dashboard stats', 'stats', 'Failed to load dashboard statistics', setDashboardStats);
@@ -102,7 +171,7 @@ const OfficerDashboard = () => {
       default:
         break;
     }
-  }, [activeSection]);
+  }, [activeSection, bundleLoaded]);
 
   if (!isAuthenticated || !currentUser) {
     return <div className="loading">Redirecting...</div>;
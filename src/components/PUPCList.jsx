@@ -3,32 +3,53 @@ import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import './PUPCList.css';
 
+const PAGE_SIZE = 100;
+
 const PUPCList = () => {
   const [pupcs, setPUPCs] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [categories, setCategories] = useState([]);
   const [filter, setFilter] = useState({ category: '', status: '', search: '' });
+  const [totalCount, setTotalCount] = useState(0);
   
   const navigate = useNavigate();
 
+  // Categories only need to be loaded once
   useEffect(() => {
-    const fetchData = async () => {
+    const fetchCategories = async () => {
       try {
         const token = localStorage.getItem('token');
-        
-        // Fetch PUPCs
-        const pupcsResponse = await axios.get('http://localhost:5000/api/pupcs', {
-          headers: { Authorization: `Bearer ${token}` }
-        });
-        
-        // Fetch categories
         const categoriesResponse = await axios.get('http://localhost:5000/api/categories', {
           headers: { Authorization: `Bearer ${token}` }
         });
-        
-        setPUPCs(pupcsResponse.data);
         setCategories(categoriesResponse.data);
+      } catch (err) {
+        console.error(err);
+      }
+    };
+
+    fetchCategories();
+  }, []);
+
+  // Filtering, search and paging happen on the server
+  useEffect(() => {
+    const fetchPUPCs = async () => {
+      try {
+        const token = localStorage.getItem('token');
+        const params = { sort: 'name', limit: PAGE_SIZE };
+        if (filter.category) params.category_id = filter.category;
+        if (filter.status) params.status = filter.status;
+        if (filter.search.trim()) params.q = filter.search.trim();
+
+        const pupcsResponse = await axios.get('http://localhost:5000/api/pucs', {
+          headers: { Authorization: `Bearer ${token}` },
+          params
+        });
+
+        setPUPCs(pupcsResponse.data);
+        setTotalCount(parseInt(pupcsResponse.headers['x-total-count'] || pupcsResponse.data.length, 10));
+        setError('');
       } catch (err) {
         setError('Failed to fetch data');
         console.error(err);
@@ -37,25 +58,16 @@ const PUPCList = () => {
       }
     };
 
-    fetchData();
-  }, []);
+    // Wait for the user to stop typing before searching
+    const timer = setTimeout(fetchPUPCs, 300);
+    return () => clearTimeout(timer);
+  }, [filter]);
 
   const handleFilterChange = (e) => {
     const { name, value } = e.target;
     setFilter(prev => ({ ...prev, [name]: value }));
   };
 
-  const filteredPUPCs = pupcs.filter(pupc => {
-    const matchesCategory = filter.category ? pupc.category_id === parseInt(filter.category) : true;
-    const matchesStatus = filter.status ? pupc.status === filter.status : true;
-    const matchesSearch = filter.search ? 
-      pupc.first_name.toLowerCase().includes(filter.search.toLowerCase()) || 
-      pupc.last_name.toLowerCase().includes(filter.search.toLowerCase()) : 
-      true;
-    
-    return matchesCategory && matchesStatus && matchesSearch;
-  });
-
   const handleViewDetails = (pupcId) => {
     navigate(`/pupcs/${pupcId}`);
   };
@@ -128,9 +140,13 @@ const PUPCList = () => {
         </div>
       </div>
       
+      {totalCount > pupcs.length && (
+        <p className="results-count">Showing {pupcs.length} of {totalCount} records. Refine the filters to narrow the list.</p>
+      )}
+      
       <div className="pupc-grid">
-        {filteredPUPCs.length > 0 ? (
-          filteredPUPCs.map(pupc => (
+        {pupcs.length > 0 ? (
+          pupcs.map(pupc => (
             <div key={pupc.pupc_id} className="pupc-card">
               <div className="pupc-image">
                 {pupc.mugshot_path ? (
@@ -12,6 +12,46 @@ export const AuthProvider = ({ children }) => {
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
 
+  // Access tokens are short-lived; on a 401 swap the refresh token for a new one and retry once
+  useEffect(() => {
+    const interceptor = axios.interceptors.response.use(
+      (response) => response,
+      async (error) => {
+        const originalRequest = error.config;
+        const refreshToken = localStorage.getItem('refresh_token');
+
+        if (
+          error.response?.status !== 401 ||
+          !refreshToken ||
+          !originalRequest ||
+          originalRequest._retry ||
+          originalRequest.url?.endsWith('/api/token/refresh')
+        ) {
+          return Promise.reject(error);
+        }
+
+        originalRequest._retry = true;
+        try {
+          const response = await axios.post('http://localhost:5000/api/token/refresh', {
+            refresh_token: refreshToken
+          });
+
+          localStorage.setItem('token', response.data.token);
+          setToken(response.data.token);
+          originalRequest.headers = {
+            ...originalRequest.headers,
+            Authorization: `Bearer ${response.data.token}`
+          };
+          return axios(originalRequest);
+        } catch (refreshError) {
+          return Promise.reject(error);
+        }
+      }
+    );
+
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   useEffect(() => {
     const loadUser = async () => {
       if (token) {
@@ -54,7 +94,7 @@ export const AuthProvider = ({ children }) => {
         password
       });
       
-      const { token, ...userData } = response.data;
+      const { token, refresh_token, ...userData } = response.data;
       
       // Map role_id to role string
       const roleMap = {
@@ -70,6 +110,7 @@ export const AuthProvider = ({ children }) => {
       };
       
       localStorage.setItem('token', token);
+      localStorage.setItem('refresh_token', refresh_token);
       setToken(token);
       setCurrentUser(enhancedUserData);
       
@@ -107,6 +148,7 @@ export const AuthProvider = ({ children }) => {
 
   const logout = () => {
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     setToken(null);
     setCurrentUser(null);
   };